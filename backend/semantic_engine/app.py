@@ -5,6 +5,9 @@ FastAPI Server per integrazione con whatis_backend Node.js
 
 Endpoints:
 - POST /semantic/search - Ricerca semantica completa
+- POST /semantic/search/stream - Ricerca semantica in streaming (NDJSON/SSE)
+- POST /semantic/search/jobs - Ricerca semantica asincrona (job in background)
+- GET /semantic/search/jobs/{job_id} - Stato, avanzamento e risultato di un job
 - POST /semantic/municipalities - Scoperta comuni e frazioni
 
 Porta: 5000
@@ -13,22 +16,34 @@ Autore: Semantic Engine AI
 
 import asyncio
 import uvicorn
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Dict, Any, Optional
 import logging
+import json
 import sys
 import os
 
 # Aggiungi il path dei moduli core
 sys.path.append(os.path.join(os.path.dirname(__file__), 'core'))
 
-from core.semantic_search import perform_semantic_search, analyze_search_results
+from core.semantic_search import perform_semantic_search, stream_semantic_search, analyze_search_results, search_coalescing_stats
 from core.geo_municipal import discover_zone_municipalities
 from core.utils import SemanticLogger
 from core.semantic_enricher import enrich_single_poi, enrich_poi_list
+from core.sparql_client import SparqlClient, WIKIDATA_SPARQL_ENDPOINT, DBPEDIA_SPARQL_ENDPOINT, sparql_cache_stats
+from core.http_pool import get_http_registry, get_http_session
+from core.search_jobs import get_search_job_manager, SearchJobQueueFull
+from core.result_cache import get_result_cache
+from core.overpass_tiles import get_overpass_tile_cache
+from core.overpass_pool import get_overpass_pool
+from core.osm_local_store import get_local_osm_store
+from core.wiki_page_cache import get_wiki_page_cache
+from core.nominatim_client import get_nominatim_client
+from core.land_water import get_land_water_mask
+from core.coastline import get_coastline_index
 
 # Configurazione logging
 logging.basicConfig(
@@ -79,6 +94,7 @@ class SemanticSearchRequest(BaseModel):
     enable_ai_enrichment: bool = Field(default=True, description="Abilita arricchimento AI delle descrizioni")
     marine_only: bool = Field(default=False, description="Se true, cerca SOLO POI marini (no terrestri)")
     mode: Optional[str] = Field(default="standard", description="Modalità ricerca (standard|enhanced)")
+    time_budget_ms: Optional[int] = Field(default=None, ge=100, description="Budget di tempo della ricerca in ms (alternativa: header X-Deadline-Ms)")
 
 class MunicipalityRequest(BaseModel):
     """Richiesta scoperta comuni"""
@@ -116,6 +132,24 @@ class SemanticSearchResponse(BaseModel):
     statistics: Dict[str, Any]
     marine_analysis: Optional[Dict[str, Any]] = None
     processing_time_ms: Optional[float] = None
+    truncated_stages: Optional[List[str]] = None  # Fasi saltate/interrotte per il budget di tempo
+    failed_stages: Optional[List[str]] = None  # Fonti fallite (errori/timeout): risultato degradato
+    stale: Optional[bool] = None  # Risultato dalla cache oltre il soft TTL (ricalcolo in background)
+    cache_age_s: Optional[float] = None  # Età del risultato in cache (secondi)
+
+class SearchJobResponse(BaseModel):
+    """Stato di un job di ricerca asincrona (result presente solo a job completato)"""
+    job_id: str
+    status: str  # queued | running | completed | failed
+    zone_name: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    elapsed_ms: float
+    stages: Dict[str, Dict[str, Any]]
+    pois_found: int
+    error: Optional[str] = None
+    result: Optional[SemanticSearchResponse] = None
 
 class HealthResponse(BaseModel):
     """Risposta health check"""
@@ -137,6 +171,46 @@ class POIEnrichmentResponse(BaseModel):
     confidence: float
     metadata: Optional[Dict[str, Any]] = None
 
+# Validazione input condivisa
+
+def validate_polygon(polygon: List[List[float]]):
+    """Valida poligono e coordinate, solleva HTTPException 400 se non validi"""
+    # Validazione poligono
+    if len(polygon) < 3:
+        raise HTTPException(
+            status_code=400,
+            detail="Il poligono deve avere almeno 3 punti"
+        )
+    
+    # Validazione coordinate
+    for point in polygon:
+        if len(point) != 2:
+            raise HTTPException(
+                status_code=400,
+                detail="Ogni punto deve avere esattamente 2 coordinate [lat, lng]"
+            )
+        lat, lng = point
+        if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Coordinate non valide: lat={lat}, lng={lng}"
+            )
+
+def resolve_time_budget(request: SemanticSearchRequest, http_request: Request) -> Optional[int]:
+    """Budget di tempo della richiesta: campo time_budget_ms o header X-Deadline-Ms (il minore dei due)"""
+    budgets = [request.time_budget_ms] if request.time_budget_ms else []
+    header = http_request.headers.get("x-deadline-ms")
+    if header:
+        try:
+            budgets.append(int(float(header)))
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Header X-Deadline-Ms non valido: {header}"
+            )
+    budgets = [budget for budget in budgets if budget > 0]
+    return min(budgets) if budgets else None
+
 # Route handlers
 
 @app.get("/", response_model=Dict[str, str])
@@ -169,8 +243,26 @@ async def health_check():
         services=services_status
     )
 
+@app.get("/semantic/stats")
+async def runtime_stats():
+    """Statistiche runtime: utilizzo pool HTTP per upstream, cache e coalescenza ricerche"""
+    return {
+        "http_pool": get_http_registry().stats(),
+        "result_cache": await get_result_cache().stats(),
+        "sparql_cache": sparql_cache_stats(),
+        "overpass_tiles": get_overpass_tile_cache().stats(),
+        "overpass_pool": get_overpass_pool().stats(),
+        "osm_local_store": get_local_osm_store().stats(),
+        "wiki_pages": await get_wiki_page_cache().stats(),
+        "nominatim": get_nominatim_client().stats(),
+        "land_water": get_land_water_mask().stats(),
+        "coastline": get_coastline_index().stats(),
+        "search_coalescing": search_coalescing_stats(),
+        "search_jobs": get_search_job_manager().stats()
+    }
+
 @app.post("/semantic/search", response_model=SemanticSearchResponse)
-async def semantic_search(request: SemanticSearchRequest, background_tasks: BackgroundTasks):
+async def semantic_search(request: SemanticSearchRequest, background_tasks: BackgroundTasks, http_request: Request):
     """
     Ricerca semantica avanzata di POI in una zona geografica
     
@@ -181,6 +273,7 @@ async def semantic_search(request: SemanticSearchRequest, background_tasks: Back
     - Deduplicazione intelligente
     - Arricchimento AI delle descrizioni
     - Caching dei risultati
+    - Budget di tempo opzionale (time_budget_ms / X-Deadline-Ms) con risultati parziali
     """
     
     import time
@@ -199,26 +292,9 @@ async def semantic_search(request: SemanticSearchRequest, background_tasks: Back
         else:
             logger.logger.info(f"ℹ️ [POI-MARINE] Modalità ricerca: {search_mode}")
         
-        # Validazione poligono
-        if len(request.polygon) < 3:
-            raise HTTPException(
-                status_code=400, 
-                detail="Il poligono deve avere almeno 3 punti"
-            )
-        
-        # Validazione coordinate
-        for point in request.polygon:
-            if len(point) != 2:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Ogni punto deve avere esattamente 2 coordinate [lat, lng]"
-                )
-            lat, lng = point
-            if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Coordinate non valide: lat={lat}, lng={lng}"
-                )
+        # Validazione poligono e coordinate
+        validate_polygon(request.polygon)
+        time_budget_ms = resolve_time_budget(request, http_request)
         
         # Esegui ricerca semantica
         search_result = await perform_semantic_search(
@@ -227,7 +303,8 @@ async def semantic_search(request: SemanticSearchRequest, background_tasks: Back
             extend_marine=request.extend_marine,
             enable_ai=request.enable_ai_enrichment,
             marine_only=request.marine_only,
-            mode=search_mode
+            mode=search_mode,
+            time_budget_ms=time_budget_ms
         )
         
         # Calcola tempo processing
@@ -259,6 +336,130 @@ async def semantic_search(request: SemanticSearchRequest, background_tasks: Back
             detail=f"Errore interno durante la ricerca: {str(e)}"
         )
 
+@app.post("/semantic/search/stream")
+async def semantic_search_stream(request: SemanticSearchRequest, http_request: Request):
+    """
+    Ricerca semantica in streaming: i risultati vengono inviati man mano che ogni fase termina
+    
+    Formato:
+    - application/x-ndjson (default): un oggetto JSON per riga
+    - text/event-stream (se richiesto via header Accept): Server-Sent Events
+    
+    Eventi:
+    - "pois": batch di POI deduplicati (stage: osm | wiki | marine | cache)
+    - "municipalities": comuni scoperti
+    - "stage": avanzamento fasi lunghe (es. arricchimento)
+    - "complete": risultato completo finale (stesso formato di /semantic/search) con statistiche
+    - "error": errore durante la ricerca
+    """
+    
+    import time
+    start_time = time.time()
+    
+    # Validazione prima di aprire lo stream (errori 400 restano risposte JSON normali)
+    validate_polygon(request.polygon)
+    time_budget_ms = resolve_time_budget(request, http_request)
+    
+    search_mode = (request.mode or "standard").lower()
+    use_sse = "text/event-stream" in http_request.headers.get("accept", "")
+    
+    def format_frame(frame: Dict[str, Any]) -> str:
+        payload = json.dumps(frame, ensure_ascii=False, default=str)
+        if use_sse:
+            return f"event: {frame['event']}\ndata: {payload}\n\n"
+        return payload + "\n"
+    
+    async def frames():
+        async for event in stream_semantic_search(
+            zone_name=request.zone_name,
+            polygon=request.polygon,
+            extend_marine=request.extend_marine,
+            enable_ai=request.enable_ai_enrichment,
+            marine_only=request.marine_only,
+            mode=search_mode,
+            time_budget_ms=time_budget_ms
+        ):
+            try:
+                if event["event"] == "pois":
+                    event["pois"] = [serialize_poi(poi) for poi in event["pois"]]
+                    event["pois"] = [poi for poi in event["pois"] if poi is not None]
+                elif event["event"] == "complete":
+                    search_result = event.pop("result")
+                    processing_time = (time.time() - start_time) * 1000  # millisecondi
+                    search_result["processing_time_ms"] = round(processing_time, 2)
+                    
+                    logger.log_search_results(
+                        request.zone_name,
+                        search_result["statistics"]["total_pois"],
+                        search_result["statistics"]["total_municipalities"]
+                    )
+                    asyncio.ensure_future(log_search_analytics(
+                        request.zone_name, processing_time, search_result["statistics"]
+                    ))
+                    
+                    event.update(SemanticSearchResponse(**search_result).model_dump())
+            except Exception as e:
+                logger.log_error("Semantic Search Stream Endpoint", str(e), request.zone_name)
+                event = {"event": "error", "detail": f"Errore interno durante la ricerca: {str(e)}"}
+            
+            yield format_frame(event)
+    
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/semantic/search/jobs", response_model=SearchJobResponse, status_code=202)
+async def submit_search_job(request: SemanticSearchRequest, http_request: Request):
+    """
+    Avvia una ricerca semantica in background e restituisce subito l'id del job
+    
+    La ricerca gira su un pool di worker limitato; lo stato si legge con
+    GET /semantic/search/jobs/{job_id}. Una richiesta identica a un job in corso
+    o completato da poco restituisce lo stesso job.
+    """
+    
+    validate_polygon(request.polygon)
+    time_budget_ms = resolve_time_budget(request, http_request)
+    
+    try:
+        job = await get_search_job_manager().submit(
+            zone_name=request.zone_name,
+            polygon=request.polygon,
+            extend_marine=request.extend_marine,
+            enable_ai=request.enable_ai_enrichment,
+            marine_only=request.marine_only,
+            mode=(request.mode or "standard").lower(),
+            time_budget_ms=time_budget_ms
+        )
+    except SearchJobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return build_job_response(job)
+
+@app.get("/semantic/search/jobs/{job_id}", response_model=SearchJobResponse)
+async def get_search_job(job_id: str):
+    """Stato, avanzamento per fase e (a job completato) risultato della ricerca"""
+    job = get_search_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job non trovato o scaduto: {job_id}")
+    return build_job_response(job)
+
+def build_job_response(job) -> SearchJobResponse:
+    """Costruisce la risposta di stato del job (con il risultato completo se disponibile)"""
+    response = SearchJobResponse(**job.status_info())
+    if job.status == "completed" and job.result is not None:
+        response.result = SemanticSearchResponse(**job.result)
+    return response
+
+def serialize_poi(poi: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Serializza un POI nel formato POIResponse (None se il POI non è valido)"""
+    try:
+        return POIResponse(**poi).model_dump()
+    except ValidationError:
+        return None
+
 @app.post("/semantic/municipalities", response_model=List[MunicipalityResponse])
 async def discover_municipalities(request: MunicipalityRequest):
     """
@@ -278,26 +479,8 @@ async def discover_municipalities(request: MunicipalityRequest):
             [f"polygon with {len(request.polygon)} points"]
         )
         
-        # Validazione poligono
-        if len(request.polygon) < 3:
-            raise HTTPException(
-                status_code=400,
-                detail="Il poligono deve avere almeno 3 punti"
-            )
-        
-        # Validazione coordinate  
-        for point in request.polygon:
-            if len(point) != 2:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Ogni punto deve avere esattamente 2 coordinate [lat, lng]"
-                )
-            lat, lng = point
-            if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Coordinate non valide: lat={lat}, lng={lng}"
-                )
+        # Validazione poligono e coordinate
+        validate_polygon(request.polygon)
         
         # Scopri comuni nella zona
         municipalities = await discover_zone_municipalities(
@@ -431,9 +614,21 @@ async def startup_event():
     logger.logger.info("=== Semantic Engine Starting ===")
     logger.logger.info("Version: 1.0.0")
     logger.logger.info("Port: 5000")  # ✅ FIX MarineDeep: Porta uniformata a 5000
-    logger.logger.info("Endpoints: /semantic/search, /semantic/municipalities")
+    logger.logger.info("Endpoints: /semantic/search, /semantic/search/stream, /semantic/municipalities")
     logger.logger.info("Documentation: http://localhost:5000/docs")  # ✅ FIX MarineDeep: Porta uniformata a 5000
     
+    # Pool HTTP condiviso (keep-alive, cache DNS, limiti per upstream)
+    await get_http_registry().startup()
+    
+    # Worker per le ricerche asincrone (/semantic/search/jobs)
+    await get_search_job_manager().start()
+    
+    # Maschera terra/mare offline, indice della costa per le zone marine ed estratto OSM locale
+    # (caricati fuori dall'event loop)
+    await asyncio.to_thread(get_land_water_mask)
+    await asyncio.to_thread(get_coastline_index)
+    await asyncio.to_thread(get_local_osm_store)
+    
     # Verifica connessioni esterne
     await verify_external_services()
     
@@ -444,6 +639,10 @@ async def shutdown_event():
     """Cleanup allo shutdown del servizio"""
     logger.logger.info("=== Semantic Engine Shutting Down ===")
     
+    # Arresto worker ricerche asincrone e chiusura pool HTTP condiviso
+    await get_search_job_manager().shutdown()
+    await get_http_registry().shutdown()
+    
     # Cleanup eventuale
     # - Chiusura connessioni database
     # - Flush dei log
@@ -466,22 +665,18 @@ async def verify_external_services():
         "dbpedia": False
     }
     
-    # Test Overpass API
+    # Test Overpass API: lo stato (/api/status) di tutti gli endpoint del pool inizializza anche gli slot
     for attempt in range(max_retries):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://overpass-api.de/api/status",
-                    timeout=aiohttp.ClientTimeout(total=5),
-                    headers={"User-Agent": "whatis-backend-semantic/1.0"}
-                ) as response:
-                    if response.status == 200:
-                        provider_status["overpass"] = True
-                        logger.logger.info("🟢 Overpass attivo")
-                        break
-                    elif attempt < max_retries - 1:
-                        logger.logger.warning(f"⚠️ Overpass tentativo {attempt + 1}/{max_retries} fallito, retry in {retry_delay}s...")
-                        await asyncio.sleep(retry_delay)
+            if await get_overpass_pool().refresh_all_status():
+                provider_status["overpass"] = True
+                logger.logger.info("🟢 Overpass attivo")
+                break
+            elif attempt < max_retries - 1:
+                logger.logger.warning(f"⚠️ Overpass tentativo {attempt + 1}/{max_retries} fallito, retry in {retry_delay}s...")
+                await asyncio.sleep(retry_delay)
+            else:
+                logger.logger.warning(f"🔴 Overpass non disponibile dopo {max_retries} tentativi")
         except Exception as e:
             if attempt < max_retries - 1:
                 logger.logger.warning(f"⚠️ Overpass tentativo {attempt + 1}/{max_retries} fallito: {e}, retry in {retry_delay}s...")
@@ -492,19 +687,19 @@ async def verify_external_services():
     # Test Wikipedia API
     for attempt in range(max_retries):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://it.wikipedia.org/api/rest_v1/page/summary/Italia",
-                    timeout=aiohttp.ClientTimeout(total=5),
-                    headers={"User-Agent": "whatis-backend-semantic/1.0"}
-                ) as response:
-                    if response.status == 200:
-                        provider_status["wikipedia"] = True
-                        logger.logger.info("🟢 Wikipedia attivo")
-                        break
-                    elif attempt < max_retries - 1:
-                        logger.logger.warning(f"⚠️ Wikipedia tentativo {attempt + 1}/{max_retries} fallito, retry in {retry_delay}s...")
-                        await asyncio.sleep(retry_delay)
+            session = get_http_session("wikipedia")
+            async with session.get(
+                "https://it.wikipedia.org/api/rest_v1/page/summary/Italia",
+                timeout=aiohttp.ClientTimeout(total=5),
+                headers={"User-Agent": "whatis-backend-semantic/1.0"}
+            ) as response:
+                if response.status == 200:
+                    provider_status["wikipedia"] = True
+                    logger.logger.info("🟢 Wikipedia attivo")
+                    break
+                elif attempt < max_retries - 1:
+                    logger.logger.warning(f"⚠️ Wikipedia tentativo {attempt + 1}/{max_retries} fallito, retry in {retry_delay}s...")
+                    await asyncio.sleep(retry_delay)
         except Exception as e:
             if attempt < max_retries - 1:
                 logger.logger.warning(f"⚠️ Wikipedia tentativo {attempt + 1}/{max_retries} fallito: {e}, retry in {retry_delay}s...")
@@ -515,11 +710,8 @@ async def verify_external_services():
     # Test Wikidata SPARQL
     for attempt in range(max_retries):
         try:
-            from SPARQLWrapper import SPARQLWrapper, JSON
-            sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-            sparql.setReturnFormat(JSON)
-            sparql.setQuery("SELECT ?item WHERE { ?item wdt:P31 wd:Q23413 } LIMIT 1")
-            results = sparql.query().convert()
+            sparql = SparqlClient(WIKIDATA_SPARQL_ENDPOINT, timeout=10)
+            results = await sparql.select("SELECT ?item WHERE { ?item wdt:P31 wd:Q23413 } LIMIT 1")
             if results:
                 provider_status["wikidata"] = True
                 logger.logger.info("🟢 Wikidata attivo")
@@ -537,11 +729,8 @@ async def verify_external_services():
     # Test DBpedia SPARQL
     for attempt in range(max_retries):
         try:
-            from SPARQLWrapper import SPARQLWrapper, JSON
-            sparql = SPARQLWrapper("https://dbpedia.org/sparql")
-            sparql.setReturnFormat(JSON)
-            sparql.setQuery("SELECT ?s WHERE { ?s rdf:type <http://dbpedia.org/ontology/Monument> } LIMIT 1")
-            results = sparql.query().convert()
+            sparql = SparqlClient(DBPEDIA_SPARQL_ENDPOINT, timeout=10)
+            results = await sparql.select("SELECT ?s WHERE { ?s rdf:type <http://dbpedia.org/ontology/Monument> } LIMIT 1")
             if results:
                 provider_status["dbpedia"] = True
                 logger.logger.info("🟢 DBpedia attivo")
@@ -0,0 +1,234 @@
+import json
+import math
+import os
+import threading
+import time
+import numpy as np
+import shapely
+from shapely.geometry import shape, box, Polygon
+from shapely.geometry.polygon import orient
+from typing import List, Dict, Any, Optional, Tuple, Set
+from .utils import SemanticLogger
+
+logger = SemanticLogger()
+
+# GeoJSON (EPSG:4326) delle linee di costa OSM (natural=coastline, terra a sinistra del verso della linea),
+# es. coastlines-split-4326 di osmdata.openstreetmap.de convertito con ogr2ogr.
+# Se assente, la costa è ricavata dal bordo dei poligoni di terraferma della maschera terra/mare.
+COASTLINE_PATH = os.getenv("COASTLINE_PATH", "../data/coastlines.geojson")
+COASTLINE_BBOX = os.getenv("COASTLINE_BBOX", os.getenv("LAND_POLYGONS_BBOX", ""))
+# Distanza entro cui una zona è considerata costiera
+COAST_NEAR_KM = float(os.getenv("COAST_NEAR_KM", "10"))
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG_EQUATOR = 111.320
+# Componente minima (coseno ~67°) della normale di un segmento perché il segmento guardi verso un lato
+SEA_SIDE_MIN_COMPONENT = 0.38
+# Frazione minima della costa vicina (in lunghezza) rivolta verso un lato perché il lato venga esteso
+SEA_SIDE_MIN_SHARE = float(os.getenv("SEA_SIDE_MIN_SHARE", "0.15"))
+SIDES = ("north", "south", "east", "west")
+
+def _parse_bbox(value: str) -> Optional[Tuple[float, float, float, float]]:
+    if not value.strip():
+        return None
+    south, west, north, east = (float(part) for part in value.split(","))
+    return south, west, north, east
+
+class CoastInfo:
+    """Relazione di una zona con la costa: distanza minima e quota della costa vicina rivolta verso ogni lato"""
+    __slots__ = ("distance_km", "side_shares", "segments")
+
+    def __init__(self, distance_km: float, side_shares: Dict[str, float], segments: int):
+        self.distance_km = distance_km
+        self.side_shares = side_shares
+        self.segments = segments
+
+    def sea_sides(self, min_share: float = SEA_SIDE_MIN_SHARE) -> Set[str]:
+        """Lati del bbox ("north", "south", "east", "west") verso cui si trova il mare
+
+        Unione dei lati guardati da una quota sufficiente della costa vicina: su penisole e
+        promontori (es. Portofino) il mare è da più lati e le normali opposte non si annullano.
+        Se nessun lato supera la soglia la zona resta costiera e il mare è considerato su tutti i lati.
+        """
+        sides = {side for side, share in self.side_shares.items() if share >= min_share}
+        return sides or set(SIDES)
+
+class CoastlineIndex:
+    """Indice dei segmenti di costa (STRtree) per le domande geografiche sulle zone marine
+
+    - la zona è entro N km dalla costa?
+    - da che parte si trova il mare? (normali destre dei segmenti vicini, per lato la quota
+      della lunghezza di costa rivolta verso quel lato: per convenzione OSM la terra è a
+      sinistra della linea)
+    Le distanze sono calcolate in una proiezione equirettangolare locale in km.
+    """
+
+    def __init__(self, path: str = COASTLINE_PATH, bbox: Optional[Tuple[float, float, float, float]] = None,
+                 land_polygons: Optional[np.ndarray] = None):
+        self.path = path
+        self.bbox = bbox
+        self.source = None
+        self.segments = 0
+        self.load_seconds = 0.0
+        self.queries = 0
+        self._starts: Optional[np.ndarray] = None  # (N, 2) lng, lat
+        self._ends: Optional[np.ndarray] = None
+        self._tree: Optional[shapely.STRtree] = None
+        self._load(land_polygons)
+
+    @property
+    def available(self) -> bool:
+        return self._tree is not None
+
+    def _load(self, land_polygons: Optional[np.ndarray]):
+        started = time.monotonic()
+        try:
+            if self.path and os.path.exists(self.path):
+                lines = self._read_coastlines()
+                self.source = self.path
+            elif land_polygons is not None and len(land_polygons):
+                lines = self._coastlines_from_land(land_polygons)
+                self.source = "land_polygons"
+            else:
+                logger.logger.warning(f"🏖️ Linee di costa non trovate ({self.path}) e maschera terra/mare "
+                                      f"assente: rilevamento costa semplificato")
+                return
+
+            starts, ends = [], []
+            for coords in lines:
+                if len(coords) < 2:
+                    continue
+                starts.append(coords[:-1])
+                ends.append(coords[1:])
+            if not starts:
+                return
+            self._starts = np.concatenate(starts)
+            self._ends = np.concatenate(ends)
+            self._tree = shapely.STRtree(shapely.linestrings(np.stack([self._starts, self._ends], axis=1)))
+            self.segments = len(self._starts)
+            self.load_seconds = round(time.monotonic() - started, 3)
+            logger.logger.info(f"🏖️ Indice costa caricato ({self.source}): {self.segments} segmenti "
+                               f"in {self.load_seconds}s")
+        except Exception as e:
+            self._tree = None
+            logger.log_error("Coastline Index", f"{self.path}: {e}", "")
+
+    def _read_coastlines(self) -> List[np.ndarray]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        features = data.get("features", []) if data.get("type") == "FeatureCollection" else [data]
+        clip = box(self.bbox[1], self.bbox[0], self.bbox[3], self.bbox[2]) if self.bbox else None
+
+        lines = []
+        for feature in features:
+            geometry = feature.get("geometry", feature)
+            if not geometry:
+                continue
+            line = shape(geometry)
+            if line.is_empty or (clip is not None and not line.intersects(clip)):
+                continue
+            parts = line.geoms if hasattr(line, "geoms") else [line]
+            lines.extend(np.asarray(part.coords)[:, :2] for part in parts)
+        return lines
+
+    def _coastlines_from_land(self, land_polygons: np.ndarray) -> List[np.ndarray]:
+        """Bordi dei poligoni di terraferma orientati con la terra a sinistra
+
+        L'unione elimina i lati artificiali dei poligoni suddivisi a griglia.
+        """
+        merged = shapely.union_all(land_polygons)
+        polygons = merged.geoms if hasattr(merged, "geoms") else [merged]
+        lines = []
+        for polygon in polygons:
+            if not isinstance(polygon, Polygon) or polygon.is_empty:
+                continue
+            polygon = orient(polygon, sign=1.0)  # esterno antiorario, buchi orari: terra sempre a sinistra
+            lines.append(np.asarray(polygon.exterior.coords)[:, :2])
+            lines.extend(np.asarray(ring.coords)[:, :2] for ring in polygon.interiors)
+        return lines
+
+    def covers(self, polygon: List[List[float]]) -> bool:
+        """True se l'indice è caricato e copre la zona (dentro il bbox caricato)"""
+        if not self.available or not polygon:
+            return False
+        if self.bbox is None:
+            return True
+        south, west, north, east = self.bbox
+        return all(south <= lat <= north and west <= lng <= east for lat, lng in ((p[0], p[1]) for p in polygon))
+
+    def coast_info(self, polygon: List[List[float]], max_km: float = COAST_NEAR_KM) -> Optional[CoastInfo]:
+        """Distanza dalla costa e direzione del mare per una zona (None se nessuna costa entro max_km)"""
+        if not self.available or not polygon:
+            return None
+        self.queries += 1
+        coords = np.array([[p[1], p[0]] for p in polygon], dtype=float)
+        lng0, lat0 = coords.mean(axis=0)
+        km_per_deg_lng = KM_PER_DEG_LNG_EQUATOR * max(math.cos(math.radians(lat0)), 0.01)
+
+        south, west = coords[:, 1].min(), coords[:, 0].min()
+        north, east = coords[:, 1].max(), coords[:, 0].max()
+        pad_lat, pad_lng = max_km / KM_PER_DEG_LAT, max_km / km_per_deg_lng
+        candidates = self._tree.query(box(west - pad_lng, south - pad_lat, east + pad_lng, north + pad_lat))
+        if len(candidates) == 0:
+            return None
+
+        def to_km(points: np.ndarray) -> np.ndarray:
+            return np.column_stack(((points[:, 0] - lng0) * km_per_deg_lng, (points[:, 1] - lat0) * KM_PER_DEG_LAT))
+
+        zone = shapely.polygons(to_km(coords)) if len(coords) >= 3 else shapely.linestrings(to_km(coords))
+        starts, ends = to_km(self._starts[candidates]), to_km(self._ends[candidates])
+        distances = shapely.distance(zone, shapely.linestrings(np.stack([starts, ends], axis=1)))
+        near = distances <= max_km
+        if not near.any():
+            return None
+
+        # Normale destra (verso il mare) di ogni segmento: (dy, -dx) / lunghezza
+        deltas = ends[near] - starts[near]
+        lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+        valid = lengths > 1e-9
+        total = float(lengths[valid].sum())
+        east = deltas[valid, 1] / lengths[valid]
+        north = -deltas[valid, 0] / lengths[valid]
+        facing = {
+            "north": north >= SEA_SIDE_MIN_COMPONENT,
+            "south": north <= -SEA_SIDE_MIN_COMPONENT,
+            "east": east >= SEA_SIDE_MIN_COMPONENT,
+            "west": east <= -SEA_SIDE_MIN_COMPONENT,
+        }
+        shares = {side: (float(lengths[valid][mask].sum()) / total if total > 0 else 0.0)
+                  for side, mask in facing.items()}
+        return CoastInfo(float(distances[near].min()), shares, int(near.sum()))
+
+    def is_near_coast(self, polygon: List[List[float]], max_km: float = COAST_NEAR_KM) -> bool:
+        return self.coast_info(polygon, max_km) is not None
+
+    def sea_sides(self, polygon: List[List[float]], max_km: float = COAST_NEAR_KM) -> Set[str]:
+        """Lati del bbox della zona verso cui si trova il mare (vuoto se la zona non è costiera)"""
+        info = self.coast_info(polygon, max_km)
+        return info.sea_sides() if info else set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "source": self.source,
+            "bbox": self.bbox,
+            "segments": self.segments,
+            "load_seconds": self.load_seconds,
+            "queries": self.queries
+        }
+
+_coastline_index: Optional[CoastlineIndex] = None
+_coastline_lock = threading.Lock()
+
+def get_coastline_index() -> CoastlineIndex:
+    """Indice della costa del processo (caricato al primo uso, di norma allo startup)"""
+    global _coastline_index
+    if _coastline_index is None:
+        with _coastline_lock:
+            if _coastline_index is None:
+                land_polygons = None
+                if not (COASTLINE_PATH and os.path.exists(COASTLINE_PATH)):
+                    from .land_water import get_land_water_mask
+                    land_polygons = get_land_water_mask().geometries()
+                _coastline_index = CoastlineIndex(bbox=_parse_bbox(COASTLINE_BBOX), land_polygons=land_polygons)
+    return _coastline_index
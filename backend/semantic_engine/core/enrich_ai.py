@@ -1,8 +1,8 @@
 import asyncio
-import aiohttp
 import json
 from typing import List, Dict, Any, Optional
 from .utils import SemanticLogger
+from .http_pool import get_http_session
 
 logger = SemanticLogger()
 
@@ -20,12 +20,12 @@ class POIEnricher:
         }
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session("web")
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     async def enrich_poi_batch(self, pois: List[Dict], zone_name: str = "") -> List[Dict]:
         """Arricchisce un batch di POI"""
@@ -21,7 +21,8 @@ from urllib.parse import quote, urljoin
 from bs4 import BeautifulSoup
 import logging
 
-from .utils import SemanticLogger
+from .utils import SemanticLogger, deadline_expired, mark_truncated
+from .http_pool import get_http_session
 
 logger = SemanticLogger()
 
@@ -44,23 +45,22 @@ class ExtendedWebEnricher:
     def __init__(self, enabled: bool = False):
         self.enabled = enabled
         self.session = None
+        self.timeout = aiohttp.ClientTimeout(total=10)
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (compatible; whatis-backend-semantic/1.0; +http://whatis-backend.local/)"
+        }
         self.max_snippets = 5
         self.snippet_max_length = 500
         self.summary_max_length = 600
         
     async def __aenter__(self):
         if self.enabled:
-            self.session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=10),
-                headers={
-                    "User-Agent": "Mozilla/5.0 (compatible; whatis-backend-semantic/1.0; +http://whatis-backend.local/)"
-                }
-            )
+            self.session = get_http_session("web")
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     async def enrich_poi_description(self, poi: Dict, zone_name: str = "", municipality: str = "") -> Optional[str]:
         """
@@ -225,7 +225,7 @@ class ExtendedWebEnricher:
                 "skip_disambig": "1"
             }
             
-            async with self.session.get(url, params=params) as response:
+            async with self.session.get(url, params=params, headers=self.headers, timeout=self.timeout) as response:
                 if response.status == 200:
                     data = await response.json()
                     
@@ -294,7 +294,8 @@ class ExtendedWebEnricher:
                     # Costruisci URL di ricerca (formato semplificato)
                     search_url = f"https://{domain}/search?q={quote(query)}"
                     
-                    async with self.session.get(search_url, allow_redirects=True) as response:
+                    async with self.session.get(search_url, allow_redirects=True,
+                                                headers=self.headers, timeout=self.timeout) as response:
                         if response.status == 200:
                             content = await response.text()
                             snippets_found = await self._extract_snippets_from_html(content, query, poi_name, domain)
@@ -639,6 +640,12 @@ async def enrich_poi_batch_with_extended_search(pois: List[Dict], zone_name: str
                         enriched_pois.append(poi)
                         continue
                     
+                    if deadline_expired():
+                        # Tempo della richiesta esaurito, mantieni originale
+                        mark_truncated("extended_enrichment")
+                        enriched_pois.append(poi)
+                        continue
+                    
                     enriched_description = await enricher.enrich_poi_description(poi, zone_name, municipality)
                     
                     if enriched_description:
@@ -1,9 +1,8 @@
-import asyncio
-import aiohttp
 from typing import List, Dict, Any, Optional, Tuple
-from geopy.geocoders import Nominatim
-from .utils import SemanticLogger, point_in_polygon
+from .utils import SemanticLogger, zone_geometry, deadline_expired, mark_truncated, mark_failed, set_zone_geometry, reset_zone_geometry
 from .osm_query import discover_municipalities
+from .http_pool import get_http_session
+from .nominatim_client import get_nominatim_client, NominatimError
 
 logger = SemanticLogger()
 
@@ -11,7 +10,8 @@ class MunicipalityDiscoverer:
     """Scopre e organizza comuni e frazioni in una zona geografica"""
     
     def __init__(self):
-        self.geocoder = Nominatim(user_agent="whatis_semantic_engine")
+        # Client Nominatim condiviso: rate limit di processo (1 req/s) e cache delle ricerche
+        self.geocoder = get_nominatim_client()
         self.session = None
         
         # Database di associazioni frazione -> comune per l'area ligure
@@ -35,12 +35,12 @@ class MunicipalityDiscoverer:
         }
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session("nominatim")
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     async def discover_municipalities_in_zone(self, 
                                             polygon: List[List[float]],
@@ -80,6 +80,7 @@ class MunicipalityDiscoverer:
             
         except Exception as e:
             logger.log_error("Municipality Discovery", str(e), zone_name)
+            mark_failed("municipalities")
             return []
     
     async def _geocode_discovery(self, zone_name: str, polygon: List[List[float]]) -> List[Dict]:
@@ -92,30 +93,21 @@ class MunicipalityDiscoverer:
         try:
             # Cerca località con termini geografici
             search_terms = self._build_municipality_search_terms(zone_name)
+            found_locations = []
             
             for term in search_terms:
+                if deadline_expired():
+                    # Tempo della richiesta esaurito: restituisci i comuni trovati finora
+                    mark_truncated("municipalities")
+                    break
                 try:
                     # ✅ FIX: Try/except robusto su chiamate HTTP Nominatim
-                    locations = self.geocoder.geocode(
-                        term, 
-                        exactly_one=False,
-                        limit=5,
-                        country_codes="IT",
-                        timeout=3  # ✅ FIX: Timeout 3s
-                    )
+                    locations = await self.geocoder.search(term, limit=5, country_codes="IT")
                     
                     if locations:
-                        for location in locations:
-                            municipality = await self._process_geocoded_location(
-                                location, polygon
-                            )
-                            if municipality:
-                                municipalities.append(municipality)
-                    
-                    # Rate limiting per Nominatim
-                    await asyncio.sleep(1)
+                        found_locations.extend(locations)
                     
-                except (TimeoutError, ConnectionError) as e:
+                except (NominatimError, TimeoutError, ConnectionError) as e:
                     # ✅ FIX: Log come warning, non error, e continua senza bloccare
                     logger.logger.warning(f"Geocoding timeout/connection for '{term}': {e} - continua senza bloccare")
                     continue
@@ -123,6 +115,12 @@ class MunicipalityDiscoverer:
                     # ✅ FIX: Log come warning, non error, e continua senza bloccare
                     logger.logger.warning(f"Geocoding error for '{term}': {e} - continua senza bloccare")
                     continue
+            
+            # Verifica se sono nel poligono: un solo test vettoriale per tutte le località trovate
+            for location in zone_geometry(polygon).filter_pois(found_locations, lng_key="lon"):
+                municipality = await self._process_geocoded_location(location)
+                if municipality:
+                    municipalities.append(municipality)
                     
         except Exception as e:
             # ✅ FIX: Log come warning, non error, e continua senza bloccare
@@ -153,18 +151,14 @@ class MunicipalityDiscoverer:
         
         return terms
     
-    async def _process_geocoded_location(self, location, polygon: List[List[float]]) -> Optional[Dict]:
-        """Processa una location da geocoding"""
+    async def _process_geocoded_location(self, location: Dict) -> Optional[Dict]:
+        """Processa un risultato di geocoding Nominatim (jsonv2 con addressdetails) già dentro la zona"""
         try:
-            lat, lng = location.latitude, location.longitude
-            
-            # Verifica se è nel poligono
-            if not point_in_polygon((lat, lng), polygon):
-                return None
+            lat, lng = float(location["lat"]), float(location["lon"])
             
             # Estrai informazioni amministrative
-            address = location.raw.get('address', {})
-            display_name = location.address
+            address = location.get('address', {})
+            display_name = location.get('display_name', '')
             
             # Determina nome e tipo del luogo
             place_name = self._extract_place_name(address, display_name)
@@ -391,17 +385,21 @@ class MunicipalityAnalyzer:
 async def discover_zone_municipalities(polygon: List[List[float]], 
                                      zone_name: str = "") -> List[Dict]:
     """Scopre tutti i comuni in una zona"""
-    async with MunicipalityDiscoverer() as discoverer:
-        municipalities = await discoverer.discover_municipalities_in_zone(
-            polygon, zone_name
-        )
-        
-        # Classifica per turismo
-        municipalities = MunicipalityAnalyzer.classify_by_tourism(municipalities)
-        
-        # Aggiungi contesto geografico
-        municipalities = MunicipalityAnalyzer.add_geographic_context(
-            municipalities, zone_name
-        )
-        
-        return municipalities
+    zone_token = set_zone_geometry(polygon)  # Poligono preparato per i filtri della scoperta
+    try:
+        async with MunicipalityDiscoverer() as discoverer:
+            municipalities = await discoverer.discover_municipalities_in_zone(
+                polygon, zone_name
+            )
+            
+            # Classifica per turismo
+            municipalities = MunicipalityAnalyzer.classify_by_tourism(municipalities)
+            
+            # Aggiungi contesto geografico
+            municipalities = MunicipalityAnalyzer.add_geographic_context(
+                municipalities, zone_name
+            )
+            
+            return municipalities
+    finally:
+        reset_zone_geometry(zone_token)
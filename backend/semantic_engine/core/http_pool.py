@@ -0,0 +1,148 @@
+import asyncio
+import os
+import aiohttp
+from typing import Dict, Any, Optional
+from .utils import SemanticLogger
+
+logger = SemanticLogger()
+
+# Limiti connessioni per upstream (totali / per host): le API pubbliche hanno policy diverse
+UPSTREAM_LIMITS = {
+    "overpass": {"limit": 8, "limit_per_host": 4},
+    "wikipedia": {"limit": 32, "limit_per_host": 16},
+    "wikidata": {"limit": 8, "limit_per_host": 4},
+    "dbpedia": {"limit": 8, "limit_per_host": 4},
+    "nominatim": {"limit": 2, "limit_per_host": 2},
+    "web": {"limit": 64, "limit_per_host": 8},
+    "internal": {"limit": 16, "limit_per_host": 16},  # Backend Node.js locale (es. Google CSE)
+}
+
+DNS_CACHE_TTL_SECONDS = int(os.getenv("HTTP_POOL_DNS_TTL_S", "300"))
+KEEPALIVE_TIMEOUT_SECONDS = float(os.getenv("HTTP_POOL_KEEPALIVE_S", "30"))
+
+def _upstream_limits(upstream: str) -> Dict[str, int]:
+    """Limiti dell'upstream, sovrascrivibili via env (es. HTTP_POOL_OVERPASS_LIMIT=16)"""
+    limits = dict(UPSTREAM_LIMITS.get(upstream, UPSTREAM_LIMITS["web"]))
+    prefix = f"HTTP_POOL_{upstream.upper()}"
+    limits["limit"] = int(os.getenv(f"{prefix}_LIMIT", limits["limit"]))
+    limits["limit_per_host"] = int(os.getenv(f"{prefix}_LIMIT_PER_HOST", limits["limit_per_host"]))
+    return limits
+
+class HTTPClientRegistry:
+    """Registro delle sessioni HTTP condivise dall'applicazione (una per upstream)
+
+    Creato allo startup di FastAPI e chiuso allo shutdown: ogni componente
+    prende la sessione dell'upstream che interroga invece di aprirne una propria,
+    riusando connessioni keep-alive e cache DNS tra richieste diverse.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def startup(self):
+        """Crea le sessioni per tutti gli upstream noti"""
+        for upstream in UPSTREAM_LIMITS:
+            self.get_session(upstream)
+        logger.logger.info(f"🌐 HTTP pool inizializzato: {', '.join(UPSTREAM_LIMITS)}")
+
+    async def shutdown(self):
+        """Chiude tutte le sessioni"""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        logger.logger.info("🌐 HTTP pool chiuso")
+
+    def get_session(self, upstream: str) -> aiohttp.ClientSession:
+        """Sessione condivisa per l'upstream (creata alla prima richiesta se necessario)"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Nuovo event loop (es. script con più asyncio.run): le sessioni precedenti non sono riusabili
+            self._discard_sessions()
+            self._loop = loop
+
+        session = self._sessions.get(upstream)
+        if session is None or session.closed:
+            session = self._create_session(upstream)
+            self._sessions[upstream] = session
+        return session
+
+    def _discard_sessions(self):
+        """Chiude le sessioni legate al loop precedente (senza lasciare connettori aperti)"""
+        old_loop = self._loop
+        sessions = [session for session in self._sessions.values() if not session.closed]
+        self._sessions.clear()
+        for session in sessions:
+            if old_loop is not None and old_loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), old_loop)
+                continue
+            try:
+                # Loop fermo o chiuso: chiusura sincrona del connettore (la sessione risulta chiusa)
+                session.connector.close()
+            except Exception as e:
+                logger.logger.warning(f"🌐 HTTP pool: chiusura sessione del loop precedente fallita: {e}")
+
+    def _create_session(self, upstream: str) -> aiohttp.ClientSession:
+        limits = _upstream_limits(upstream)
+        connector = aiohttp.TCPConnector(
+            limit=limits["limit"],
+            limit_per_host=limits["limit_per_host"],
+            ttl_dns_cache=DNS_CACHE_TTL_SECONDS,
+            keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config(upstream)])
+
+    def _trace_config(self, upstream: str) -> aiohttp.TraceConfig:
+        """Contatori di utilizzo del pool (richieste, connessioni nuove/riusate, DNS)"""
+        counters = self._counters.setdefault(upstream, {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+            "queued": 0
+        })
+
+        def _counter(name: str):
+            async def _increment(session, context, params):
+                counters[name] += 1
+            return _increment
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(_counter("requests"))
+        trace_config.on_connection_create_end.append(_counter("connections_created"))
+        trace_config.on_connection_reuseconn.append(_counter("connections_reused"))
+        trace_config.on_dns_cache_hit.append(_counter("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(_counter("dns_cache_misses"))
+        trace_config.on_connection_queued_start.append(_counter("queued"))
+        return trace_config
+
+    def stats(self) -> Dict[str, Any]:
+        """Utilizzo del pool per upstream"""
+        stats = {}
+        for upstream, session in self._sessions.items():
+            connector = session.connector
+            limits = _upstream_limits(upstream)
+            in_use = len(getattr(connector, "_acquired", ()))
+            idle = sum(len(connections) for connections in getattr(connector, "_conns", {}).values())
+            stats[upstream] = {
+                **limits,
+                "in_use": in_use,
+                "idle": idle,
+                "utilisation": round(in_use / limits["limit"], 3) if limits["limit"] else 0.0,
+                **self._counters.get(upstream, {})
+            }
+        return stats
+
+_registry = HTTPClientRegistry()
+
+def get_http_registry() -> HTTPClientRegistry:
+    """Registro HTTP dell'applicazione (singleton di processo)"""
+    return _registry
+
+def get_http_session(upstream: str) -> aiohttp.ClientSession:
+    """Sessione condivisa per un upstream: overpass, wikipedia, wikidata, dbpedia, nominatim, web, internal"""
+    return _registry.get_session(upstream)
@@ -0,0 +1,116 @@
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, List, Optional
+import aiohttp
+
+STREAM_CHUNK_SIZE = 64 * 1024
+OSM_BASE = re.compile(r'"timestamp_osm_base"\s*:\s*"([^"]+)"')
+REMARK = re.compile(r'"remark"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+class JsonArrayStream:
+    """Parser JSON incrementale per risposte del tipo {..., "<key>": [ {...}, {...} ], ...}
+
+    Gli elementi dell'array vengono restituiti man mano che arrivano i chunk,
+    senza costruire in memoria l'intero documento (risultati SPARQL, elementi Overpass).
+    Il testo prima dell'array resta in `prefix`, quello dopo in `suffix`
+    (es. intestazione "osm3s" e "remark" di Overpass).
+    Gli elementi dell'array devono essere oggetti o liste JSON.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._marker = f'"{key}"'
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = "prefix"  # prefix | items | done
+        self.prefix = ""
+        self.suffix = ""
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    @property
+    def osm_base(self) -> Optional[str]:
+        """Data dei dati OSM del server Overpass (osm3s.timestamp_osm_base nel prefisso)"""
+        match = OSM_BASE.search(self.prefix)
+        return match.group(1) if match else None
+
+    @property
+    def remark(self) -> Optional[str]:
+        """Messaggio "remark" di Overpass dopo l'array (es. runtime error per timeout o memoria)"""
+        match = REMARK.search(self.suffix)
+        return json.loads(match.group(1)) if match else None
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Aggiunge un chunk di byte e restituisce gli elementi completati"""
+        text = self._text.decode(chunk)
+        if self._state == "done":
+            self.suffix += text
+            return []
+
+        self._buffer += text
+        items = []
+
+        if self._state == "prefix":
+            marker_at = self._buffer.find(self._marker)
+            if marker_at < 0:
+                return items
+            bracket_at = self._buffer.find("[", marker_at + len(self._marker))
+            if bracket_at < 0:
+                return items
+            self.prefix = self._buffer[:marker_at]
+            self._buffer = self._buffer[bracket_at + 1:]
+            self._state = "items"
+
+        buffer = self._buffer
+        size = len(buffer)
+        position = 0
+        while True:
+            while position < size and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= size:
+                break
+            if buffer[position] == "]":
+                self._state = "done"
+                self.suffix = buffer[position + 1:]
+                position = size
+                break
+            try:
+                item, position_end = self._decoder.raw_decode(buffer, position)
+            except ValueError:
+                # Elemento incompleto: attende il chunk successivo
+                break
+            items.append(item)
+            position = position_end
+
+        self._buffer = buffer[position:]
+        return items
+
+    def finish(self):
+        """Fine del corpo: solleva ValueError se l'array non è stato chiuso (risposta troncata)"""
+        self.feed(b"")
+        tail = self._text.decode(b"", final=True)
+        if self._state == "done":
+            self.suffix += tail
+            return
+        raise ValueError(f'risposta JSON troncata: array "{self.key}" non chiuso')
+
+    async def iterate(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+        """Elementi dell'array dai blocchi di byte (risposta HTTP o file), poi finish()"""
+        async for chunk in chunks:
+            for item in self.feed(chunk):
+                yield item
+        self.finish()
+
+async def iter_json_array(response: aiohttp.ClientResponse, key: str,
+                          chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[Any]:
+    """Itera gli elementi dell'array `key` del corpo JSON di una risposta aiohttp
+
+    Solleva ValueError se il corpo finisce prima della chiusura dell'array (es. timeout
+    di WDQS: HTTP 200 con JSON a metà seguito dallo stack trace), dopo gli elementi completi.
+    """
+    async for item in JsonArrayStream(key).iterate(response.content.iter_chunked(chunk_size)):
+        yield item
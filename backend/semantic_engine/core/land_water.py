@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import numpy as np
+import shapely
+from shapely.geometry import shape, box
+from typing import List, Dict, Any, Optional, Tuple, Sequence
+from .utils import SemanticLogger
+
+logger = SemanticLogger()
+
+# GeoJSON (EPSG:4326) dei poligoni di terraferma, es. estratto di land-polygons-split-4326
+# di osmdata.openstreetmap.de convertito con `ogr2ogr -f GeoJSON land.geojson land_polygons.shp`
+LAND_POLYGONS_PATH = os.getenv("LAND_POLYGONS_PATH", "../data/land_polygons.geojson")
+# Facoltativo "south,west,north,east": carica solo i poligoni dell'area servita (meno memoria)
+LAND_POLYGONS_BBOX = os.getenv("LAND_POLYGONS_BBOX", "")
+
+def _parse_bbox(value: str) -> Optional[Tuple[float, float, float, float]]:
+    if not value.strip():
+        return None
+    south, west, north, east = (float(part) for part in value.split(","))
+    return south, west, north, east
+
+class LandWaterMask:
+    """Classificatore terra/mare offline basato sui poligoni di terraferma
+
+    I poligoni vengono caricati una volta sola in uno STRtree (shapely 2, preparati):
+    la classificazione di centinaia di punti è una sola query vettoriale, senza rete.
+    Un punto è "in acqua" se non interseca alcun poligono di terraferma; fuori dal
+    bbox caricato il risultato non è affidabile (vedi covers_batch).
+    """
+
+    def __init__(self, path: str = LAND_POLYGONS_PATH, bbox: Optional[Tuple[float, float, float, float]] = None):
+        self.path = path
+        self.bbox = bbox
+        self.polygons = 0
+        self.load_seconds = 0.0
+        self.points_classified = 0
+        self._tree: Optional[shapely.STRtree] = None
+        self._load()
+
+    @property
+    def available(self) -> bool:
+        return self._tree is not None
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            logger.logger.warning(f"🌊 Poligoni terraferma non trovati ({self.path}): "
+                                  f"validazione mare tramite Nominatim")
+            return
+        started = time.monotonic()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            features = data.get("features", []) if data.get("type") == "FeatureCollection" else [data]
+            clip = box(self.bbox[1], self.bbox[0], self.bbox[3], self.bbox[2]) if self.bbox else None
+
+            geometries = []
+            for feature in features:
+                geometry = feature.get("geometry", feature)
+                if not geometry:
+                    continue
+                polygon = shape(geometry)
+                if polygon.is_empty or (clip is not None and not polygon.intersects(clip)):
+                    continue
+                geometries.append(polygon)
+
+            geometries = np.array(geometries, dtype=object)
+            shapely.prepare(geometries)
+            self._tree = shapely.STRtree(geometries)
+            self.polygons = len(geometries)
+            self.load_seconds = round(time.monotonic() - started, 3)
+            logger.logger.info(f"🌊 Maschera terra/mare caricata: {self.polygons} poligoni in {self.load_seconds}s")
+        except Exception as e:
+            self._tree = None
+            logger.log_error("Land/Water Mask", f"{self.path}: {e}", "")
+
+    def geometries(self) -> Optional[np.ndarray]:
+        """Poligoni di terraferma caricati (None se la maschera non è disponibile)"""
+        return self._tree.geometries if self.available else None
+
+    def covers_batch(self, lats: Sequence[float], lngs: Sequence[float]) -> np.ndarray:
+        """Punti per cui la maschera è affidabile (dentro il bbox caricato)"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        if not self.available:
+            return np.zeros(len(lats), dtype=bool)
+        if self.bbox is None:
+            return np.ones(len(lats), dtype=bool)
+        south, west, north, east = self.bbox
+        return (lats >= south) & (lats <= north) & (lngs >= west) & (lngs <= east)
+
+    def is_in_water_batch(self, lats: Sequence[float], lngs: Sequence[float]) -> np.ndarray:
+        """True per i punti che non cadono su terraferma (una sola query STRtree per tutti i punti)"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        water = np.ones(len(lats), dtype=bool)
+        if not self.available or len(lats) == 0:
+            return water
+        points = shapely.points(lngs, lats)
+        point_indices, _ = self._tree.query(points, predicate="intersects")
+        water[point_indices] = False
+        self.points_classified += len(lats)
+        return water
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "path": self.path,
+            "bbox": self.bbox,
+            "polygons": self.polygons,
+            "load_seconds": self.load_seconds,
+            "points_classified": self.points_classified
+        }
+
+_land_water_mask: Optional[LandWaterMask] = None
+_land_water_lock = threading.Lock()
+
+def get_land_water_mask() -> LandWaterMask:
+    """Maschera terra/mare del processo (caricata al primo uso, di norma allo startup)"""
+    global _land_water_mask
+    if _land_water_mask is None:
+        with _land_water_lock:
+            if _land_water_mask is None:
+                _land_water_mask = LandWaterMask(bbox=_parse_bbox(LAND_POLYGONS_BBOX))
+    return _land_water_mask
+
+async def classify_water(points: List[Tuple[float, float]]) -> List[bool]:
+    """Classifica terra/mare di più punti (lat, lng)
+
+    Con la maschera offline i punti coperti sono classificati in blocco senza rete;
+    gli altri (maschera assente o punto fuori dal bbox caricato) passano dal reverse
+    geocoding Nominatim di is_in_water, in parallelo dietro al rate limit condiviso.
+    """
+    if not points:
+        return []
+    from .utils import is_in_water  # import locale: utils.is_in_water usa questo modulo
+
+    mask = get_land_water_mask()
+    lats = [lat for lat, _ in points]
+    lngs = [lng for _, lng in points]
+    water = mask.is_in_water_batch(lats, lngs).tolist()
+    uncovered = [index for index, covered in enumerate(mask.covers_batch(lats, lngs)) if not covered]
+    if uncovered:
+        remote = await asyncio.gather(*(is_in_water(*points[index]) for index in uncovered))
+        for index, value in zip(uncovered, remote):
+            water[index] = value
+    return water
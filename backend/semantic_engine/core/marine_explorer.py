@@ -1,16 +1,17 @@
 import asyncio
-import aiohttp
 import json
-from typing import List, Dict, Any, Optional, Tuple
-from .utils import SemanticLogger, GeoBoundingBox, POIValidator, point_in_polygon
+from typing import List, Dict, Any, Optional, Tuple, Awaitable
+from .utils import SemanticLogger, GeoBoundingBox, POIValidator, POIDeduplicator, zone_geometry, deadline_expired, mark_failed
 from .osm_query import OSMDataExtractor
+from .http_pool import get_http_session
+from .coastline import get_coastline_index
 
 logger = SemanticLogger()
 
 class MarineAreaDetector:
     """Rileva se una zona tocca il mare e calcola estensioni marine"""
     
-    # Coordinate approssimative della costa ligure per rilevamento
+    # Coordinate approssimative della costa ligure per rilevamento (senza indice della costa)
     LIGURIAN_COAST_BOUNDS = {
         "north": 44.3,
         "south": 43.5,
@@ -20,7 +21,11 @@ class MarineAreaDetector:
     
     @staticmethod
     def is_coastal_zone(polygon: List[List[float]]) -> bool:
-        """Determina se una zona tocca la costa"""
+        """Determina se una zona tocca la costa (indice della costa, o zone note liguri se non disponibile)"""
+        index = get_coastline_index()
+        if index.covers(polygon):
+            return index.is_near_coast(polygon)
+        
         bounds = MarineAreaDetector.LIGURIAN_COAST_BOUNDS
         
         for point in polygon:
@@ -158,12 +163,12 @@ class MarinePOICollector:
         }
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session("overpass")
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     # ✅ FIX MarineAudit: Metodi collect_marine_pois() e deep_marine_search() rimossi - ridondanti
     # Usa direttamente la funzione globale deep_marine_search()
@@ -192,12 +197,11 @@ class MarinePOICollector:
             # (il database locale è principalmente per zone liguri, ma può essere esteso per altre zone)
         
         # Filtra per poligono (universale - qualsiasi zona nel mondo)
-        for poi in candidate_pois:
-            if point_in_polygon((poi["lat"], poi["lng"]), polygon):
-                poi_copy = poi.copy()
-                if "source" not in poi_copy:
-                    poi_copy["source"] = "LocalDB"
-                local_pois.append(poi_copy)
+        for poi in zone_geometry(polygon).filter_pois(candidate_pois):
+            poi_copy = poi.copy()
+            if "source" not in poi_copy:
+                poi_copy["source"] = "LocalDB"
+            local_pois.append(poi_copy)
         
         return local_pois
     
@@ -207,39 +211,37 @@ class MarinePOICollector:
         try:
             async with OSMDataExtractor() as extractor:
                 # Query specifica per POI marittimi
-                marine_query = extractor.query_builder.build_marine_query(bbox)
-                marine_data = await extractor.execute_query(marine_query)
+                marine_data = await extractor.execute_tiled_query("marine", bbox, polygon)
                 marine_pois = extractor.extract_poi_data(marine_data, "marine")
                 
                 # Filtra per poligono (universale - qualsiasi zona nel mondo)
                 filtered_pois = []
-                for poi in marine_pois:
-                    # Verifica se è dentro il poligono della zona selezionata
-                    if point_in_polygon((poi["lat"], poi["lng"]), polygon):
-                        # Controllo: escludi solo relitti con nomi noti di altre località lontane
-                        # (es. Moskva che è notoriamente nel Mar Nero, non può essere in altre zone)
-                        if poi.get("marine_type") == "wreck":
-                            name = poi.get("name", "").lower()
-                            description = poi.get("description", "").lower()
-                            text = name + " " + description
-                            
-                            # Escludi solo se il nome/descrizione indica chiaramente che è un relitto noto di altre zone
-                            irrelevant_keywords = [
-                                "moskva", "moscova", "moscow", "москва",  # Relitto noto nel Mar Nero
-                                # Nota: NON escludiamo per coordinate geografiche, solo per nomi noti
-                            ]
-                            
-                            if any(keyword in text for keyword in irrelevant_keywords):
-                                logger.logger.warning(f"⚠️ Relitto OSM irrilevante '{poi.get('name')}' escluso (nome indica relitto noto di altra località)")
-                                continue
+                for poi in zone_geometry(polygon).filter_pois(marine_pois):
+                    # Controllo: escludi solo relitti con nomi noti di altre località lontane
+                    # (es. Moskva che è notoriamente nel Mar Nero, non può essere in altre zone)
+                    if poi.get("marine_type") == "wreck":
+                        name = poi.get("name", "").lower()
+                        description = poi.get("description", "").lower()
+                        text = name + " " + description
+                        
+                        # Escludi solo se il nome/descrizione indica chiaramente che è un relitto noto di altre zone
+                        irrelevant_keywords = [
+                            "moskva", "moscova", "moscow", "москва",  # Relitto noto nel Mar Nero
+                            # Nota: NON escludiamo per coordinate geografiche, solo per nomi noti
+                        ]
                         
-                        filtered_pois.append(poi)
+                        if any(keyword in text for keyword in irrelevant_keywords):
+                            logger.logger.warning(f"⚠️ Relitto OSM irrilevante '{poi.get('name')}' escluso (nome indica relitto noto di altra località)")
+                            continue
+                    
+                    filtered_pois.append(poi)
                 
                 logger.logger.info(f"✅ OSM Marine: trovati {len(filtered_pois)} POI marini validi (filtro poligono zona)")
                 return filtered_pois
                 
         except Exception as e:
             logger.log_error("OSM Marine POI", str(e), "")
+            mark_failed("marine")
             return []
     
     async def _get_wiki_marine_pois(self, zone_name: str,
@@ -249,8 +251,7 @@ class MarinePOICollector:
         wiki_marine_pois = []
         
         try:
-            from .wiki_extractor import WikiMarineExtractor, WikipediaExtractor, WikidataExtractor, DBpediaExtractor
-            from .utils import point_in_polygon
+            from .wiki_extractor import WikiMarineExtractor, WikipediaExtractor, WikidataExtractor, DBpediaExtractor, SPARQL_MAX_ROWS, bindings_in_zone
             
             # 1. Ricerca marina specifica su Wikipedia (relitti, fari, punti immersione)
             try:
@@ -260,6 +261,7 @@ class MarinePOICollector:
                     logger.logger.info(f"✅ Marine Wikipedia: trovati {len(wiki_marine)} POI")
             except Exception as e:
                 logger.log_error("Marine Wikipedia Search", str(e), zone_name)
+                mark_failed("marine")
             
             # 2. Ricerca Wikidata specifica per relitti marini nella zona
             try:
@@ -300,34 +302,25 @@ class MarinePOICollector:
                       
                       SERVICE wikibase:label {{ bd:serviceParam wikibase:language "it,en,fr" . }}
                     }}
-                    LIMIT 100
                     """
                     
-                    from SPARQLWrapper import SPARQLWrapper, JSON
-                    
-                    sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-                    sparql.setQuery(query)
-                    sparql.setReturnFormat(JSON)
-                    
-                    # Esegui query con retry (SPARQLWrapper è sincrono, quindi usiamo asyncio.to_thread o loop.run_in_executor)
+                    # Query SPARQL async (streaming, LIMIT SPARQL_MAX_ROWS) con retry
                     import asyncio
                     max_retries = 3
-                    results = None
+                    results = []
                     for attempt in range(max_retries):
                         try:
-                            # Esegui query sincrona in thread pool per non bloccare
-                            loop = asyncio.get_event_loop()
-                            results = await loop.run_in_executor(None, lambda: sparql.query().convert())
+                            results = await wikidata_extractor.sparql.select(query, max_rows=SPARQL_MAX_ROWS)
                             break
                         except Exception as e:
-                            if attempt < max_retries - 1:
+                            if attempt < max_retries - 1 and not deadline_expired():
                                 await asyncio.sleep(2)
                                 continue
                             raise
                     
                     wikidata_count = 0
-                    for result in results.get("results", {}).get("bindings", []):
-                        poi = await wikidata_extractor._process_wikidata_result(result, polygon, "it")
+                    for result in bindings_in_zone(results, polygon):
+                        poi = await wikidata_extractor._process_wikidata_result(result, "it")
                         if poi:
                             # Verifica che sia un POI marino
                             type_label = result.get("typeLabel", {}).get("value", "").lower() if "typeLabel" in result else ""
@@ -346,7 +339,7 @@ class MarinePOICollector:
                                 logger.logger.warning(f"⚠️ Relitto Wikidata irrilevante '{poi.get('name')}' escluso (nome indica relitto noto di altra località)")
                                 continue
                             
-                            # Il filtro poligono è già fatto in _process_wikidata_result
+                            # Il filtro poligono è già fatto da bindings_in_zone
                             # Se il POI è arrivato qui, è dentro il poligono
                             wiki_marine_pois.append(poi)
                             wikidata_count += 1
@@ -354,9 +347,11 @@ class MarinePOICollector:
                     logger.logger.info(f"✅ Marine Wikidata: trovati {wikidata_count} relitti/fari nell'area")
             except Exception as e:
                 logger.log_error("Marine Wikidata Search", str(e), zone_name)
+                mark_failed("marine")
             
         except Exception as e:
             logger.log_error("Wiki Marine POI Collection", str(e), zone_name)
+            mark_failed("marine")
         
         return wiki_marine_pois
     
@@ -380,6 +375,7 @@ class MarinePOICollector:
             
         except Exception as e:
             logger.log_error("Specialized Marine POI", str(e), zone_name)
+            mark_failed("marine")
         
         return specialized_pois
     
@@ -429,12 +425,7 @@ class MarinePOICollector:
             generated_pois.extend(protected_areas)
         
         # Filtra per poligono
-        filtered_pois = []
-        for poi in generated_pois:
-            if point_in_polygon((poi["lat"], poi["lng"]), polygon):
-                filtered_pois.append(poi)
-        
-        return filtered_pois
+        return zone_geometry(polygon).filter_pois(generated_pois)
 
 class MarineRouteGenerator:
     """Genera itinerari marittimi"""
@@ -561,7 +552,8 @@ class DepthAnalyzer:
 async def deep_marine_search(zone_name: str,
                            bbox: Tuple[float, float, float, float],
                            polygon: List[List[float]],
-                           mode: str = "standard") -> List[Dict]:
+                           mode: str = "standard",
+                           municipalities: Optional[Awaitable[List[Dict]]] = None) -> List[Dict]:
     """✅ FIX MarineAudit: Ricerca POI subacquei autentici usando SOLO fonti semantiche
     Fonti: Wikipedia, Wikidata, DBpedia
     Restituisce solo POI sotto la superficie del mare (relitti, reef, shoal, ostacoli sommersi)
@@ -573,7 +565,8 @@ async def deep_marine_search(zone_name: str,
     
     # ✅ FIX MarineAudit: Ricerca parallela da fonti semantiche (Wikipedia, Wikidata, DBpedia)
     try:
-        wiki_pois = await _search_semantic_sources(zone_name, bbox, polygon, mode=mode)
+        wiki_pois = await _search_semantic_sources(zone_name, bbox, polygon, mode=mode,
+                                                   municipalities_source=municipalities)
         marine_pois.extend(wiki_pois)
         
         if wiki_pois:
@@ -583,14 +576,13 @@ async def deep_marine_search(zone_name: str,
             logger.logger.info(f"[POI-MARINE] ✅ Semantic sources: {wrecks} wrecks, {reefs} reefs, {other} other")
     except Exception as e:
         logger.log_error("Semantic Sources Search", str(e), zone_name)
+        mark_failed("marine")
     
     # ✅ FIX MarinePOI: Filtra rigorosamente tutti i risultati (subacquei + dentro zona + nel mare + deduplica + validazione geografica)
-    filtered_pois = []
     duplicates_count = 0
     skipped_count = 0  # POI fuori zona o di superficie
     
-    from .utils import is_in_zone, is_in_water, POIDeduplicator
-    from geopy.distance import geodesic
+    from .land_water import classify_water
     
     # ✅ FIX MarinePOI: Lista relitti noti con zone geografiche specifiche (universale - qualsiasi zona)
     # Moskva è notoriamente nel Mar Nero (44.0-45.0N, 28.0-35.0E)
@@ -604,8 +596,13 @@ async def deep_marine_search(zone_name: str,
     
     # ✅ FIX MarinePOI: Deduplicazione Python migliorata (nome case-insensitive + distanza più stretta)
     seen_pois = []  # Lista di POI già visti per deduplicazione
+    candidate_pois = []  # POI che superano i filtri 0-2, da verificare in blocco terra/mare
     
-    for poi in marine_pois:
+    # Test punto-in-poligono di tutti i POI in una sola chiamata vettoriale (usato al filtro 2)
+    in_zone_flags = zone_geometry(polygon).contains_many([poi.get("lat") for poi in marine_pois],
+                                                         [poi.get("lng") for poi in marine_pois])
+    
+    for poi, poi_in_zone in zip(marine_pois, in_zone_flags):
         # ✅ FIX MarinePOI: 0. Escludi relitti noti fuori zona (es. Moskva nel Mar Nero)
         poi_name_lower = (poi.get("name", "") or "").lower().strip()
         description_lower = (poi.get("description", "") or "").lower()
@@ -653,14 +650,20 @@ async def deep_marine_search(zone_name: str,
                 continue
         
         # ✅ FIX MarinePOI: 2. Verifica che sia dentro il poligono della zona
-        if not is_in_zone(poi["lat"], poi["lng"], polygon):
+        if not poi_in_zone:
             skipped_count += 1
             logger.logger.warning(f"[POI-MARINE] ⚠️ POI escluso (fuori zona): '{poi.get('name', '')}' ({poi.get('lat')}, {poi.get('lng')}) (source: {poi.get('source', 'unknown')})")
             continue
         
-        # ✅ FIX MarinePOI: 3. Verifica che sia nel mare (non su terraferma)
+        candidate_pois.append(poi)
+    
+    # ✅ FIX MarinePOI: 3. Verifica che sia nel mare (non su terraferma)
+    # Classificazione in blocco: maschera offline, Nominatim solo per i punti non coperti
+    water_checks = await classify_water([(poi["lat"], poi["lng"]) for poi in candidate_pois])
+    
+    water_pois = []  # POI nel mare (o con coordinate stimate accettate), da deduplicare
+    for poi, is_water_check in zip(candidate_pois, water_checks):
         # ✅ FIX MarineWeb: Per coordinate stimate (da web search), usa controllo meno rigoroso
-        is_water_check = await is_in_water(poi["lat"], poi["lng"])
         if not is_water_check:
             # Se è da web search e coordinate sono stimate, accetta comunque se è dentro il poligono
             if poi.get("source") == "Web Search" and poi.get("url"):
@@ -670,40 +673,11 @@ async def deep_marine_search(zone_name: str,
                 logger.logger.warning(f"[POI-MARINE] ⚠️ POI escluso (non in mare): '{poi.get('name', '')}' ({poi.get('lat')}, {poi.get('lng')}) (source: {poi.get('source', 'unknown')})")
                 continue
         
-        # ✅ FIX MarinePOI: 4. Deduplicazione migliorata (nome case-insensitive + distanza più stretta)
-        is_duplicate = False
-        
-        for seen_poi in seen_pois:
-            seen_name_lower = (seen_poi.get("name", "") or "").lower().strip()
-            
-            # ✅ FIX MarinePOI: Se nome è identico (case-insensitive), soglia più stretta (50m)
-            if poi_name_lower == seen_name_lower:
-                distance_km = geodesic(
-                    (poi["lat"], poi["lng"]),
-                    (seen_poi["lat"], seen_poi["lng"])
-                ).kilometers
-                
-                if distance_km < 0.05:  # 50m per nomi identici
-                    is_duplicate = True
-                    duplicates_count += 1
-                    break
-            
-            # ✅ FIX MarinePOI: Se nome è simile (contenuto), soglia intermedia (100m)
-            elif (len(poi_name_lower) > 3 and len(seen_name_lower) > 3 and
-                  (poi_name_lower in seen_name_lower or seen_name_lower in poi_name_lower)):
-                distance_km = geodesic(
-                    (poi["lat"], poi["lng"]),
-                    (seen_poi["lat"], seen_poi["lng"])
-                ).kilometers
-                
-                if distance_km < 0.1:  # 100m per nomi simili
-                    is_duplicate = True
-                    duplicates_count += 1
-                    break
-        
-        if not is_duplicate:
-            seen_pois.append(poi)
-            filtered_pois.append(poi)
+        water_pois.append(poi)
+    
+    # ✅ FIX MarinePOI: 4. Deduplicazione migliorata (nome case-insensitive + distanza più stretta)
+    filtered_pois = MarineNameDeduplicator().filter_new(water_pois, seen_pois)
+    duplicates_count += len(water_pois) - len(filtered_pois)
     
     # ✅ FIX MarinePOI: Deduplica anche con POIDeduplicator per sicurezza (soglia 50m)
     deduplicator = POIDeduplicator(distance_threshold=50)  # 50m per POI marini (più rigoroso)
@@ -734,10 +708,12 @@ async def deep_marine_search(zone_name: str,
 async def _search_semantic_sources(zone_name: str,
                                   bbox: Tuple[float, float, float, float],
                                   polygon: List[List[float]],
-                                  mode: str = "standard") -> List[Dict]:
+                                  mode: str = "standard",
+                                  municipalities_source: Optional[Awaitable[List[Dict]]] = None) -> List[Dict]:
     """✅ FIX MarineDivingCenter: Ricerca POI subacquei SOLO da Web Search (diving center e centri di immersione)
     Fonti: SOLO Web Search (diving center e centri di immersione) - ESCLUSO Wikipedia, Wikidata, DBpedia
     Logica: Cerca diving center per municipio → Analizza massimo 3 siti → Estrae relitti specifici → Rielabora descrizioni con AI
+    municipalities_source: comuni già in fase di scoperta (task della ricerca terrestre), evita una seconda discovery
     """
     pois = []
     
@@ -750,7 +726,11 @@ async def _search_semantic_sources(zone_name: str,
         try:
             logger.logger.info(f"[POI-MARINE] 🔍 Scoperta municipi per zona '{zone_name}'...")
             # ✅ FIX MarineWreckFinder: Ordine corretto parametri (polygon, zone_name) - non (bbox, polygon)
-            municipalities_data = await discover_zone_municipalities(polygon, zone_name)
+            if municipalities_source is not None:
+                # shield: se la ricerca marina viene cancellata la discovery condivisa prosegue
+                municipalities_data = await asyncio.shield(municipalities_source)
+            else:
+                municipalities_data = await discover_zone_municipalities(polygon, zone_name)
             
             # ✅ FIX MarineWreckFinder: Gestione robusta dei dati municipi (evita errori float/list)
             if not isinstance(municipalities_data, list):
@@ -812,6 +792,7 @@ async def _search_semantic_sources(zone_name: str,
         
     except Exception as e:
         logger.log_error("Semantic Sources Search", str(e), zone_name)
+        mark_failed("marine")
     
     return pois
 
@@ -860,20 +841,46 @@ def _is_underwater_poi(poi: Dict) -> bool:
 # ✅ FIX MarineAudit: Funzione _validate_marine_poi() rimossa - ridondante
 # I filtri sono già applicati direttamente in deep_marine_search() durante il loop
 
+class MarineNameDeduplicator(POIDeduplicator):
+    """✅ FIX MarinePOI: Deduplicazione per nome case-insensitive con soglie strette
+    - nome identico: duplicato entro 50m
+    - nome contenuto nell'altro (più di 3 caratteri): duplicato entro 100m
+    """
+    
+    def __init__(self):
+        super().__init__(distance_threshold=100)
+    
+    @property
+    def distance_thresholds(self) -> Tuple[float, ...]:
+        return (50.0, 100.0)
+    
+    def is_match(self, poi1: Dict, poi2: Dict, distance: float) -> bool:
+        name1 = (poi1.get("name", "") or "").lower().strip()
+        name2 = (poi2.get("name", "") or "").lower().strip()
+        
+        if name1 == name2:
+            return distance < 50  # 50m per nomi identici
+        if len(name1) > 3 and len(name2) > 3 and (name1 in name2 or name2 in name1):
+            return distance < 100  # 100m per nomi simili
+        return False
+
 # Funzioni utility per uso esterno
 async def explore_marine_area(zone_name: str,
                             bbox: Tuple[float, float, float, float], 
                             polygon: List[List[float]],
-                            mode: str = "standard") -> Dict:
+                            mode: str = "standard",
+                            municipalities: Optional[Awaitable[List[Dict]]] = None) -> Dict:
     """✅ FIX MarineAudit: Esplora completamente un'area marina usando SOLO fonti semantiche
     Fonti: Wikipedia, Wikidata, DBpedia (nessun fallback OSM)
+    municipalities: task/future dei comuni della zona, se già avviato dalla ricerca terrestre
     """
     
     # Estendi bounding box per area marina
     marine_bbox = MarineAreaDetector.calculate_marine_extension(polygon)
     
     # ✅ FIX MarineAudit: Usa deep_marine_search per ricerca SOLO da fonti semantiche
-    marine_pois = await deep_marine_search(zone_name, marine_bbox, polygon, mode=mode)
+    marine_pois = await deep_marine_search(zone_name, marine_bbox, polygon, mode=mode,
+                                           municipalities=municipalities)
     
     # ✅ FIX MarineType: Assicura che tutti i POI abbiano type="marine" dopo deep_marine_search
     for poi in marine_pois:
@@ -0,0 +1,245 @@
+import aiohttp
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Tuple
+from .utils import SemanticLogger
+from .http_pool import get_http_session
+from .wiki_page_cache import WikiPageCache, get_wiki_page_cache
+
+logger = SemanticLogger()
+
+MEDIAWIKI_USER_AGENT = "whatis_semantic_engine/1.0 (MediaWiki client)"
+
+class MediaWikiError(Exception):
+    """Errore restituito dalle API MediaWiki (HTTP o campo "error" della risposta)"""
+
+@dataclass
+class WikiPage:
+    """Pagina Wikipedia con i dati usati dagli estrattori (caricati in una sola chiamata)"""
+    title: str
+    pageid: int
+    lang: str
+    url: str = ""
+    summary: str = ""
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    image_url: Optional[str] = None
+    revid: Optional[int] = None
+    content: Optional[str] = None  # Testo completo, caricato solo su richiesta (get_content)
+
+    @property
+    def coordinates(self) -> Optional[Tuple[float, float]]:
+        if self.lat is None or self.lng is None:
+            return None
+        return (self.lat, self.lng)
+
+class MediaWikiClient:
+    """Client async per le API MediaWiki di Wikipedia
+
+    Sostituisce il package `wikipedia` (sincrono e con lingua globale):
+    ogni istanza ha la propria lingua e usa la sessione aiohttp ricevuta
+    o quella "wikipedia" del pool HTTP condiviso, senza bloccare l'event loop.
+    Ricerche, pagine e testi completi passano dalla cache persistente delle
+    pagine: una pagina già vista costa al più una verifica del revid.
+    """
+
+    # Titoli per richiesta di verifica revisione (limite API per utenti anonimi)
+    REVALIDATE_BATCH = 50
+
+    # Proprietà caricate con una sola chiamata: titolo, intro, coordinate, pageid, immagine, url
+    PAGE_PROPS = {
+        "prop": "extracts|coordinates|pageimages|info|pageprops",
+        "exintro": "1",
+        "explaintext": "1",
+        "exlimit": "max",
+        "colimit": "max",
+        "piprop": "original|thumbnail",
+        "pithumbsize": "800",
+        "pilimit": "max",
+        "inprop": "url",
+        "ppprop": "disambiguation",
+        "redirects": "1",
+    }
+
+    def __init__(self, lang: str = "it", session: Optional[aiohttp.ClientSession] = None,
+                 timeout: float = 10.0, page_cache: Optional[WikiPageCache] = None, use_cache: bool = True):
+        self.lang = (lang or "it").lower()
+        self.api_url = f"https://{self.lang}.wikipedia.org/w/api.php"
+        self.session = session
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.page_cache = (page_cache or get_wiki_page_cache()) if use_cache else None
+
+    async def _query(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """Esegue una richiesta action=query e restituisce il JSON"""
+        request_params = {"action": "query", "format": "json", "formatversion": "2", **params}
+        headers = {"User-Agent": MEDIAWIKI_USER_AGENT}
+
+        session = self.session or get_http_session("wikipedia")
+        async with session.get(self.api_url, params=request_params, headers=headers,
+                               timeout=self.timeout) as response:
+            data = await self._read_response(response)
+
+        if "error" in data:
+            raise MediaWikiError(f"{data['error'].get('code')}: {data['error'].get('info')}")
+        return data
+
+    async def _read_response(self, response: aiohttp.ClientResponse) -> Dict[str, Any]:
+        if response.status != 200:
+            raise MediaWikiError(f"HTTP {response.status} da {self.api_url}")
+        return await response.json(content_type=None)
+
+    def _parse_page(self, page: Dict[str, Any]) -> Optional[WikiPage]:
+        """Converte una pagina della risposta API (None se mancante o disambigua)"""
+        if page.get("missing") or page.get("invalid"):
+            return None
+        if "disambiguation" in page.get("pageprops", {}):
+            return None
+
+        lat, lng = None, None
+        coordinates = page.get("coordinates") or []
+        if coordinates:
+            lat, lng = coordinates[0].get("lat"), coordinates[0].get("lon")
+
+        image_url = (page.get("original") or {}).get("source") or (page.get("thumbnail") or {}).get("source")
+
+        return WikiPage(
+            title=page.get("title", ""),
+            pageid=page.get("pageid", 0),
+            lang=self.lang,
+            url=page.get("fullurl", ""),
+            summary=(page.get("extract") or "").strip(),
+            lat=lat,
+            lng=lng,
+            image_url=image_url,
+            revid=page.get("lastrevid")
+        )
+
+    async def search(self, term: str, limit: int = 10) -> List[str]:
+        """Ricerca full-text: restituisce i titoli delle pagine trovate"""
+        data = await self._query({
+            "list": "search",
+            "srsearch": term,
+            "srlimit": str(limit),
+            "srprop": "",
+        })
+        return [result["title"] for result in data.get("query", {}).get("search", [])]
+
+    async def search_pages(self, term: str, limit: int = 5) -> List[WikiPage]:
+        """Ricerca + dati delle pagine in una sola chiamata (generator=search), in ordine di rilevanza"""
+        if self.page_cache is not None:
+            titles = await self.page_cache.get_search(self.lang, term, limit)
+            if titles is not None:
+                pages = await self._cached_pages(titles)
+                if pages is not None:
+                    return pages
+
+        data = await self._query({
+            "generator": "search",
+            "gsrsearch": term,
+            "gsrlimit": str(limit),
+            **self.PAGE_PROPS,
+        })
+        raw_pages = sorted(data.get("query", {}).get("pages", []), key=lambda page: page.get("index", 0))
+        pages = [page for page in (self._parse_page(raw) for raw in raw_pages) if page]
+
+        if self.page_cache is not None:
+            await self.page_cache.set_pages(self.lang, [asdict(page) for page in pages])
+            await self.page_cache.set_search(self.lang, term, limit, [page.title for page in pages])
+        return pages
+
+    async def get_pages(self, titles: List[str]) -> List[WikiPage]:
+        """Carica più pagine per titolo (max 20), dalla cache se già viste e ancora alla stessa revisione"""
+        if not titles:
+            return []
+        if self.page_cache is not None:
+            pages = await self._cached_pages(titles[:20])
+            if pages is not None:
+                return pages
+        pages = await self._fetch_pages(titles)
+        if self.page_cache is not None:
+            await self.page_cache.set_pages(self.lang, [asdict(page) for page in pages])
+        return pages
+
+    async def _fetch_pages(self, titles: List[str]) -> List[WikiPage]:
+        """Scarica più pagine per titolo in una sola chiamata (max 20 per gli estratti)"""
+        data = await self._query({"titles": "|".join(titles[:20]), **self.PAGE_PROPS})
+        pages = [self._parse_page(raw) for raw in data.get("query", {}).get("pages", [])]
+
+        # Mantieni l'ordine dei titoli richiesti (anche dopo normalizzazione/redirect)
+        query = data.get("query", {})
+        aliases = {item["from"]: item["to"] for item in query.get("normalized", []) + query.get("redirects", [])}
+        order = {}
+        resolved_titles = {}
+        for index, title in enumerate(titles[:20]):
+            resolved = title
+            for _ in range(3):  # normalizzazione + redirect (eventualmente doppio)
+                resolved = aliases.get(resolved, resolved)
+            order.setdefault(resolved, index)
+            if resolved != title:
+                resolved_titles[title] = resolved
+        pages = sorted([page for page in pages if page], key=lambda page: order.get(page.title, len(order)))
+
+        if self.page_cache is not None:
+            # Gli alias portano alla pagina in cache con il titolo canonico (vedi _cached_pages)
+            found = {page.title for page in pages}
+            await self.page_cache.set_aliases(self.lang, {alias: title for alias, title in resolved_titles.items()
+                                                          if title in found})
+        return pages
+
+    async def _cached_pages(self, titles: List[str]) -> Optional[List[WikiPage]]:
+        """Pagine dalla cache, riconvalidando il revid di quelle verificate da troppo tempo
+
+        I titoli richiesti sono risolti nel titolo canonico con gli alias già visti
+        (normalizzazione/redirect), come fa MediaWiki. Restituisce None se una pagina
+        non è in cache o non esiste più con lo stesso titolo (il chiamante rifà la richiesta completa).
+        """
+        aliases = await self.page_cache.resolve_titles(self.lang, titles)
+        titles = list(dict.fromkeys(aliases.get(title, title) for title in titles))
+        cached = await self.page_cache.get_pages(self.lang, titles)
+        if any(title not in cached for title in titles):
+            return None
+
+        expired = [title for title in titles if self.page_cache.needs_revalidation(cached[title])]
+        if expired:
+            current = await self._current_revisions(expired)
+            unchanged = [title for title in expired if current.get(title) == cached[title].revid]
+            changed = [title for title in expired if title not in unchanged]
+            await self.page_cache.mark_validated(self.lang, unchanged)
+            if changed:
+                refreshed = await self._fetch_pages(changed)
+                self.page_cache.refreshed += len(refreshed)
+                await self.page_cache.set_pages(self.lang, [asdict(page) for page in refreshed])
+                by_title = {page.title: page for page in refreshed}
+                if any(title not in by_title for title in changed):
+                    return None
+                for title in changed:
+                    cached[title].fields = asdict(by_title[title])
+
+        return [WikiPage(**cached[title].fields) for title in titles]
+
+    async def _current_revisions(self, titles: List[str]) -> Dict[str, int]:
+        """Revid corrente per titolo (prop=info, senza contenuto): i titoli mancanti non compaiono"""
+        revisions = {}
+        for start in range(0, len(titles), self.REVALIDATE_BATCH):
+            batch = titles[start:start + self.REVALIDATE_BATCH]
+            self.page_cache.revalidation_requests += 1
+            data = await self._query({"prop": "info", "titles": "|".join(batch)})
+            for page in data.get("query", {}).get("pages", []):
+                if not page.get("missing") and not page.get("invalid") and "lastrevid" in page:
+                    revisions[page.get("title", "")] = page["lastrevid"]
+        return revisions
+
+    async def get_content(self, page: WikiPage) -> str:
+        """Testo completo della pagina (plaintext), memorizzato in page.content e nella cache pagine"""
+        if page.content is None and self.page_cache is not None:
+            page.content = await self.page_cache.get_content(self.lang, page.title, page.revid)
+        if page.content is None:
+            data = await self._query({
+                "prop": "extracts",
+                "explaintext": "1",
+                "pageids": str(page.pageid),
+            })
+            pages = data.get("query", {}).get("pages", [])
+            page.content = (pages[0].get("extract") or "") if pages else ""
+            if self.page_cache is not None and page.content:
+                await self.page_cache.set_content(self.lang, page.title, page.revid, page.content)
+        return page.content
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+import aiohttp
+from typing import List, Dict, Any, Optional
+from .utils import SemanticLogger, TTLCache, SingleFlight, deadline_timeout
+from .http_pool import get_http_session
+
+logger = SemanticLogger()
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org")
+NOMINATIM_USER_AGENT = "whatis_semantic_engine/1.0 (Nominatim client)"
+# Usage policy di nominatim.openstreetmap.org: al massimo 1 richiesta al secondo per applicazione
+NOMINATIM_RATE_PER_S = float(os.getenv("NOMINATIM_RATE_PER_S", "1.0"))
+NOMINATIM_BURST = int(os.getenv("NOMINATIM_BURST", "1"))
+# Attesa massima di un token (ridotta al tempo rimasto della richiesta): oltre, la richiesta fallisce
+NOMINATIM_MAX_WAIT_S = float(os.getenv("NOMINATIM_MAX_WAIT_S", "30"))
+NOMINATIM_CACHE_TTL_S = float(os.getenv("NOMINATIM_CACHE_TTL_S", str(7 * 86400)))  # 7 giorni
+NOMINATIM_CACHE_MAX = int(os.getenv("NOMINATIM_CACHE_MAX", "10000"))
+
+class NominatimError(Exception):
+    """Errore HTTP o di rete restituito da Nominatim"""
+
+class TokenBucket:
+    """Token bucket async: al massimo `rate` acquisizioni al secondo, con raffiche fino a `capacity`"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    async def acquire(self, max_wait: Optional[float] = None):
+        """Attende un token (le richieste concorrenti sono servite in ordine di arrivo)
+
+        Con max_wait solleva asyncio.TimeoutError se il token non arriva entro max_wait secondi.
+        """
+        if max_wait is None:
+            await self._acquire()
+        else:
+            await asyncio.wait_for(self._acquire(), timeout=max_wait)
+
+    async def _acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+def reverse_grid_step(zoom: int) -> float:
+    """Passo della griglia (gradi) della chiave di cache del reverse geocoding
+
+    Punti nella stessa cella condividono la risposta del primo punto richiesto: le celle
+    restano piccole anche a zoom bassi, perché vicino a un confine o alla costa la
+    risposta cambia entro pochi km (paese) o poche decine di metri (terra/mare).
+    """
+    if zoom <= 8:
+        return 0.01    # paese / regione (~1 km)
+    if zoom <= 12:
+        return 0.0005  # città / comune, verifica terra/mare (~50 m)
+    return 0.0001      # via / edificio (~10 m)
+
+def quantize(lat: float, lng: float, step: float) -> tuple:
+    """Centro della cella di griglia che contiene il punto (chiave di cache)"""
+    return (round(round(lat / step) * step, 6), round(round(lng / step) * step, 6))
+
+class NominatimClient:
+    """Client async condiviso per Nominatim (reverse e forward geocoding)
+
+    - un solo token bucket per processo, secondo la usage policy (1 richiesta/s)
+    - reverse: richiesta sul punto esatto, risposta in cache per la cella di una
+      griglia fine dipendente dallo zoom
+    - forward: cache per (query, limite, paesi)
+    - richieste identiche concorrenti condividono una sola chiamata
+    """
+
+    def __init__(self, base_url: str = NOMINATIM_URL, rate_per_second: float = NOMINATIM_RATE_PER_S,
+                 burst: int = NOMINATIM_BURST, cache_ttl_seconds: float = NOMINATIM_CACHE_TTL_S,
+                 cache_max_entries: int = NOMINATIM_CACHE_MAX, timeout: float = 5.0):
+        self.base_url = base_url.rstrip("/")
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._reverse_cache = TTLCache(max_entries=cache_max_entries, ttl_seconds=cache_ttl_seconds)
+        self._search_cache = TTLCache(max_entries=cache_max_entries, ttl_seconds=cache_ttl_seconds)
+        self._flights = SingleFlight()
+        self.requests = 0
+        self.errors = 0
+        self.throttle_timeouts = 0
+
+    async def reverse(self, lat: float, lng: float, zoom: int = 18) -> Dict[str, Any]:
+        """Reverse geocoding (jsonv2 con addressdetails) del punto, in cache per cella di griglia
+
+        Un punto senza risultati (es. in mare) restituisce la risposta di Nominatim
+        con il campo "error", messa in cache come le altre.
+        """
+        cell_lat, cell_lng = quantize(lat, lng, reverse_grid_step(zoom))
+        key = ("reverse", cell_lat, cell_lng, zoom)
+        cached = self._reverse_cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def fetch():
+            data = await self._get("/reverse", {
+                "format": "jsonv2",
+                "lat": str(lat),
+                "lon": str(lng),
+                "zoom": str(zoom),
+                "addressdetails": "1",
+            })
+            self._reverse_cache.set(key, data)
+            return data
+
+        return await self._flights.do(key, fetch)
+
+    async def search(self, query: str, limit: int = 5, country_codes: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Forward geocoding: risultati jsonv2 con addressdetails (lista vuota se nessuno)"""
+        codes = (country_codes or "").lower()
+        key = ("search", " ".join(query.split()).lower(), limit, codes)
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def fetch():
+            params = {
+                "format": "jsonv2",
+                "q": query,
+                "limit": str(limit),
+                "addressdetails": "1",
+            }
+            if codes:
+                params["countrycodes"] = codes
+            data = await self._get("/search", params)
+            results = data if isinstance(data, list) else []
+            self._search_cache.set(key, results)
+            return results
+
+        return await self._flights.do(key, fetch)
+
+    async def _get(self, path: str, params: Dict[str, str]) -> Any:
+        try:
+            await self.bucket.acquire(deadline_timeout(NOMINATIM_MAX_WAIT_S))
+        except asyncio.TimeoutError:
+            self.throttle_timeouts += 1
+            raise NominatimError(f"Nominatim{path}: nessun turno del rate limit entro il tempo della richiesta")
+        self.requests += 1
+        session = get_http_session("nominatim")
+        try:
+            async with session.get(f"{self.base_url}{path}", params=params,
+                                   headers={"User-Agent": NOMINATIM_USER_AGENT},
+                                   timeout=self.timeout) as response:
+                if response.status != 200:
+                    raise NominatimError(f"HTTP {response.status} da Nominatim{path}")
+                return await response.json(content_type=None)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            self.errors += 1
+            raise NominatimError(f"Nominatim{path} non raggiungibile: {e!r}") from e
+        except NominatimError:
+            self.errors += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled_seconds": round(self.bucket.waited_seconds, 3),
+            "throttle_timeouts": self.throttle_timeouts,
+            "coalesced": self._flights.stats()["coalesced"],
+            "reverse_cache": self._reverse_cache.stats(),
+            "search_cache": self._search_cache.stats()
+        }
+
+_nominatim_client: Optional[NominatimClient] = None
+
+def get_nominatim_client() -> NominatimClient:
+    """Client Nominatim condiviso dal processo (singleton: un solo rate limit per tutte le ricerche)"""
+    global _nominatim_client
+    if _nominatim_client is None:
+        _nominatim_client = NominatimClient()
+    return _nominatim_client
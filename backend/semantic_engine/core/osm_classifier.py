@@ -0,0 +1,339 @@
+import re
+from typing import List, Dict, Tuple, Optional, Iterable
+from .overpass_stream import OSMRecord
+from .utils import SemanticLogger, POIValidator
+
+logger = SemanticLogger()
+
+# Selettori Overpass dei POI: (tipi di elemento, chiave, operatore, valore) con operatore
+# "=" (uguale), "~" (regex) o "" (chiave presente). Usati sia per costruire le query sia
+# per riconoscere lato client la categoria degli elementi della query unica.
+OverpassSelector = Tuple[Tuple[str, ...], str, str, str]
+
+TOURIST_SELECTORS: Tuple[OverpassSelector, ...] = (
+    # Monumenti e attrazioni
+    (("node", "way"), "tourism", "~", "^(attraction|museum|castle|monument|viewpoint|archaeological_site)$"),
+    # Edifici religiosi
+    (("node", "way"), "amenity", "=", "place_of_worship"),
+    (("node", "way"), "building", "=", "church"),
+    # Edifici storici
+    (("node", "way"), "historic", "~", "^(castle|fortress|monument|archaeological_site|ruins|palace|manor)$"),
+    # Parchi e giardini
+    (("node", "way"), "leisure", "~", "^(park|garden|nature_reserve)$"),
+    # Musei e cultura
+    (("node", "way"), "amenity", "~", "^(library|theatre|cinema|arts_centre)$"),
+    # Punti panoramici naturali
+    (("node", "way"), "natural", "~", "^(peak|cliff|beach|cape)$"),
+)
+
+MARINE_SELECTORS: Tuple[OverpassSelector, ...] = (
+    # ✅ FIX MarineDeep: SOLO RELITTI subacquei
+    (("node", "way"), "historic", "=", "wreck"),
+    (("node",), "seamark:type", "=", "wreck"),
+    (("node",), "seamark:wreck:category", "", ""),
+    (("node",), "wreck", "", ""),
+    (("node",), "site_type", "=", "wreck"),
+    (("node", "way"), "name", "~", "^(relitto|wreck|shipwreck|naufragio)"),
+    # ✅ FIX MarineDeep: SOLO REEF e SHOAL sommersi
+    (("node", "way"), "natural", "=", "reef"),
+    (("node", "way"), "natural", "=", "shoal"),
+    (("node", "way"), "natural", "=", "bank"),
+    # ✅ FIX MarineDeep: SOLO OSTACOLI SOMMERSI
+    (("node", "way"), "seamark:type", "=", "obstruction"),
+    (("node",), "seamark:obstruction:category", "", ""),
+    (("node", "way"), "underwater", "=", "yes"),
+    # ✅ FIX MarineDeep: SOLO SITI IMMERSIONE SUBACQUEI
+    (("node", "way"), "sport", "=", "diving"),
+    (("node",), "leisure", "=", "diving"),
+    (("node",), "scuba_diving", "=", "yes"),
+    (("node",), "diving_site", "=", "yes"),
+    (("node",), "seamark:type", "=", "diving"),
+    # ✅ FIX MarineDeep: GROTTE SUBACQUEE
+    (("node", "way"), "natural", "=", "cave"),
+    (("node",), "submarine_cave", "=", "yes"),
+    # ✅ FIX MarineDeep: Relitti con nome specifico (solo se subacqueo)
+    (("node", "way"), "name", "~", "^(relitto|wreck|shipwreck|naufragio|secca|reef|shoal|scoglio.*sommerso)"),
+)
+
+# Comuni e frazioni: stessi elementi di OverpassQueryBuilder.build_municipality_query (la
+# relazione admin_level=8 con place è già compresa nelle relazioni admin_level 8-10)
+MUNICIPALITY_SELECTORS: Tuple[OverpassSelector, ...] = (
+    (("node",), "place", "~", "^(city|town|village|hamlet|suburb|neighbourhood|locality)$"),
+    (("relation",), "admin_level", "~", "^(8|9|10)$"),
+)
+
+# Tag di superficie (sottostringhe dei valori) e parole chiave di superficie nel nome/descrizione:
+# ✅ FIX MarineDeep: elementi da escludere dalla ricerca marina (porti, fari, marine, baie, isole, città, coste)
+SURFACE_TAG_SUBSTRINGS = (
+    "port", "harbour", "harbor", "marina", "lighthouse", "beacon",
+    "beach", "bay", "coastline", "coast", "city", "town", "village",
+    "island", "islet", "place", "promontory", "peninsula"
+)
+SURFACE_KEYWORDS = (
+    "porto", "port", "harbour", "harbor", "marina",
+    "faro", "lighthouse", "phare", "far",
+    "spiaggia", "beach", "plage",
+    "baia", "bay", "baie",
+    "isola", "island", "île",
+    "città", "city", "ville", "town",
+    "costa", "coast", "coastline", "côte",
+    "capo", "cape", "cap",
+    "promontory", "promontorio", "promontòire",
+    "peninsula", "penisola", "péninsule"
+)
+# Relitti noti di altre località (es. Moskva è notoriamente nel Mar Nero)
+IRRELEVANT_WRECK_KEYWORDS = ("moskva", "moscova", "moscow", "москва")
+IMPORTANT_KEYWORDS = ("unesco", "world heritage", "national", "famous", "historic")
+
+NAME_TAGS = ("name", "name:it", "name:en", "official_name", "short_name")
+
+MAIN_TYPES = {
+    ("tourism", "attraction"): "Tourist attraction",
+    ("tourism", "museum"): "Museum",
+    ("tourism", "castle"): "Castle",
+    ("tourism", "monument"): "Monument",
+    ("tourism", "viewpoint"): "Viewpoint",
+    ("tourism", "archaeological_site"): "Archaeological site",
+    ("historic", "castle"): "Historic castle",
+    ("historic", "fortress"): "Fortress",
+    ("historic", "monument"): "Historic monument",
+    ("historic", "ruins"): "Historic ruins",
+    ("historic", "palace"): "Historic palace",
+    ("amenity", "place_of_worship"): "Place of worship",
+    ("amenity", "library"): "Library",
+    ("amenity", "theatre"): "Theatre",
+    ("natural", "peak"): "Mountain peak",
+    ("natural", "cliff"): "Cliff",
+    ("natural", "beach"): "Beach",
+    ("natural", "reef"): "Reef",
+}
+MAIN_TYPE_KEYS = ("tourism", "historic", "amenity", "natural")
+
+# Tipo marino per coppia (chiave, valore), per chiave presente con valore non vuoto e per nome;
+# a parità di elemento vale la priorità relitto > reef > ostacolo > immersione > grotta
+MARINE_TAG_TYPES = {
+    ("historic", "wreck"): "wreck",
+    ("seamark:type", "wreck"): "wreck",
+    ("site_type", "wreck"): "wreck",
+    ("natural", "reef"): "reef",
+    ("natural", "shoal"): "reef",
+    ("natural", "bank"): "reef",
+    ("seamark:type", "obstruction"): "obstruction",
+    ("underwater", "yes"): "obstruction",
+    ("sport", "diving"): "diving_site",
+    ("leisure", "diving"): "diving_site",
+    ("scuba_diving", "yes"): "diving_site",
+    ("diving_site", "yes"): "diving_site",
+    ("seamark:type", "diving"): "diving_site",
+    ("natural", "cave"): "cave",
+    ("submarine_cave", "yes"): "cave",
+}
+MARINE_KEY_TYPES = {"seamark:wreck:category": "wreck", "wreck": "wreck"}
+REEF_NAME_KEYWORDS = ("reef", "shoal", "secca", "scoglio sommerso")
+MARINE_TYPE_PRIORITY = ("wreck", "reef", "obstruction", "diving_site", "cave")
+
+def _any_of(keywords: Iterable[str]) -> "re.Pattern":
+    """Un solo pattern per "una qualsiasi delle sottostringhe" (equivale a any(k in text))
+    
+    Le parole chiave sono fuse in un trie, così ogni posizione del testo è esaminata una
+    volta sola invece che una volta per parola chiave; le parole che estendono una parola
+    già presente (es. "porto" dopo "port") sono superflue e vengono scartate.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node: Dict[str, dict]) -> str:
+        if "" in node:
+            return ""
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    
+    return re.compile(build(trie))
+
+def _each_of(keywords: Iterable[str]) -> "re.Pattern":
+    """Pattern che trova tutte le occorrenze, anche sovrapposte (per contare le parole chiave distinte)"""
+    return re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in keywords) + "))")
+
+class OSMClassifier:
+    """Classificatore dei POI OSM compilato una volta all'import
+    
+    - categoria terra/mare dai selettori: dizionari per (chiave, valore) e per chiave,
+      regex compilate solo per i selettori "~"
+    - esclusione degli elementi di superficie, tipo marino, rilevanza turistica e
+      punteggio con un solo pattern per ogni gruppo di parole chiave
+    Il risultato è identico alla catena di controlli per tag e parole chiave che sostituisce.
+    """
+    
+    def __init__(self):
+        self._equals: Dict[Tuple[str, str], List[Tuple[str, frozenset]]] = {}
+        self._present: Dict[str, List[Tuple[str, frozenset]]] = {}
+        self._regex: Dict[str, List[Tuple[str, frozenset, "re.Pattern"]]] = {}
+        for category, selectors in (("land", TOURIST_SELECTORS), ("marine", MARINE_SELECTORS),
+                                    ("municipality", MUNICIPALITY_SELECTORS)):
+            for element_types, key, operator, value in selectors:
+                entry = (category, frozenset(element_types))
+                if operator == "=":
+                    self._equals.setdefault((key, value), []).append(entry)
+                elif operator == "~":
+                    self._regex.setdefault(key, []).append(entry + (re.compile(value),))
+                else:
+                    self._present.setdefault(key, []).append(entry)
+        
+        self._surface_tags = _any_of(SURFACE_TAG_SUBSTRINGS)
+        self._surface_keywords = _any_of(SURFACE_KEYWORDS)
+        self._irrelevant_wreck = _any_of(IRRELEVANT_WRECK_KEYWORDS)
+        self._reef_name = _any_of(REEF_NAME_KEYWORDS)
+        self._tourist_keywords = _any_of(POIValidator.TOURIST_KEYWORDS)
+        self._marine_keywords = _any_of(POIValidator.MARINE_KEYWORDS)
+        self._important_keywords = _each_of(IMPORTANT_KEYWORDS)
+    
+    def categories(self, element: OSMRecord, wanted: Tuple[str, ...] = ("land", "marine")) -> List[str]:
+        """Categorie (tra wanted: "land", "marine", "municipality") dei selettori soddisfatti dall'elemento, come li valuta Overpass"""
+        element_type = element.type
+        found = set()
+        for key, value in element.tags.items():
+            for entries in (self._equals.get((key, value)), self._present.get(key)):
+                if entries:
+                    found.update(category for category, types in entries if element_type in types)
+            for category, types, pattern in self._regex.get(key, ()):
+                if element_type in types and category not in found and pattern.search(value):
+                    found.add(category)
+        return [category for category in wanted if category in found]
+    
+    def name(self, tags: Dict[str, str]) -> Optional[str]:
+        """Nome del POI dai tag (con ripiego sul tipo turistico/storico)"""
+        for tag in NAME_TAGS:
+            value = tags.get(tag)
+            if value and value.strip():
+                return value.strip()
+        if "tourism" in tags:
+            return f"{tags['tourism'].title()} POI"
+        elif "historic" in tags:
+            return f"{tags['historic'].title()} Site"
+        return None
+    
+    def description(self, tags: Dict[str, str]) -> str:
+        """Descrizione: tipo principale, descrizione/nota, data di costruzione, altitudine"""
+        parts = []
+        for key in MAIN_TYPE_KEYS:
+            main_type = MAIN_TYPES.get((key, tags.get(key)))
+            if main_type:
+                parts.append(main_type)
+                break
+        if "description" in tags:
+            parts.append(tags["description"])
+        elif "note" in tags:
+            parts.append(tags["note"])
+        if "start_date" in tags:
+            parts.append(f"Built in {tags['start_date']}")
+        if "ele" in tags:
+            try:
+                parts.append(f"Elevation: {float(tags['ele'])}m")
+            except ValueError:
+                pass
+        return ". ".join(parts)
+    
+    def marine_type(self, tags: Dict[str, str], name: str) -> Optional[str]:
+        """Tipo subacqueo (wreck | reef | obstruction | diving_site | cave) o None"""
+        found = set()
+        for key, value in tags.items():
+            marine_type = MARINE_TAG_TYPES.get((key, value))
+            if marine_type:
+                found.add(marine_type)
+            if value and key in MARINE_KEY_TYPES:
+                found.add(MARINE_KEY_TYPES[key])
+        if self._reef_name.search(name.lower()):
+            found.add("reef")
+        for marine_type in MARINE_TYPE_PRIORITY:
+            if marine_type in found:
+                return marine_type
+        return None
+    
+    def is_surface(self, tags: Dict[str, str], text: str) -> bool:
+        """✅ FIX MarineDeep: elemento di superficie (porto, faro, marina, baia, isola, città): va escluso"""
+        values = "\x00".join(str(value) for value in tags.values()).lower()
+        return bool(self._surface_tags.search(values) or self._surface_keywords.search(text))
+    
+    def relevance_score(self, description: str) -> float:
+        """Punteggio 1-5 di un POI OSM (come POIValidator.calculate_relevance_score con fonte OSM)"""
+        score = 1.0
+        if len(description) > 100:
+            score += 0.8
+        elif len(description) > 50:
+            score += 0.4
+        for _ in set(self._important_keywords.findall(description.lower())):
+            score += 0.3
+        return min(score, 5.0)
+    
+    def classify(self, element: OSMRecord, poi_type: str) -> Optional[Dict]:
+        """POI dell'elemento come "land" o "marine", o None se da scartare
+        
+        Un solo passaggio: coordinate, nome, descrizione, esclusione superficie e tipo
+        marino, punteggio di rilevanza e filtro di rilevanza turistica.
+        """
+        lat, lng = element.lat, element.lon
+        if not lat or not lng:
+            return None
+        tags = element.tags
+        name = self.name(tags)
+        if not name:
+            return None
+        # Scarto rapido (solo lookup sui tag) degli elementi senza un tipo subacqueo
+        marine_type = self.marine_type(tags, name) if poi_type == "marine" else None
+        if poi_type == "marine" and marine_type is None:
+            return None
+        
+        poi = {
+            "name": name,
+            "lat": lat,
+            "lng": lng,
+            "source": "OSM",
+            "type": poi_type,
+            "osm_id": element.id,
+            "osm_type": element.type
+        }
+        description = self.description(tags)
+        if description:
+            poi["description"] = description
+        text = f"{name} {description}".lower()
+        
+        if poi_type == "marine":
+            if self.is_surface(tags, text):
+                return None
+            if marine_type == "wreck" and self._irrelevant_wreck.search(text):
+                logger.logger.warning(f"[POI-MARINE] ⚠️ Relitto OSM irrilevante '{name}' escluso")
+                return None
+            self._add_marine_metadata(poi, tags)
+            poi["marine_type"] = marine_type
+            relevant = self._marine_keywords.search(f"{text} {poi_type}")
+        else:
+            relevant = self._tourist_keywords.search(f"{text} {poi_type.lower()}")
+        if not relevant:
+            return None
+        
+        poi["relevance_score"] = self.relevance_score(description)
+        return poi
+    
+    def _add_marine_metadata(self, poi: Dict, tags: Dict[str, str]):
+        """Profondità, tipo di seamark e informazioni per diving"""
+        if "depth" in tags:
+            try:
+                poi["depth"] = float(tags["depth"])
+            except ValueError:
+                pass
+        if "seamark:type" in tags:
+            poi["seamark_type"] = tags["seamark:type"]
+        if tags.get("sport") == "diving" or tags.get("leisure") == "diving":
+            poi["diving_site"] = True
+            if "diving:visibility" in tags:
+                poi["visibility"] = tags["diving:visibility"]
+
+_classifier = OSMClassifier()
+
+def get_osm_classifier() -> OSMClassifier:
+    """Classificatore compilato all'import (condiviso dal processo)"""
+    return _classifier
@@ -0,0 +1,339 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Iterator, AsyncIterator
+from .overpass_stream import OSMRecord, OverpassResult
+from .json_stream import JsonArrayStream, STREAM_CHUNK_SIZE
+from .osm_classifier import get_osm_classifier
+from .utils import SemanticLogger
+
+logger = SemanticLogger()
+
+# Database SQLite (indice R-tree) con l'estratto OSM locale, creato dall'import da riga di comando:
+#   python -m core.osm_local_store liguria-latest.osm.pbf --db ../data/osm_local.sqlite
+# Se il file esiste, le query tourist/marine/poi/municipality sui bbox coperti non passano da Overpass
+OSM_LOCAL_STORE_PATH = os.getenv("OSM_LOCAL_STORE_PATH", "../data/osm_local.sqlite")
+OSM_LOCAL_IMPORT_BATCH = 5000
+
+BBox = Tuple[float, float, float, float]
+
+# Categorie del classificatore salvate come bit del campo kinds e categorie di ogni tipo di query
+CATEGORY_BITS = {"land": 1, "marine": 2, "municipality": 4}
+KIND_CATEGORIES = {
+    "tourist": ("land",),
+    "marine": ("marine",),
+    "poi": ("land", "marine"),
+    "municipality": ("municipality",),
+}
+
+SCHEMA = """
+CREATE TABLE elements (
+    rowid INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    kinds INTEGER NOT NULL,
+    tags TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE elements_index USING rtree(rowid, min_lat, max_lat, min_lon, max_lon);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+def _parse_bbox(value: str) -> BBox:
+    south, west, north, east = (float(part) for part in value.split(","))
+    return south, west, north, east
+
+class LocalOSMStore:
+    """Estratto OSM locale interrogabile al posto di Overpass
+
+    Contiene solo gli elementi che soddisfano i selettori turistici, marini o dei comuni,
+    ciascuno con il punto rappresentativo (nodo o centro) indicizzato in un R-tree e le
+    categorie calcolate all'import: una query è una ricerca per bbox con filtro sui bit
+    delle categorie, e restituisce gli stessi OSMRecord delle risposte Overpass.
+    Dopo un nuovo import il servizio va riavviato per leggere il nuovo file.
+    """
+
+    def __init__(self, path: str = OSM_LOCAL_STORE_PATH):
+        self.path = path
+        self.bounds: Optional[BBox] = None
+        self.osm_base: Optional[str] = None
+        self.meta: Dict[str, str] = {}
+        self.queries = 0
+        self.elements_returned = 0
+        self.query_seconds = 0.0
+        self._local = threading.local()
+        self._load()
+
+    @property
+    def available(self) -> bool:
+        return self.bounds is not None
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            logger.logger.info(f"🗺️ Estratto OSM locale non trovato ({self.path}): query tramite Overpass")
+            return
+        try:
+            self.meta = dict(self._connection().execute("SELECT key, value FROM meta").fetchall())
+            self.bounds = _parse_bbox(self.meta["bounds"])
+            self.osm_base = self.meta.get("osm_base") or None
+            logger.logger.info(f"🗺️ Estratto OSM locale caricato: {self.meta.get('elements')} elementi, "
+                               f"bbox {self.bounds}, dati OSM del {self.osm_base or 'n/d'}")
+        except Exception as e:
+            self.bounds = None
+            logger.log_error("OSM Local Store", f"{self.path}: {e}", "")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connessione in sola lettura del thread corrente (le query girano nei thread di asyncio.to_thread)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+
+    def covers(self, bbox: BBox) -> bool:
+        """True se l'estratto è disponibile e contiene interamente il bbox"""
+        if not self.available:
+            return False
+        south, west, north, east = self.bounds
+        return bbox[0] >= south and bbox[1] >= west and bbox[2] <= north and bbox[3] <= east
+
+    async def query(self, kind: str, bbox: BBox) -> OverpassResult:
+        """Elementi del tipo di query `kind` (tourist | marine | poi | municipality) nel bbox"""
+        mask = 0
+        for category in KIND_CATEGORIES[kind]:
+            mask |= CATEGORY_BITS[category]
+        started = time.monotonic()
+        records = await asyncio.to_thread(self._select, mask, bbox)
+        self.queries += 1
+        self.elements_returned += len(records)
+        self.query_seconds += time.monotonic() - started
+        return OverpassResult(records, self.osm_base)
+
+    def _select(self, mask: int, bbox: BBox) -> List[OSMRecord]:
+        south, west, north, east = bbox
+        rows = self._connection().execute(
+            "SELECT e.type, e.id, e.lat, e.lon, e.tags FROM elements_index i "
+            "JOIN elements e ON e.rowid = i.rowid "
+            "WHERE i.min_lat <= ? AND i.max_lat >= ? AND i.min_lon <= ? AND i.max_lon >= ? "
+            "AND (e.kinds & ?) != 0",
+            (north, south, east, west, mask))
+        return [OSMRecord(sys.intern(osm_type), osm_id, lat, lon,
+                          {sys.intern(key): value for key, value in json.loads(tags).items()})
+                for osm_type, osm_id, lat, lon, tags in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "path": self.path,
+            "bounds": self.bounds,
+            "osm_base": self.osm_base,
+            "elements": int(self.meta.get("elements", 0)),
+            "source": self.meta.get("source"),
+            "queries": self.queries,
+            "elements_returned": self.elements_returned,
+            "avg_query_ms": round(1000 * self.query_seconds / self.queries, 2) if self.queries else None
+        }
+
+_local_store: Optional[LocalOSMStore] = None
+_local_store_lock = threading.Lock()
+
+def get_local_osm_store() -> LocalOSMStore:
+    """Estratto OSM locale del processo (aperto al primo uso, di norma allo startup)"""
+    global _local_store
+    if _local_store is None:
+        with _local_store_lock:
+            if _local_store is None:
+                _local_store = LocalOSMStore()
+    return _local_store
+
+# --- Import dell'estratto ---
+
+class _StoreWriter:
+    """Scrive gli elementi classificati in un nuovo database (a blocchi, in una transazione)"""
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.classifier = get_osm_classifier()
+        self.categories = tuple(CATEGORY_BITS)
+        self.seen = set()
+        self.counts = {category: 0 for category in CATEGORY_BITS}
+        self.elements = 0
+        self._rows: List[tuple] = []
+        self._index: List[tuple] = []
+
+    def add(self, record: OSMRecord):
+        """Aggiunge l'elemento se soddisfa almeno un selettore (i duplicati per tipo e id sono ignorati)"""
+        categories = self.classifier.categories(record, self.categories)
+        if not categories or record.key in self.seen:
+            return
+        self.seen.add(record.key)
+        kinds = 0
+        for category in categories:
+            kinds |= CATEGORY_BITS[category]
+            self.counts[category] += 1
+        self.elements += 1
+        self._rows.append((self.elements, record.type, record.id, record.lat, record.lon, kinds,
+                           json.dumps(record.tags, ensure_ascii=False)))
+        self._index.append((self.elements, record.lat, record.lat, record.lon, record.lon))
+        if len(self._rows) >= OSM_LOCAL_IMPORT_BATCH:
+            self._flush()
+
+    def _flush(self):
+        self.connection.executemany("INSERT INTO elements VALUES (?, ?, ?, ?, ?, ?, ?)", self._rows)
+        self.connection.executemany("INSERT INTO elements_index VALUES (?, ?, ?, ?, ?)", self._index)
+        self._rows, self._index = [], []
+
+    def close(self, meta: Dict[str, Any]):
+        self._flush()
+        meta = dict(meta, elements=self.elements, **{f"elements_{key}": value for key, value in self.counts.items()})
+        self.connection.executemany("INSERT INTO meta VALUES (?, ?)",
+                                    [(key, str(value)) for key, value in meta.items() if value is not None])
+        self.connection.commit()
+        self.connection.close()
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+async def _read_overpass_json(path: str, writer: _StoreWriter) -> Optional[str]:
+    """Legge una risposta Overpass JSON salvata su file (elementi con `out center tags;` o `out geom;`)"""
+    stream = JsonArrayStream("elements")
+    async for element in stream.iterate(_file_chunks(path)):
+        record = OSMRecord.from_element(element)
+        if record is not None:
+            writer.add(record)
+    return stream.osm_base
+
+def _center(locations: Iterator[Any]) -> Optional[Tuple[float, float]]:
+    """Centro del bbox dei punti validi (come il center di Overpass)"""
+    lats, lons = [], []
+    for location in locations:
+        if location.valid():
+            lats.append(location.lat)
+            lons.append(location.lon)
+    if not lats:
+        return None
+    return (min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2
+
+def _osm_header(path: str) -> Tuple[Optional[str], Optional[str]]:
+    """(osm_base, bounds) dall'header di un estratto .osm.pbf/.osm"""
+    import osmium
+
+    reader = osmium.io.Reader(path)
+    header = reader.header()
+    reader.close()
+    box = header.box()
+    bounds = None
+    if box.valid():
+        bounds = f"{box.bottom_left.lat},{box.bottom_left.lon},{box.top_right.lat},{box.top_right.lon}"
+    return header.get("osmosis_replication_timestamp") or None, bounds
+
+def _read_osm_file(path: str, writer: _StoreWriter):
+    """Legge un estratto .osm.pbf/.osm con pyosmium"""
+    import osmium
+
+    class Handler(osmium.SimpleHandler):
+        def node(self, node):
+            if node.tags and node.location.valid():
+                writer.add(OSMRecord("node", node.id, node.location.lat, node.location.lon,
+                                     {tag.k: tag.v for tag in node.tags}))
+
+        def way(self, way):
+            if way.tags:
+                center = _center(node.location for node in way.nodes)
+                if center:
+                    writer.add(OSMRecord("way", way.id, center[0], center[1], {tag.k: tag.v for tag in way.tags}))
+
+        def area(self, area):
+            # Le way chiuse sono già lette da way(): qui solo le relazioni (multipolygon e boundary)
+            if area.from_way() or not area.tags:
+                return
+            center = _center(node.location for ring in area.outer_rings() for node in ring)
+            if center:
+                writer.add(OSMRecord("relation", area.orig_id(), center[0], center[1],
+                                     {tag.k: tag.v for tag in area.tags}))
+
+    Handler().apply_file(path, locations=True)
+
+def import_extract(source: str, db_path: str, bounds: Optional[str] = None) -> Dict[str, Any]:
+    """Crea il database locale da un estratto OSM (.osm.pbf/.osm con pyosmium, oppure Overpass JSON)
+
+    Il database è scritto in un file temporaneo e sostituito solo a import riuscito.
+    L'area coperta è `bounds` o quella dell'header dell'estratto; senza area l'import fallisce
+    (il bbox degli elementi importati non è l'area scaricata e covers() la sovrastimerebbe).
+    Una risposta Overpass .json non ha header: il bbox della query va sempre indicato.
+    """
+    started = time.monotonic()
+    is_json = source.endswith(".json")
+    osm_base = None
+    if not bounds and not is_json:
+        osm_base, bounds = _osm_header(source)
+    if not bounds:
+        raise ValueError(f"area coperta da {os.path.basename(source)} non nota: indicare --bounds "
+                         "\"south,west,north,east\" (il bbox della query Overpass o dell'estratto)")
+    _parse_bbox(bounds)
+    
+    temporary = db_path + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    writer = _StoreWriter(temporary)
+    try:
+        if is_json:
+            osm_base = asyncio.run(_read_overpass_json(source, writer))
+        else:
+            osm_base = osm_base or _osm_header(source)[0]
+            _read_osm_file(source, writer)
+        meta = {"source": os.path.basename(source), "osm_base": osm_base,
+                "bounds": bounds, "imported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        writer.close(meta)
+    except BaseException:
+        writer.connection.close()
+        os.remove(temporary)
+        raise
+    os.replace(temporary, db_path)
+    meta.update(elements=writer.elements, seconds=round(time.monotonic() - started, 1), **writer.counts)
+    return meta
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Importa un estratto OSM nel database locale usato al posto di Overpass")
+    parser.add_argument("source", help="estratto .osm.pbf/.osm (richiede pyosmium) o risposta Overpass .json")
+    parser.add_argument("--db", default=OSM_LOCAL_STORE_PATH, help="database SQLite da creare")
+    parser.add_argument("--bounds", help="area coperta \"south,west,north,east\" (default: header dell'estratto; "
+                                         "obbligatoria per le risposte Overpass .json)")
+    args = parser.parse_args(argv)
+
+    if args.bounds:
+        _parse_bbox(args.bounds)
+    elif args.source.endswith(".json"):
+        print("❌ Una risposta Overpass .json non indica l'area scaricata: indicare --bounds con il bbox della query")
+        return 1
+    if not args.source.endswith(".json"):
+        try:
+            import osmium  # noqa: F401
+        except ImportError:
+            print("❌ Libreria osmium non installata: pip install osmium (oppure importa una risposta Overpass .json)")
+            return 1
+
+    try:
+        meta = import_extract(args.source, args.db, args.bounds)
+    except ValueError as e:
+        print(f"❌ Import non eseguito: {e}")
+        return 1
+    print(f"✅ Estratto OSM importato in {args.db}: {meta['elements']} elementi "
+          f"({meta['land']} turistici, {meta['marine']} marini, {meta['municipality']} comuni) "
+          f"in {meta['seconds']}s, bbox {meta['bounds']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
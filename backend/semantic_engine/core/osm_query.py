@@ -2,126 +2,176 @@ import requests
 import asyncio
 import aiohttp
 import json
-from typing import List, Dict, Any, Tuple, Optional
-from .utils import SemanticLogger, POIValidator
+import math
+import os
+import shapely
+from shapely.geometry import Polygon, box
+from typing import List, Dict, Any, Tuple, Optional, Union, Callable
+from .utils import (SemanticLogger, zone_geometry, deadline_timeout, deadline_expired, mark_truncated, mark_failed,
+                    METERS_PER_DEG_LAT_MIN, METERS_PER_DEG_LNG_EQUATOR)
+from .http_pool import get_http_session
+from .overpass_tiles import get_overpass_tile_cache
+from .overpass_stream import OSMRecord, OverpassResult
+from .json_stream import JsonArrayStream, STREAM_CHUNK_SIZE
+from .overpass_pool import OverpassError, OVERPASS_ENDPOINTS, get_overpass_pool, parse_retry_after
+from .osm_classifier import OverpassSelector, TOURIST_SELECTORS, MARINE_SELECTORS, get_osm_classifier
+from .osm_local_store import LocalOSMStore, get_local_osm_store
 
 logger = SemanticLogger()
 
+# Zone che coprono meno di questa frazione del proprio bbox (es. fasce costiere diagonali)
+# vengono interrogate con il filtro poly: invece che per bbox/tile
+OVERPASS_POLY_MAX_FILL = float(os.getenv("OVERPASS_POLY_MAX_FILL", "0.5"))
+# Tolleranza di semplificazione del poligono e numero massimo di vertici per filtro poly:
+OVERPASS_POLY_SIMPLIFY_M = float(os.getenv("OVERPASS_POLY_SIMPLIFY_M", "150"))
+OVERPASS_POLY_MAX_VERTICES = int(os.getenv("OVERPASS_POLY_MAX_VERTICES", "80"))
+# Lato delle celle in cui vengono suddivisi i poligoni grandi (una sotto-query per cella, in parallelo)
+OVERPASS_POLY_SPLIT_KM = float(os.getenv("OVERPASS_POLY_SPLIT_KM", "25"))
+
+# Area di una query Overpass: bbox (south, west, north, east) o coordinate "lat lng ..." di un filtro poly:
+OverpassArea = Union[Tuple[float, float, float, float], str]
+
+def _poly_coordinates(polygon: Polygon, max_vertices: int) -> Optional[str]:
+    """Anello esterno come stringa "lat lng lat lng ..." per poly:, entro max_vertices vertici"""
+    ring = polygon.exterior
+    tolerance = 0.0
+    while len(ring.coords) - 1 > max_vertices:
+        # Raddoppia la tolleranza finché il contorno non rientra nel limite di vertici
+        tolerance = tolerance * 2 if tolerance else ring.length / max_vertices / 4
+        ring = polygon.simplify(tolerance, preserve_topology=False).exterior
+    coords = list(ring.coords)[:-1]
+    if len(coords) < 3:
+        return None
+    return " ".join(f"{lat:.6f} {lng:.6f}" for lng, lat in coords)
+
+def zone_poly_filters(polygon: List[List[float]], simplify_m: float = OVERPASS_POLY_SIMPLIFY_M,
+                      split_km: float = OVERPASS_POLY_SPLIT_KM,
+                      max_vertices: int = OVERPASS_POLY_MAX_VERTICES) -> List[str]:
+    """Filtri poly: che coprono la zona: uno per cella di griglia se la zona è grande
+    
+    Il poligono viene allargato della tolleranza prima di essere semplificato, così il
+    contorno semplificato contiene sempre la zona originale (i POI sul bordo non si perdono).
+    I buchi vengono ignorati: poly: accetta solo un anello esterno.
+    """
+    shape = zone_geometry(polygon).shape
+    lat0 = shape.centroid.y
+    deg_per_m_lat = 1.0 / METERS_PER_DEG_LAT_MIN
+    deg_per_m_lng = 1.0 / (METERS_PER_DEG_LNG_EQUATOR * max(math.cos(math.radians(lat0)), 0.01))
+    tolerance = simplify_m * max(deg_per_m_lat, deg_per_m_lng)
+    simplified = shape.buffer(tolerance, join_style="mitre").simplify(tolerance, preserve_topology=True)
+    
+    west, south, east, north = simplified.bounds
+    cell_lat = split_km * 1000 * deg_per_m_lat
+    cell_lng = split_km * 1000 * deg_per_m_lng
+    rows = max(1, math.ceil((north - south) / cell_lat))
+    cols = max(1, math.ceil((east - west) / cell_lng))
+    if rows * cols == 1:
+        parts = [simplified]
+    else:
+        cells = [box(west + col * cell_lng, south + row * cell_lat,
+                     min(east, west + (col + 1) * cell_lng), min(north, south + (row + 1) * cell_lat))
+                 for row in range(rows) for col in range(cols)]
+        parts = [part for part in shapely.intersection(simplified, cells) if not part.is_empty]
+    
+    filters = []
+    for part in parts:
+        for piece in getattr(part, "geoms", [part]):
+            if isinstance(piece, Polygon) and not piece.is_empty:
+                coordinates = _poly_coordinates(piece, max_vertices)
+                if coordinates:
+                    filters.append(coordinates)
+    return filters
+
+def zone_fill_ratio(polygon: List[List[float]], bbox: Tuple[float, float, float, float]) -> float:
+    """Frazione del bbox occupata dalla zona (1.0 = la zona è il bbox)"""
+    south, west, north, east = bbox
+    bbox_area = (north - south) * (east - west)
+    if bbox_area <= 0:
+        return 1.0
+    return min(1.0, zone_geometry(polygon).shape.area / bbox_area)
+
+# Output dei POI: "center" = nodi con coordinate, way/relazioni con il solo centro (i POI usano
+# un punto solo); "geom" scarica le geometrie complete delle way
+OVERPASS_POI_OUTPUT = os.getenv("OVERPASS_POI_OUTPUT", "center")
+
+def selector_filter(selector: OverpassSelector) -> str:
+    """Filtro sui tag in sintassi Overpass, es. ["amenity"="place_of_worship"]"""
+    _, key, operator, value = selector
+    return f'["{key}"{operator}"{value}"]' if operator else f'["{key}"]'
+
 class OverpassQueryBuilder:
     """Costruisce query Overpass API per diversi tipi di POI"""
     
     def __init__(self):
-        self.base_url = "https://overpass-api.de/api/interpreter"
+        self.base_url = OVERPASS_ENDPOINTS[0]  # Endpoint preferito: le query passano dal pool (vedi overpass_pool)
         self.timeout = 60  # Aumentato a 60 secondi per query complesse
     
-    def build_tourist_query(self, bbox: Tuple[float, float, float, float]) -> str:
+    @staticmethod
+    def area_filter(area: OverpassArea) -> str:
+        """Filtro spaziale Overpass: (south,west,north,east) per un bbox, (poly:"...") per un poligono"""
+        if isinstance(area, str):
+            return f'(poly:"{area}")'
+        south, west, north, east = area
+        return f"({south},{west},{north},{east})"
+    
+    def build_tourist_query(self, area: OverpassArea, output: str = OVERPASS_POI_OUTPUT) -> str:
         """Costruisce query per POI turistici terrestri"""
-        south, west, north, east = bbox
-        
-        query = f"""
-        [out:json][timeout:50];
-        (
-          // Monumenti e attrazioni
-          node["tourism"~"^(attraction|museum|castle|monument|viewpoint|archaeological_site)$"]({south},{west},{north},{east});
-          way["tourism"~"^(attraction|museum|castle|monument|viewpoint|archaeological_site)$"]({south},{west},{north},{east});
-          
-          // Edifici religiosi
-          node["amenity"="place_of_worship"]({south},{west},{north},{east});
-          way["amenity"="place_of_worship"]({south},{west},{north},{east});
-          node["building"="church"]({south},{west},{north},{east});
-          way["building"="church"]({south},{west},{north},{east});
-          
-          // Edifici storici
-          node["historic"~"^(castle|fortress|monument|archaeological_site|ruins|palace|manor)$"]({south},{west},{north},{east});
-          way["historic"~"^(castle|fortress|monument|archaeological_site|ruins|palace|manor)$"]({south},{west},{north},{east});
-          
-          // Parchi e giardini
-          node["leisure"~"^(park|garden|nature_reserve)$"]({south},{west},{north},{east});
-          way["leisure"~"^(park|garden|nature_reserve)$"]({south},{west},{north},{east});
-          
-          // Musei e cultura
-          node["amenity"~"^(library|theatre|cinema|arts_centre)$"]({south},{west},{north},{east});
-          way["amenity"~"^(library|theatre|cinema|arts_centre)$"]({south},{west},{north},{east});
-          
-          // Punti panoramici naturali
-          node["natural"~"^(peak|cliff|beach|cape)$"]({south},{west},{north},{east});
-          way["natural"~"^(peak|cliff|beach|cape)$"]({south},{west},{north},{east});
-        );
-        out geom;
-        """
-        return query
+        return self._build_selector_query(TOURIST_SELECTORS, area, output)
     
-    def build_marine_query(self, bbox: Tuple[float, float, float, float]) -> str:
+    def build_marine_query(self, area: OverpassArea, output: str = OVERPASS_POI_OUTPUT) -> str:
         """✅ FIX MarineDeep: Costruisce query per SOLO POI subacquei (relitti, reef, shoal, ostacoli sommersi)
         Esclude rigorosamente: porti, fari, marine, baie, isole, città, coste
         """
-        south, west, north, east = bbox
-        
-        query = f"""
-        [out:json][timeout:50];
-        (
-          // ✅ FIX MarineDeep: SOLO RELITTI subacquei
-          node["historic"="wreck"]({south},{west},{north},{east});
-          way["historic"="wreck"]({south},{west},{north},{east});
-          node["seamark:type"="wreck"]({south},{west},{north},{east});
-          node["seamark:wreck:category"]({south},{west},{north},{east});
-          node["wreck"]({south},{west},{north},{east});
-          node["site_type"="wreck"]({south},{west},{north},{east});
-          node["name"~"^(relitto|wreck|shipwreck|naufragio)"]({south},{west},{north},{east});
-          way["name"~"^(relitto|wreck|shipwreck|naufragio)"]({south},{west},{north},{east});
-          
-          // ✅ FIX MarineDeep: SOLO REEF e SHOAL sommersi
-          node["natural"="reef"]({south},{west},{north},{east});
-          way["natural"="reef"]({south},{west},{north},{east});
-          node["natural"="shoal"]({south},{west},{north},{east});
-          way["natural"="shoal"]({south},{west},{north},{east});
-          node["natural"="bank"]({south},{west},{north},{east});
-          way["natural"="bank"]({south},{west},{north},{east});
-          
-          // ✅ FIX MarineDeep: SOLO OSTACOLI SOMMERSI
-          node["seamark:type"="obstruction"]({south},{west},{north},{east});
-          way["seamark:type"="obstruction"]({south},{west},{north},{east});
-          node["seamark:obstruction:category"]({south},{west},{north},{east});
-          node["underwater"="yes"]({south},{west},{north},{east});
-          way["underwater"="yes"]({south},{west},{north},{east});
-          
-          // ✅ FIX MarineDeep: SOLO SITI IMMERSIONE SUBACQUEI
-          node["sport"="diving"]({south},{west},{north},{east});
-          way["sport"="diving"]({south},{west},{north},{east});
-          node["leisure"="diving"]({south},{west},{north},{east});
-          node["scuba_diving"="yes"]({south},{west},{north},{east});
-          node["diving_site"="yes"]({south},{west},{north},{east});
-          node["seamark:type"="diving"]({south},{west},{north},{east});
-          
-          // ✅ FIX MarineDeep: GROTTE SUBACQUEE
-          node["natural"="cave"]({south},{west},{north},{east});
-          way["natural"="cave"]({south},{west},{north},{east});
-          node["submarine_cave"="yes"]({south},{west},{north},{east});
-          
-          // ✅ FIX MarineDeep: Relitti con nome specifico (solo se subacqueo)
-          node["name"~"^(relitto|wreck|shipwreck|naufragio|secca|reef|shoal|scoglio.*sommerso)"]({south},{west},{north},{east});
-          way["name"~"^(relitto|wreck|shipwreck|naufragio|secca|reef|shoal|scoglio.*sommerso)"]({south},{west},{north},{east});
-        );
-        out body;
-        """
-        return query
+        return self._build_selector_query(MARINE_SELECTORS, area, output)
+    
+    def build_poi_query(self, area: OverpassArea, include_marine: bool = True,
+                        output: str = OVERPASS_POI_OUTPUT) -> str:
+        """Query unica per POI terrestri e (se richiesto) subacquei: la classificazione
+        terra/mare è fatta sui tag degli elementi restituiti (vedi OSMClassifier.categories)"""
+        selectors = TOURIST_SELECTORS + MARINE_SELECTORS if include_marine else TOURIST_SELECTORS
+        return self._build_selector_query(selectors, area, output)
+    
+    def build_refresh_query(self, selectors: Tuple[OverpassSelector, ...], area: OverpassArea, since: str,
+                            output: str = OVERPASS_POI_OUTPUT) -> str:
+        """Query di aggiornamento incrementale: id di tutti gli elementi attuali (out ids, per
+        riconoscere cancellati e non più corrispondenti) e elementi completi modificati dopo since"""
+        newer = f'(newer:"{since}")'
+        return (f"[out:json][timeout:50];\n(\n{self._selector_statements(selectors, area)}\n)->.pois;\n"
+                f".pois out ids;\n{self._output_statements(output, newer)}")
+    
+    def _build_selector_query(self, selectors: Tuple[OverpassSelector, ...], area: OverpassArea, output: str) -> str:
+        return (f"[out:json][timeout:50];\n(\n{self._selector_statements(selectors, area)}\n)->.pois;\n"
+                f"{self._output_statements(output)}")
     
-    def build_municipality_query(self, bbox: Tuple[float, float, float, float]) -> str:
+    def _selector_statements(self, selectors: Tuple[OverpassSelector, ...], area: OverpassArea) -> str:
+        area = self.area_filter(area)
+        return "\n".join(f"  {element_type}{selector_filter(selector)}{area};"
+                         for selector in selectors for element_type in selector[0])
+    
+    def _output_statements(self, output: str, extra_filter: str = "") -> str:
+        """Output degli elementi del set .pois (eventualmente filtrati, es. newer)"""
+        if output == "center":
+            # Nodi con coordinate e tag; way e relazioni solo con centro e tag (niente geometrie né riferimenti)
+            return (f"node.pois{extra_filter};\nout body;\nway.pois{extra_filter};\nout center tags;\n"
+                    f"rel.pois{extra_filter};\nout center tags;")
+        return f"(node.pois{extra_filter}; way.pois{extra_filter}; rel.pois{extra_filter};);\nout {output};"
+    
+    def build_municipality_query(self, area: OverpassArea) -> str:
         """Costruisce query per comuni e frazioni"""
-        south, west, north, east = bbox
+        area = self.area_filter(area)
         
         query = f"""
         [out:json][timeout:50];
         (
           // Comuni
-          rel["admin_level"="8"]["place"~"^(city|town|village)$"]({south},{west},{north},{east});
-          node["place"~"^(city|town|village)$"]({south},{west},{north},{east});
+          rel["admin_level"="8"]["place"~"^(city|town|village)$"]{area};
+          node["place"~"^(city|town|village)$"]{area};
           
           // Frazioni e località
-          node["place"~"^(hamlet|suburb|neighbourhood|locality)$"]({south},{west},{north},{east});
+          node["place"~"^(hamlet|suburb|neighbourhood|locality)$"]{area};
           
           // Boundaries amministrativi
-          rel["admin_level"~"^(8|9|10)$"]({south},{west},{north},{east});
+          rel["admin_level"~"^(8|9|10)$"]{area};
         );
         out geom;
         """
@@ -132,39 +182,211 @@ class OSMDataExtractor:
     
     def __init__(self):
         self.query_builder = OverpassQueryBuilder()
+        self.classifier = get_osm_classifier()
         self.session = None
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session("overpass")
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     async def execute_query(self, query: str) -> Dict:
-        """Esegue una query Overpass API - ✅ FIX: Try/except robusto su chiamate HTTP"""
+        """Esegue una query Overpass API - ✅ FIX: Try/except robusto su chiamate HTTP
+        
+        Gli elementi restituiti sono OSMRecord compatti (vedi _fetch).
+        """
         try:
-            async with self.session.post(
-                self.query_builder.base_url,
-                data=query,
-                timeout=aiohttp.ClientTimeout(total=90)  # Aumentato timeout per richieste lente
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    # ✅ FIX: Log come warning, non error, e continua
-                    logger.logger.warning(f"OSM Query HTTP {response.status} - continua senza bloccare")
-                    return {"elements": []}
-        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            return {"elements": (await self._fetch(query)).records}
+        except OverpassError as e:
             # ✅ FIX: Log come warning, non error, e continua senza bloccare
-            logger.logger.warning(f"OSM Query timeout/connection error: {e} - continua senza bloccare")
+            logger.logger.warning(f"OSM Query {e} - continua senza bloccare")
+            mark_failed("osm")
             return {"elements": []}
         except Exception as e:
             # ✅ FIX: Log come warning, non error, e continua senza bloccare
             logger.logger.warning(f"OSM Query error: {e} - continua senza bloccare")
+            mark_failed("osm")
             return {"elements": []}
     
+    def _builder(self, kind: str):
+        return {
+            "tourist": self.query_builder.build_tourist_query,
+            "marine": self.query_builder.build_marine_query,
+            "municipality": self.query_builder.build_municipality_query,
+            # Query unica terra + mare (vedi search_osm_pois)
+            "poi": lambda area: self.query_builder.build_poi_query(area, include_marine=True),
+        }[kind]
+    
+    def _selectors(self, kind: str) -> Optional[Tuple[OverpassSelector, ...]]:
+        """Selettori della query (None per le query scritte a mano, senza aggiornamento incrementale)"""
+        return {
+            "tourist": TOURIST_SELECTORS,
+            "marine": MARINE_SELECTORS,
+            "poi": TOURIST_SELECTORS + MARINE_SELECTORS,
+        }.get(kind)
+    
+    async def execute_tiled_query(self, kind: str, bbox: Tuple[float, float, float, float],
+                                  polygon: Optional[List[List[float]]] = None) -> Dict:
+        """Esegue una query Overpass (tourist | marine | poi | municipality) passando dalla cache a tile
+        
+        Solo le tile non ancora in cache vengono scaricate; quelle scadute sono aggiornate
+        con una query newer dall'osm_base con cui erano state scaricate (solo modifiche e id).
+        Gli errori non vengono memorizzati e restituiscono una risposta vuota come execute_query.
+        Con il poligono della zona il risultato contiene solo gli elementi nella zona e,
+        se la zona copre poco del bbox, la query usa direttamente il filtro poly:.
+        Se l'estratto OSM locale copre il bbox, la query non passa da Overpass.
+        """
+        store = get_local_osm_store()
+        if store.covers(bbox):
+            return await self.execute_local_query(store, kind, bbox, polygon)
+        
+        if polygon and zone_fill_ratio(polygon, bbox) < OVERPASS_POLY_MAX_FILL:
+            return await self.execute_polygon_query(kind, polygon)
+        
+        builder = self._builder(kind)
+        selectors = self._selectors(kind)
+        
+        async def fetch(tiles_bbox: Tuple[float, float, float, float]) -> OverpassResult:
+            return await self._fetch(builder(tiles_bbox))
+        
+        async def refresh(tiles_bbox: Tuple[float, float, float, float], since: str) -> OverpassResult:
+            return await self._fetch(self.query_builder.build_refresh_query(selectors, tiles_bbox, since),
+                                     collect_keys=True)
+        
+        try:
+            elements = await get_overpass_tile_cache().query(kind, bbox, fetch, self._element_location,
+                                                             refresh if selectors else None)
+            if polygon:
+                elements = self._elements_in_zone(elements, polygon)
+            return {"elements": elements}
+        except OverpassError as e:
+            # ✅ FIX: Log come warning, non error, e continua senza bloccare
+            logger.logger.warning(f"OSM Query {e} - continua senza bloccare")
+            mark_failed("osm")
+            return {"elements": []}
+        except Exception as e:
+            logger.logger.warning(f"OSM Query error: {e} - continua senza bloccare")
+            mark_failed("osm")
+            return {"elements": []}
+    
+    async def execute_local_query(self, store: LocalOSMStore, kind: str, bbox: Tuple[float, float, float, float],
+                                  polygon: Optional[List[List[float]]] = None) -> Dict:
+        """Esegue la query sull'estratto OSM locale (stessi elementi e formato della query Overpass)"""
+        try:
+            elements = (await store.query(kind, bbox)).records
+            if polygon:
+                elements = self._elements_in_zone(elements, polygon)
+            return {"elements": elements}
+        except Exception as e:
+            logger.logger.warning(f"OSM Query locale {kind} error: {e} - continua senza bloccare")
+            mark_failed("osm")
+            return {"elements": []}
+    
+    async def execute_polygon_query(self, kind: str, polygon: List[List[float]]) -> Dict:
+        """Esegue una query Overpass con filtro poly: sul poligono semplificato della zona
+        
+        Le zone grandi sono suddivise in celle interrogate in parallelo; i risultati sono
+        uniti eliminando i duplicati per (tipo, id) OSM, dato che una way a cavallo di due
+        celle è restituita da entrambe. Le sotto-query fallite vengono scartate con un warning.
+        """
+        builder = self._builder(kind)
+        try:
+            filters = zone_poly_filters(polygon)
+        except Exception as e:
+            logger.logger.warning(f"OSM Query: poligono non utilizzabile per poly: ({e}) - continua senza bloccare")
+            mark_failed("osm")
+            return {"elements": []}
+        
+        # Gli elementi fuori dalla zona vengono scartati già durante la lettura della risposta
+        zone = zone_geometry(polygon)
+        accept = lambda record: zone.contains(record.lat, record.lon)
+        responses = await asyncio.gather(*(self._fetch(builder(area), accept) for area in filters),
+                                         return_exceptions=True)
+        
+        elements = []
+        seen = set()
+        failed = 0
+        for response in responses:
+            if isinstance(response, Exception):
+                failed += 1
+                logger.logger.warning(f"OSM Query {kind} (poly) {response} - continua senza bloccare")
+                mark_failed("osm")
+                continue
+            for element in response.records:
+                if element.key in seen:
+                    continue
+                seen.add(element.key)
+                elements.append(element)
+        
+        logger.logger.info(f"🔷 Overpass {kind}: {len(filters)} sotto-query poly: "
+                           f"({failed} fallite), {len(elements)} elementi")
+        return {"elements": elements}
+    
+    def _elements_in_zone(self, elements: List[OSMRecord], polygon: List[List[float]]) -> List[OSMRecord]:
+        """Elementi il cui punto rappresentativo cade nella zona (un solo test vettoriale)"""
+        if not elements:
+            return []
+        inside = zone_geometry(polygon).contains_many([element.lat for element in elements],
+                                                      [element.lon for element in elements])
+        return [element for element, keep in zip(elements, inside) if keep]
+    
+    async def _fetch(self, query: str, accept: Optional[Callable[[OSMRecord], bool]] = None,
+                     collect_keys: bool = False) -> OverpassResult:
+        """Esegue la richiesta Overpass e solleva OverpassError se non va a buon fine
+        
+        La query passa dal pool di endpoint (scelta per latenza, hedging, failover e
+        rispetto dei rate limit); la risposta è letta in streaming: ogni elemento diventa
+        subito un OSMRecord (o viene scartato se senza coordinate/tag o rifiutato da accept),
+        così la memoria dipende dagli elementi tenuti e non dalla dimensione della risposta.
+        Con collect_keys il risultato contiene anche (tipo, id) di tutti gli elementi letti.
+        """
+        # Tempo della richiesta esaurito: non avviare una query che non può terminare
+        if deadline_expired():
+            mark_truncated("osm")
+            raise OverpassError("saltata: tempo della richiesta esaurito", retryable=False)
+        return await get_overpass_pool().execute(lambda url: self._fetch_from(url, query, accept, collect_keys))
+    
+    async def _fetch_from(self, url: str, query: str, accept: Optional[Callable[[OSMRecord], bool]],
+                          collect_keys: bool) -> OverpassResult:
+        """Esegue la query su un endpoint Overpass"""
+        try:
+            async with self.session.post(
+                url,
+                data=query,
+                timeout=aiohttp.ClientTimeout(total=deadline_timeout(90))  # Aumentato timeout per richieste lente (limitato dal deadline)
+            ) as response:
+                if response.status != 200:
+                    # 400: query non valida, identica su ogni endpoint
+                    raise OverpassError(f"HTTP {response.status}", status=response.status,
+                                        retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                                        retryable=response.status != 400)
+                stream = JsonArrayStream("elements")
+                records = []
+                keys = set() if collect_keys else None
+                async for element in stream.iterate(response.content.iter_chunked(STREAM_CHUNK_SIZE)):
+                    if keys is not None:
+                        keys.add((element.get("type"), element.get("id")))
+                    record = OSMRecord.from_element(element)
+                    if record is not None and (accept is None or accept(record)):
+                        records.append(record)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            raise OverpassError(f"timeout/connection error: {e}") from e
+        except ValueError as e:
+            raise OverpassError(f"invalid response: {e}") from e
+        
+        # Timeout o memoria esaurita lato server: la risposta è parziale e non va usata (né messa in cache)
+        remark = stream.remark
+        if remark and "runtime error" in remark:
+            raise OverpassError(remark)
+        return OverpassResult(records, stream.osm_base, keys)
+    
+    def _element_location(self, element: OSMRecord) -> Optional[Tuple[float, float]]:
+        """Punto rappresentativo di un elemento (quello usato per i POI)"""
+        return element.lat, element.lon
+    
     def extract_poi_data(self, osm_data: Dict, poi_type: str = "land") -> List[Dict]:
         """Estrae dati POI dai risultati OSM"""
         pois = []
@@ -172,7 +394,7 @@ class OSMDataExtractor:
         for element in osm_data.get("elements", []):
             try:
                 poi = self._process_osm_element(element, poi_type)
-                if poi and POIValidator.is_tourist_relevant(poi):
+                if poi:
                     pois.append(poi)
             except Exception as e:
                 logger.log_error("POI Extraction", str(e), "")
@@ -180,276 +402,58 @@ class OSMDataExtractor:
         
         return pois
     
-    def _is_surface_element(self, tags: Dict, name: str, description: str = "") -> bool:
-        """✅ FIX MarineDeep: Verifica se un elemento è di superficie (porto, faro, marina, baia, isola, città)
-        Restituisce True se è di superficie → deve essere escluso dalla ricerca marina
-        """
-        text = (name + " " + description).lower()
-        
-        # ✅ FIX MarineDeep: Tag OSM che indicano elementi di superficie (ESTESO)
-        surface_tags = [
-            "port", "harbour", "harbor", "marina", "lighthouse", "beacon",
-            "beach", "bay", "coastline", "coast", "city", "town", "village",
-            "island", "islet", "place", "promontory", "peninsula"
-        ]
+    def extract_classified_pois(self, osm_data: Dict, include_marine: bool = True) -> Tuple[List[Dict], List[Dict]]:
+        """Estrae i POI terrestri e subacquei dai risultati della query unica (build_poi_query)
         
-        for tag_key in tags:
-            tag_value = str(tags[tag_key]).lower()
-            if any(surface in tag_value for surface in surface_tags):
-                return True
-        
-        # ✅ FIX MarineDeep: Parole chiave nel nome/descrizione che indicano superficie (ESTESO)
-        surface_keywords = [
-            "porto", "port", "harbour", "harbor", "marina",
-            "faro", "lighthouse", "phare", "far",
-            "spiaggia", "beach", "plage",
-            "baia", "bay", "baie",
-            "isola", "island", "île",
-            "città", "city", "ville", "town",
-            "costa", "coast", "coastline", "côte",
-            "capo", "cape", "cap",
-            "promontory", "promontorio", "promontòire",
-            "peninsula", "penisola", "péninsule"
-        ]
-        
-        return any(keyword in text for keyword in surface_keywords)
-    
-    def _is_irrelevant_wreck(self, name: str, description: str = "") -> bool:
-        """✅ FIX MarineDeep: Verifica se un relitto ha un nome che indica chiaramente un relitto noto di altra località"""
-        text = (name + " " + description).lower()
-        
-        # Escludi solo relitti con nomi noti che indicano chiaramente altre località
-        # Esempio: Moskva è notoriamente nel Mar Nero, non può apparire in altre zone
-        irrelevant_keywords = [
-            "moskva", "moscova", "moscow", "москва",  # Relitto noto nel Mar Nero
-            # Altri relitti noti di altre zone possono essere aggiunti qui se necessario
-        ]
-        
-        return any(keyword in text for keyword in irrelevant_keywords)
+        Ogni elemento è processato come "land" e/o "marine" secondo i selettori che soddisfa,
+        come se provenisse dalla rispettiva query separata.
+        """
+        land_pois, marine_pois = [], []
+        for element in osm_data.get("elements", []):
+            for category in self.classifier.categories(element):
+                if category == "marine" and not include_marine:
+                    continue
+                try:
+                    poi = self._process_osm_element(element, category)
+                    if poi:
+                        (marine_pois if category == "marine" else land_pois).append(poi)
+                except Exception as e:
+                    logger.log_error("POI Extraction", str(e), "")
+        return land_pois, marine_pois
     
-    def _process_osm_element(self, element: Dict, poi_type: str) -> Optional[Dict]:
-        """Processa un singolo elemento OSM - Universale per qualsiasi zona"""
-        # Ottieni coordinate
-        lat, lng = self._get_coordinates(element)
-        if not lat or not lng:
-            return None
+    def _process_osm_element(self, element: OSMRecord, poi_type: str) -> Optional[Dict]:
+        """Processa un singolo elemento OSM - Universale per qualsiasi zona
         
+        Nome, descrizione, filtri marini, punteggio e rilevanza turistica in un solo
+        passaggio del classificatore compilato; None se non è un POI rilevante.
+        """
         # NOTA: Non facciamo controllo geografico hardcoded - ogni zona può essere in qualsiasi parte del mondo
         # Il filtro geografico viene fatto a livello superiore usando il poligono della zona
-        
-        # Ottieni nome
-        tags = element.get("tags", {})
-        name = self._get_name(tags)
-        if not name:
-            return None
-        
-        # Costruisci POI
-        poi = {
-            "name": name,
-            "lat": lat,
-            "lng": lng,
-            "source": "OSM",
-            "type": poi_type,
-            "osm_id": element.get("id"),
-            "osm_type": element.get("type")
-        }
-        
-        # Aggiungi descrizione e metadati
-        description = self._build_description(tags)
-        if description:
-            poi["description"] = description
-        
-        # ✅ FIX MarineDeep: Metadati specifici per POI marittimi SUBACQUEI
-        if poi_type == "marine":
-            # ✅ FIX MarineDeep: Filtro semantico - escludi elementi di superficie
-            if self._is_surface_element(tags, name, description):
-                logger.logger.debug(f"[POI-MARINE] ⚠️ Escluso elemento di superficie: {name}")
-                return None
-            
-            self._add_marine_metadata(poi, tags)
-            
-            # ✅ FIX MarineDeep: Verifica se è un POI subacqueo valido
-            is_wreck = (
-                tags.get("historic") == "wreck" or
-                tags.get("seamark:type") == "wreck" or
-                tags.get("seamark:wreck:category") or
-                tags.get("wreck") or
-                tags.get("site_type") == "wreck"
-            )
-            
-            is_reef_shoal = (
-                tags.get("natural") in ["reef", "shoal", "bank"] or
-                "reef" in name.lower() or
-                "shoal" in name.lower() or
-                "secca" in name.lower() or
-                "scoglio sommerso" in name.lower()
-            )
-            
-            is_underwater_obstruction = (
-                tags.get("seamark:type") == "obstruction" or
-                tags.get("underwater") == "yes"
-            )
-            
-            is_diving_site = (
-                tags.get("sport") == "diving" or
-                tags.get("leisure") == "diving" or
-                tags.get("scuba_diving") == "yes" or
-                tags.get("diving_site") == "yes" or
-                tags.get("seamark:type") == "diving"
-            )
-            
-            is_submarine_cave = (
-                tags.get("natural") == "cave" or
-                tags.get("submarine_cave") == "yes"
-            )
-            
-            # ✅ FIX MarineDeep: Assegna tipo marino solo se è subacqueo
-            if is_wreck:
-                poi["marine_type"] = "wreck"
-                # Escludi solo relitti con nomi noti di altre località (es. Moskva nel Mar Nero)
-                if self._is_irrelevant_wreck(name, description):
-                    logger.logger.warning(f"[POI-MARINE] ⚠️ Relitto OSM irrilevante '{name}' escluso")
-                    return None
-            elif is_reef_shoal:
-                poi["marine_type"] = "reef"
-            elif is_underwater_obstruction:
-                poi["marine_type"] = "obstruction"
-            elif is_diving_site:
-                poi["marine_type"] = "diving_site"
-            elif is_submarine_cave:
-                poi["marine_type"] = "cave"
-            else:
-                # ✅ FIX MarineDeep: Se non è un POI subacqueo valido, escludilo
-                logger.logger.debug(f"[POI-MARINE] ⚠️ POI non subacqueo escluso: {name}")
-                return None
-        
-        # Calcola relevance score
-        poi["relevance_score"] = POIValidator.calculate_relevance_score(poi)
-        
-        return poi
-    
-    def _get_coordinates(self, element: Dict) -> Tuple[Optional[float], Optional[float]]:
-        """Ottieni coordinate da elemento OSM"""
-        if element.get("type") == "node":
-            return element.get("lat"), element.get("lon")
-        elif element.get("type") == "way" and "center" in element:
-            center = element["center"]
-            return center.get("lat"), center.get("lon")
-        elif "geometry" in element and element["geometry"]:
-            # Prendi il primo punto della geometria
-            first_point = element["geometry"][0]
-            return first_point.get("lat"), first_point.get("lon")
-        
-        return None, None
+        return self.classifier.classify(element, poi_type)
+    
+    def _get_coordinates(self, element: OSMRecord) -> Tuple[Optional[float], Optional[float]]:
+        """Ottieni coordinate da elemento OSM (nodo, centro o primo punto della geometria, vedi OSMRecord)"""
+        return element.lat, element.lon
     
     def _get_name(self, tags: Dict) -> Optional[str]:
         """Ottieni nome da tag OSM"""
-        name_tags = ["name", "name:it", "name:en", "official_name", "short_name"]
-        
-        for tag in name_tags:
-            if tag in tags and tags[tag].strip():
-                return tags[tag].strip()
-        
-        # Fallback per alcuni tipi specifici
-        if "tourism" in tags:
-            return f"{tags['tourism'].title()} POI"
-        elif "historic" in tags:
-            return f"{tags['historic'].title()} Site"
-        
-        return None
-    
-    def _build_description(self, tags: Dict) -> str:
-        """Costruisce descrizione da tag OSM"""
-        description_parts = []
-        
-        # Aggiungi tipo principale
-        main_type = self._get_main_type(tags)
-        if main_type:
-            description_parts.append(main_type)
-        
-        # Aggiungi descrizione specifica
-        if "description" in tags:
-            description_parts.append(tags["description"])
-        elif "note" in tags:
-            description_parts.append(tags["note"])
-        
-        # Aggiungi informazioni storiche
-        if "start_date" in tags:
-            description_parts.append(f"Built in {tags['start_date']}")
-        
-        # Aggiungi altezza se disponibile
-        if "ele" in tags:
-            try:
-                elevation = float(tags["ele"])
-                description_parts.append(f"Elevation: {elevation}m")
-            except ValueError:
-                pass
-        
-        return ". ".join(description_parts)
-    
-    def _get_main_type(self, tags: Dict) -> str:
-        """Ottieni tipo principale del POI"""
-        type_mappings = {
-            "tourism": {
-                "attraction": "Tourist attraction",
-                "museum": "Museum", 
-                "castle": "Castle",
-                "monument": "Monument",
-                "viewpoint": "Viewpoint",
-                "archaeological_site": "Archaeological site"
-            },
-            "historic": {
-                "castle": "Historic castle",
-                "fortress": "Fortress",
-                "monument": "Historic monument",
-                "ruins": "Historic ruins",
-                "palace": "Historic palace"
-            },
-            "amenity": {
-                "place_of_worship": "Place of worship",
-                "library": "Library",
-                "theatre": "Theatre"
-            },
-            "natural": {
-                "peak": "Mountain peak",
-                "cliff": "Cliff",
-                "beach": "Beach",
-                "reef": "Reef"
-            }
-        }
-        
-        for category, values in type_mappings.items():
-            if category in tags and tags[category] in values:
-                return values[tags[category]]
-        
-        return ""
-    
-    def _add_marine_metadata(self, poi: Dict, tags: Dict):
-        """Aggiunge metadati specifici per POI marittimi"""
-        # Profondità per immersioni e relitti
-        if "depth" in tags:
-            try:
-                poi["depth"] = float(tags["depth"])
-            except ValueError:
-                pass
-        
-        # Tipo di seamark
-        if "seamark:type" in tags:
-            poi["seamark_type"] = tags["seamark:type"]
-        
-        # Informazioni per diving
-        if tags.get("sport") == "diving" or tags.get("leisure") == "diving":
-            poi["diving_site"] = True
-            if "diving:visibility" in tags:
-                poi["visibility"] = tags["diving:visibility"]
+        return self.classifier.name(tags)
     
     def extract_municipalities(self, osm_data: Dict, polygon: List[List[float]]) -> List[Dict]:
         """Estrae dati sui comuni dai risultati OSM"""
         municipalities = {}
         
-        for element in osm_data.get("elements", []):
+        # Filtro poligono vettoriale sulle coordinate di tutti gli elementi
+        elements = osm_data.get("elements", [])
+        coordinates = [self._get_coordinates(element) for element in elements]
+        in_zone = zone_geometry(polygon).contains_many([lat for lat, _ in coordinates],
+                                                       [lng for _, lng in coordinates])
+        
+        for element, (lat, lng), inside in zip(elements, coordinates, in_zone):
+            if not inside or not lat or not lng:
+                continue
             try:
-                municipality = self._process_municipality_element(element, polygon)
+                municipality = self._process_municipality_element(element, lat, lng)
                 if municipality:
                     name = municipality["name"]
                     if name not in municipalities:
@@ -467,19 +471,9 @@ class OSMDataExtractor:
         
         return list(municipalities.values())
     
-    def _process_municipality_element(self, element: Dict, polygon: List[List[float]]) -> Optional[Dict]:
-        """Processa un elemento municipalità OSM"""
-        tags = element.get("tags", {})
-        
-        # Ottieni coordinate per verificare se è nel poligono
-        lat, lng = self._get_coordinates(element)
-        if not lat or not lng:
-            return None
-        
-        # Verifica se il punto è nel poligono della zona
-        from .utils import point_in_polygon
-        if not point_in_polygon((lat, lng), polygon):
-            return None
+    def _process_municipality_element(self, element: OSMRecord, lat: float, lng: float) -> Optional[Dict]:
+        """Processa un elemento municipalità OSM (già verificato dentro il poligono della zona)"""
+        tags = element.tags
         
         name = self._get_name(tags)
         if not name:
@@ -510,31 +504,32 @@ class OSMDataExtractor:
 
 # Funzioni di utility per uso esterno
 async def search_osm_pois(bbox: Tuple[float, float, float, float], 
-                          include_marine: bool = False) -> List[Dict]:
-    """Cerca POI su OSM data un bounding box"""
+                          include_marine: bool = False,
+                          polygon: Optional[List[List[float]]] = None) -> List[Dict]:
+    """Cerca POI su OSM data un bounding box
+    
+    POI terrestri e marini arrivano da una sola query Overpass e sono separati sui tag.
+    Con il poligono della zona i POI terrestri sono limitati alla zona; quelli marini
+    restano sul bbox (eventualmente esteso verso il mare).
+    """
     async with OSMDataExtractor() as extractor:
-        # Query per POI terrestri
-        tourist_query = extractor.query_builder.build_tourist_query(bbox)
-        tourist_data = await extractor.execute_query(tourist_query)
-        land_pois = extractor.extract_poi_data(tourist_data, "land")
-        
-        all_pois = land_pois
+        if not include_marine:
+            # Solo POI terrestri: la query può usare direttamente il poligono della zona
+            tourist_data = await extractor.execute_tiled_query("tourist", bbox, polygon)
+            return extractor.extract_poi_data(tourist_data, "land")
         
-        # Query per POI marittimi se richiesto
-        if include_marine:
-            marine_query = extractor.query_builder.build_marine_query(bbox)
-            marine_data = await extractor.execute_query(marine_query)
-            marine_pois = extractor.extract_poi_data(marine_data, "marine")
-            all_pois.extend(marine_pois)
+        data = await extractor.execute_tiled_query("poi", bbox)
+        land_pois, marine_pois = extractor.extract_classified_pois(data, include_marine=True)
+        if polygon:
+            land_pois = zone_geometry(polygon).filter_pois(land_pois)
         
-        return all_pois
+        return land_pois + marine_pois
 
 async def discover_municipalities(bbox: Tuple[float, float, float, float], 
                                 polygon: List[List[float]]) -> List[Dict]:
     """Scopre comuni e frazioni in una zona"""
     async with OSMDataExtractor() as extractor:
-        query = extractor.query_builder.build_municipality_query(bbox)
-        data = await extractor.execute_query(query)
+        data = await extractor.execute_tiled_query("municipality", bbox, polygon)
         municipalities = extractor.extract_municipalities(data, polygon)
         
         # Log scoperta
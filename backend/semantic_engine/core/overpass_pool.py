@@ -0,0 +1,321 @@
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Optional, Callable, Awaitable, TypeVar
+import aiohttp
+from .utils import SemanticLogger, deadline_timeout, deadline_expired
+from .http_pool import get_http_session
+
+logger = SemanticLogger()
+
+# Endpoint /api/interpreter separati da virgola, in ordine di preferenza iniziale
+# (es. istanza privata, mirror kumi, istanza locale di test)
+OVERPASS_ENDPOINTS = [url.strip() for url in os.getenv(
+    "OVERPASS_ENDPOINTS",
+    "https://overpass-api.de/api/interpreter,https://overpass.kumi.systems/api/interpreter"
+).split(",") if url.strip()]
+# Richiesta di copertura su un secondo endpoint dopo il p95 della latenza del primo (0 = disattivata)
+OVERPASS_HEDGE = os.getenv("OVERPASS_HEDGE", "1") == "1"
+OVERPASS_HEDGE_MIN_S = float(os.getenv("OVERPASS_HEDGE_MIN_S", "3"))
+OVERPASS_HEDGE_DEFAULT_S = float(os.getenv("OVERPASS_HEDGE_DEFAULT_S", "15"))
+# Endpoint diversi provati per una query prima di rinunciare
+OVERPASS_MAX_ATTEMPTS = int(os.getenv("OVERPASS_MAX_ATTEMPTS", "3"))
+# Attesa massima di uno slot libero quando tutti gli endpoint sono in pausa (429)
+OVERPASS_MAX_SLOT_WAIT_S = float(os.getenv("OVERPASS_MAX_SLOT_WAIT_S", "20"))
+# Pausa di un endpoint dopo errori 5xx/timeout (raddoppia a ogni errore consecutivo)
+OVERPASS_ERROR_COOLDOWN_S = float(os.getenv("OVERPASS_ERROR_COOLDOWN_S", "15"))
+OVERPASS_MAX_COOLDOWN_S = float(os.getenv("OVERPASS_MAX_COOLDOWN_S", "300"))
+
+LATENCY_SAMPLES = 50
+MIN_SAMPLES_FOR_P95 = 5
+EWMA_ALPHA = 0.3
+UNKNOWN_LATENCY_S = 5.0
+
+T = TypeVar("T")
+
+class OverpassError(Exception):
+    """Errore HTTP, timeout o di connessione di una query Overpass
+
+    status e retry_after (secondi) arrivano dalla risposta HTTP; retryable=False indica
+    un errore che si ripeterebbe identico su ogni endpoint (es. query non valida).
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None,
+                 retryable: bool = True):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Secondi indicati da un header Retry-After (numero di secondi o data HTTP)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_status(text: str) -> Dict[str, Any]:
+    """Slot dal testo di /api/status: {"slots_available": n, "wait_seconds": s | None}
+
+    Esempio di risposta:
+        Rate limit: 2
+        Slot available after: 2024-05-01T10:00:12Z, in 7 seconds.
+    oppure "2 slots available now."
+    """
+    available = re.search(r"(\d+) slots? available now", text)
+    waits = [max(0, int(seconds)) for seconds in re.findall(r"in (-?\d+) seconds", text)]
+    return {
+        "slots_available": int(available.group(1)) if available else 0,
+        "wait_seconds": min(waits) if waits else None
+    }
+
+class OverpassEndpoint:
+    """Stato di un endpoint: latenze recenti, pausa per rate limit/errori, contatori"""
+
+    def __init__(self, url: str, order: int):
+        self.url = url
+        self.status_url = url.rsplit("/", 1)[0] + "/status"
+        self.order = order
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.ewma: Optional[float] = None
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.slots_available: Optional[int] = None
+
+    def available(self, now: float) -> bool:
+        return self.cooldown_until <= now
+
+    def score(self) -> float:
+        """Latenza attesa (più bassa = preferito), penalizzata dalle richieste in corso"""
+        latency = self.ewma if self.ewma is not None else UNKNOWN_LATENCY_S
+        return latency * (1 + self.in_flight)
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES_FOR_P95:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.ewma = latency if self.ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma
+        self.consecutive_failures = 0
+
+    def pause(self, seconds: float):
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + min(seconds, OVERPASS_MAX_COOLDOWN_S))
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "url": self.url,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "in_flight": self.in_flight,
+            "latency_ewma_s": round(self.ewma, 3) if self.ewma is not None else None,
+            "latency_p95_s": round(p95, 3) if p95 is not None else None,
+            "cooldown_s": round(max(0.0, self.cooldown_until - time.monotonic()), 1),
+            "slots_available": self.slots_available
+        }
+
+class OverpassPool:
+    """Pool di endpoint Overpass con scelta per latenza, hedging e failover
+
+    - ogni query va all'endpoint disponibile con latenza attesa più bassa
+    - se non risponde entro il p95 delle sue latenze recenti, parte una seconda
+      richiesta su un altro endpoint: vince la prima risposta valida
+    - 429/503/504 mettono in pausa l'endpoint per il Retry-After o, in mancanza, per
+      la pausa standard (allungata dall'attesa dello slot letta in background da
+      /api/status); la query passa subito al successivo
+    - se tutti gli endpoint sono in pausa si attende il primo slot (entro il deadline)
+    """
+
+    def __init__(self, urls: List[str] = OVERPASS_ENDPOINTS, hedge: bool = OVERPASS_HEDGE,
+                 max_attempts: int = OVERPASS_MAX_ATTEMPTS):
+        self.endpoints = [OverpassEndpoint(url, order) for order, url in enumerate(urls)]
+        self.hedge = hedge and len(self.endpoints) > 1
+        self.max_attempts = max(1, max_attempts)
+        self.queries = 0
+        self.failovers = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.slot_waits = 0
+        # Letture di /api/status in background dopo un 429 senza Retry-After (una per endpoint)
+        self._status_refreshes: Dict[str, asyncio.Task] = {}
+
+    async def execute(self, attempt: Callable[[str], Awaitable[T]]) -> T:
+        """Esegue attempt(url) sugli endpoint del pool finché uno non riesce
+
+        attempt deve sollevare OverpassError in caso di errore (con status e retry_after
+        se disponibili); l'ultimo errore viene rilanciato se nessun endpoint riesce.
+        """
+        self.queries += 1
+        tried = set()
+        last_error: Optional[OverpassError] = None
+        while len(tried) < min(self.max_attempts, len(self.endpoints)):
+            if deadline_expired():
+                break
+            primary = await self._pick(tried)
+            if primary is None:
+                break
+            if tried:
+                self.failovers += 1
+            tried.add(primary.url)
+            try:
+                return await self._run_hedged(primary, attempt, tried)
+            except OverpassError as e:
+                last_error = e
+                if not e.retryable:
+                    raise
+                logger.logger.warning(f"Overpass {primary.url}: {e} - provo un altro endpoint")
+        raise last_error or OverpassError("nessun endpoint Overpass disponibile", retryable=False)
+
+    async def _pick(self, exclude: set) -> Optional[OverpassEndpoint]:
+        """Endpoint disponibile più veloce; se sono tutti in pausa attende il primo che si libera"""
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.url not in exclude]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        ready = [endpoint for endpoint in candidates if endpoint.available(now)]
+        if ready:
+            return min(ready, key=lambda endpoint: (endpoint.score(), endpoint.order))
+
+        first = min(candidates, key=lambda endpoint: endpoint.cooldown_until)
+        wait = first.cooldown_until - now
+        if wait > min(OVERPASS_MAX_SLOT_WAIT_S, deadline_timeout(OVERPASS_MAX_SLOT_WAIT_S)):
+            return None
+        self.slot_waits += 1
+        logger.logger.info(f"⏳ Overpass: tutti gli endpoint in pausa, attendo {wait:.1f}s lo slot di {first.url}")
+        await asyncio.sleep(wait)
+        return first
+
+    def _hedge_delay(self, endpoint: OverpassEndpoint) -> float:
+        p95 = endpoint.p95()
+        return max(OVERPASS_HEDGE_MIN_S, p95 if p95 is not None else OVERPASS_HEDGE_DEFAULT_S)
+
+    async def _run_hedged(self, primary: OverpassEndpoint, attempt: Callable[[str], Awaitable[T]],
+                          tried: set) -> T:
+        tasks = {asyncio.ensure_future(self._attempt(primary, attempt)): primary}
+        try:
+            if self.hedge:
+                done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(primary))
+                if not done and not deadline_expired():
+                    now = time.monotonic()
+                    backups = [endpoint for endpoint in self.endpoints
+                               if endpoint.url not in tried and endpoint.available(now)]
+                    if backups:
+                        backup = min(backups, key=lambda endpoint: (endpoint.score(), endpoint.order))
+                        tried.add(backup.url)
+                        self.hedged += 1
+                        tasks[asyncio.ensure_future(self._attempt(backup, attempt))] = backup
+
+            last_error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _attempt(self, endpoint: OverpassEndpoint, attempt: Callable[[str], Awaitable[T]]) -> T:
+        endpoint.requests += 1
+        endpoint.in_flight += 1
+        started = time.monotonic()
+        try:
+            result = await attempt(endpoint.url)
+            endpoint.record_success(time.monotonic() - started)
+            return result
+        except OverpassError as e:
+            if e.retryable:
+                endpoint.errors += 1
+                self._penalize(endpoint, e)
+            raise
+        finally:
+            endpoint.in_flight -= 1
+
+    def _penalize(self, endpoint: OverpassEndpoint, error: OverpassError):
+        """Mette in pausa l'endpoint dopo un errore (rate limit: per il tempo indicato dal server)
+
+        Un 429 senza Retry-After mette subito in pausa l'endpoint per la pausa standard, così la
+        query passa senza attese al successivo; /api/status viene letto in background e può
+        allungare la pausa fino alla liberazione dello slot.
+        """
+        endpoint.consecutive_failures += 1
+        if error.status == 429:
+            endpoint.rate_limited += 1
+            if error.retry_after is not None:
+                endpoint.pause(error.retry_after)
+            else:
+                endpoint.pause(OVERPASS_ERROR_COOLDOWN_S)
+                self._refresh_status_later(endpoint)
+        elif error.retry_after is not None:
+            endpoint.pause(error.retry_after)
+        else:
+            endpoint.pause(OVERPASS_ERROR_COOLDOWN_S * 2 ** (endpoint.consecutive_failures - 1))
+
+    def _refresh_status_later(self, endpoint: OverpassEndpoint):
+        """Avvia la lettura di /api/status dell'endpoint in background (se non già in corso)"""
+        pending = self._status_refreshes.get(endpoint.url)
+        if pending is not None and not pending.done():
+            return
+        self._status_refreshes[endpoint.url] = asyncio.ensure_future(self.refresh_status(endpoint))
+
+    async def refresh_status(self, endpoint: OverpassEndpoint) -> Optional[Dict[str, Any]]:
+        """Legge /api/status dell'endpoint e aggiorna slot e pausa (None se non raggiungibile)"""
+        try:
+            async with get_http_session("overpass").get(endpoint.status_url,
+                                                        timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status != 200:
+                    return None
+                status = parse_status(await response.text())
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.logger.warning(f"Overpass status {endpoint.status_url} non raggiungibile: {e!r}")
+            return None
+        endpoint.slots_available = status["slots_available"]
+        if status["slots_available"] == 0 and status["wait_seconds"] is not None:
+            endpoint.pause(status["wait_seconds"])
+        return status
+
+    async def refresh_all_status(self) -> bool:
+        """Aggiorna lo stato di tutti gli endpoint; True se almeno uno risponde"""
+        results = await asyncio.gather(*(self.refresh_status(endpoint) for endpoint in self.endpoints))
+        return any(result is not None for result in results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "failovers": self.failovers,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "slot_waits": self.slot_waits,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints]
+        }
+
+_overpass_pool: Optional[OverpassPool] = None
+
+def get_overpass_pool() -> OverpassPool:
+    """Pool di endpoint Overpass condiviso dal processo (singleton)"""
+    global _overpass_pool
+    if _overpass_pool is None:
+        _overpass_pool = OverpassPool()
+    return _overpass_pool
@@ -0,0 +1,66 @@
+import sys
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+class OSMRecord:
+    """Elemento OSM compatto: tipo, id, punto rappresentativo e tag
+
+    Le geometrie (out geom), i riferimenti ai nodi e i membri non vengono conservati:
+    i POI usano un solo punto (nodo, centro o primo punto della geometria).
+    """
+    __slots__ = ("type", "id", "lat", "lon", "tags")
+
+    def __init__(self, osm_type: str, osm_id: int, lat: float, lon: float, tags: Dict[str, str]):
+        self.type = osm_type
+        self.id = osm_id
+        self.lat = lat
+        self.lon = lon
+        self.tags = tags
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return self.type, self.id
+
+    @classmethod
+    def from_element(cls, element: Dict[str, Any]) -> Optional["OSMRecord"]:
+        """Record dell'elemento JSON di Overpass (None se senza coordinate o senza tag)"""
+        tags = element.get("tags")
+        if not tags:
+            return None
+        if element.get("type") == "node":
+            lat, lon = element.get("lat"), element.get("lon")
+        elif "center" in element:
+            # Way e relazioni con output "out center"
+            lat, lon = element["center"].get("lat"), element["center"].get("lon")
+        elif element.get("geometry"):
+            # Prendi il primo punto della geometria
+            lat, lon = element["geometry"][0].get("lat"), element["geometry"][0].get("lon")
+        else:
+            return None
+        if lat is None or lon is None:
+            return None
+        # Le chiavi dei tag si ripetono in ogni elemento: internate, occupano memoria una volta sola
+        return cls(sys.intern(element["type"]), element.get("id"), lat, lon,
+                   {sys.intern(key): value for key, value in tags.items()})
+
+    def to_element(self) -> Dict[str, Any]:
+        """Elemento in formato JSON Overpass (nodo o centro)"""
+        element = {"type": self.type, "id": self.id, "tags": dict(self.tags)}
+        if self.type == "node":
+            element.update(lat=self.lat, lon=self.lon)
+        else:
+            element["center"] = {"lat": self.lat, "lon": self.lon}
+        return element
+
+class OverpassResult:
+    """Risposta Overpass letta in streaming
+
+    records: elementi tenuti; osm_base: data dei dati OSM del server (per le query newer);
+    keys: (tipo, id) di tutti gli elementi della risposta, anche quelli scartati (se richieste).
+    """
+    __slots__ = ("records", "osm_base", "keys")
+
+    def __init__(self, records: List[OSMRecord], osm_base: Optional[str] = None,
+                 keys: Optional[Set[Tuple[str, int]]] = None):
+        self.records = records
+        self.osm_base = osm_base
+        self.keys = keys
@@ -0,0 +1,223 @@
+import math
+import os
+import time
+from typing import List, Dict, Any, Tuple, Optional, Callable, Awaitable
+from .utils import SemanticLogger, TTLCache
+from .overpass_stream import OSMRecord, OverpassResult
+
+logger = SemanticLogger()
+
+OVERPASS_TILE_ZOOM = int(os.getenv("OVERPASS_TILE_ZOOM", "12"))  # Tile slippy z12: ~10 km di lato alle nostre latitudini
+OVERPASS_TILE_TTL_S = float(os.getenv("OVERPASS_TILE_TTL_S", "21600"))  # 6 ore
+# Oltre il TTL una tile è "stale": resta in cache fino a questa età e viene aggiornata con query newer
+OVERPASS_TILE_KEEP_S = float(os.getenv("OVERPASS_TILE_KEEP_S", str(7 * 86400)))  # 7 giorni
+OVERPASS_TILE_CACHE_MAX = int(os.getenv("OVERPASS_TILE_CACHE_MAX", "4096"))
+# Oltre questo numero di tile (regioni molto grandi) la query viene eseguita sul bbox senza cache
+OVERPASS_TILE_MAX_PER_QUERY = int(os.getenv("OVERPASS_TILE_MAX_PER_QUERY", "64"))
+
+MAX_MERCATOR_LAT = 85.05112878
+
+Tile = Tuple[int, int]
+BBox = Tuple[float, float, float, float]
+
+def tile_for_point(lat: float, lng: float, zoom: int = OVERPASS_TILE_ZOOM) -> Tile:
+    """Tile slippy (x, y) che contiene il punto"""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    n = 2 ** zoom
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def tile_bbox(tile: Tile, zoom: int = OVERPASS_TILE_ZOOM) -> Tuple[float, float, float, float]:
+    """Bounding box (south, west, north, east) di una tile"""
+    x, y = tile
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+def tiles_for_bbox(bbox: Tuple[float, float, float, float], zoom: int = OVERPASS_TILE_ZOOM) -> List[Tile]:
+    """Tile che coprono un bounding box (south, west, north, east)"""
+    south, west, north, east = bbox
+    min_x, min_y = tile_for_point(north, west, zoom)
+    max_x, max_y = tile_for_point(south, east, zoom)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+def tiles_hull_bbox(tiles: List[Tile], zoom: int = OVERPASS_TILE_ZOOM) -> Tuple[float, float, float, float]:
+    """Bounding box che contiene tutte le tile indicate"""
+    south, west, _, _ = tile_bbox((min(x for x, _ in tiles), max(y for _, y in tiles)), zoom)
+    _, _, north, east = tile_bbox((max(x for x, _ in tiles), min(y for _, y in tiles)), zoom)
+    return south, west, north, east
+
+def _in_bbox(location: Tuple[float, float], bbox: Tuple[float, float, float, float]) -> bool:
+    south, west, north, east = bbox
+    return south <= location[0] <= north and west <= location[1] <= east
+
+class TileEntry:
+    """Elementi di una tile con la data dei dati OSM (osm_base) e l'istante dello scaricamento"""
+    __slots__ = ("elements", "osm_base", "fetched_at")
+
+    def __init__(self, elements: List[OSMRecord], osm_base: Optional[str], fetched_at: float):
+        self.elements = elements
+        self.osm_base = osm_base
+        self.fetched_at = fetched_at
+
+class OverpassTileCache:
+    """Cache a tile degli elementi Overpass: zone sovrapposte condividono i download
+
+    Una query per bbox viene scomposta in tile slippy fisse; le tile già in cache
+    non vengono riscaricate, quelle mancanti sono scaricate con una sola query sul
+    bbox che le contiene e gli elementi sono assegnati alla tile del proprio punto
+    rappresentativo. Il risultato è l'unione delle tile filtrata sul bbox richiesto.
+
+    Le tile più vecchie del TTL non vengono riscaricate: con refresh(bbox, since) si
+    chiedono solo gli elementi modificati dopo l'osm_base della tile e gli id degli
+    elementi attuali, e le modifiche (anche le cancellazioni) sono applicate per id OSM.
+    """
+
+    def __init__(self, zoom: int = OVERPASS_TILE_ZOOM, ttl_seconds: float = OVERPASS_TILE_TTL_S,
+                 max_entries: int = OVERPASS_TILE_CACHE_MAX, max_tiles_per_query: int = OVERPASS_TILE_MAX_PER_QUERY,
+                 keep_seconds: float = OVERPASS_TILE_KEEP_S):
+        self.zoom = zoom
+        self.ttl_seconds = ttl_seconds
+        self.max_tiles_per_query = max_tiles_per_query
+        self._tiles = TTLCache(max_entries=max_entries, ttl_seconds=max(keep_seconds, ttl_seconds))
+        self.tiles_fetched = 0
+        self.bypassed = 0
+        self.tiles_refreshed = 0
+        self.refresh_failures = 0
+        self.elements_changed = 0
+        self.elements_removed = 0
+
+    async def query(self, kind: str, bbox: BBox,
+                    fetch: Callable[[BBox], Awaitable[OverpassResult]],
+                    locate: Callable[[OSMRecord], Optional[Tuple[float, float]]],
+                    refresh: Optional[Callable[[BBox, str], Awaitable[OverpassResult]]] = None) -> List[OSMRecord]:
+        """Elementi Overpass del tipo di query `kind` nel bbox
+
+        fetch(bbox) esegue la query Overpass su un bbox (deve sollevare eccezione in caso di
+        errore, così le risposte fallite non finiscono in cache); locate(element) restituisce
+        il punto rappresentativo (lat, lng) dell'elemento o None. refresh(bbox, since), se
+        indicato, restituisce gli elementi modificati dopo `since` e in keys gli id di tutti
+        gli elementi attuali del bbox; senza refresh le tile stale sono riscaricate.
+        """
+        tiles = tiles_for_bbox(bbox, self.zoom)
+        if len(tiles) > self.max_tiles_per_query:
+            self.bypassed += 1
+            return (await fetch(bbox)).records
+
+        entries = {tile: self._tiles.get((kind, self.zoom, tile)) for tile in tiles}
+        now = time.monotonic()
+        stale = [tile for tile, entry in entries.items()
+                 if entry is not None and entry.fetched_at + self.ttl_seconds <= now]
+        if stale and (refresh is None or any(entries[tile].osm_base is None for tile in stale)):
+            for tile in stale:
+                entries[tile] = None
+            stale = []
+
+        if stale:
+            await self._refresh_tiles(kind, stale, entries, refresh, locate)
+
+        missing = [tile for tile, entry in entries.items() if entry is None]
+        if missing:
+            xs = [x for x, _ in missing]
+            ys = [y for _, y in missing]
+            hull_tiles = [(x, y) for x in range(min(xs), max(xs) + 1) for y in range(min(ys), max(ys) + 1)]
+            fetched = await fetch(tiles_hull_bbox(missing, self.zoom))
+            fetched_at = time.monotonic()
+            for tile, tile_elements in self._bucket(fetched.records, hull_tiles, locate).items():
+                entry = TileEntry(tile_elements, fetched.osm_base, fetched_at)
+                self._tiles.set((kind, self.zoom, tile), entry)
+                if tile in entries:
+                    entries[tile] = entry
+            self.tiles_fetched += len(hull_tiles)
+            logger.logger.info(f"🧩 Overpass {kind}: {len(tiles) - len(missing)}/{len(tiles)} tile in cache, "
+                               f"scaricate {len(hull_tiles)} tile ({len(fetched.records)} elementi)")
+
+        result = []
+        for tile in tiles:
+            for element in entries[tile].elements:
+                location = locate(element)
+                if location is not None and _in_bbox(location, bbox):
+                    result.append(element)
+        return result
+
+    def _bucket(self, elements: List[OSMRecord], tiles: List[Tile],
+                locate: Callable[[OSMRecord], Optional[Tuple[float, float]]]) -> Dict[Tile, List[OSMRecord]]:
+        """Assegna gli elementi alla tile del proprio punto rappresentativo (solo le tile indicate)"""
+        buckets: Dict[Tile, List[OSMRecord]] = {tile: [] for tile in tiles}
+        for element in elements:
+            location = locate(element)
+            if location is None:
+                continue
+            tile = tile_for_point(location[0], location[1], self.zoom)
+            if tile in buckets:
+                buckets[tile].append(element)
+        return buckets
+
+    async def _refresh_tiles(self, kind: str, stale: List[Tile], entries: Dict[Tile, Optional[TileEntry]],
+                             refresh: Callable[[BBox, str], Awaitable[OverpassResult]],
+                             locate: Callable[[OSMRecord], Optional[Tuple[float, float]]]):
+        """Aggiornamento incrementale delle tile stale con una query newer sul bbox che le contiene
+
+        Gli elementi modificati sostituiscono i precedenti (anche se spostati in un'altra tile),
+        quelli assenti dagli id attuali sono rimossi. Sono aggiornate tutte le tile in cache del
+        bbox, non solo le stale. Se l'aggiornamento fallisce restano in uso i dati stale.
+        """
+        since = min(entries[tile].osm_base for tile in stale)
+        xs = [x for x, _ in stale]
+        ys = [y for _, y in stale]
+        hull_tiles = [(x, y) for x in range(min(xs), max(xs) + 1) for y in range(min(ys), max(ys) + 1)]
+        try:
+            changes = await refresh(tiles_hull_bbox(stale, self.zoom), since)
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.logger.warning(f"🧩 Overpass {kind}: aggiornamento incrementale fallito ({e}), uso le tile in cache")
+            return
+
+        changed = {element.key for element in changes.records}
+        current = changes.keys or set()
+        fetched_at = time.monotonic()
+        removed = 0
+        refreshed = 0
+        for tile, tile_changes in self._bucket(changes.records, hull_tiles, locate).items():
+            entry = entries.get(tile) or self._tiles.get((kind, self.zoom, tile))
+            if entry is None:
+                continue  # tile mai scaricata: la query newer non basta a ricostruirla
+            kept = [element for element in entry.elements if element.key not in changed]
+            survivors = [element for element in kept if element.key in current]
+            removed += len(kept) - len(survivors)
+            updated = TileEntry(survivors + tile_changes, changes.osm_base or entry.osm_base, fetched_at)
+            self._tiles.set((kind, self.zoom, tile), updated)
+            if tile in entries:
+                entries[tile] = updated
+            refreshed += 1
+
+        self.tiles_refreshed += refreshed
+        self.elements_changed += len(changes.records)
+        self.elements_removed += removed
+        logger.logger.info(f"🧩 Overpass {kind}: aggiornate {refreshed} tile da {since} "
+                           f"({len(changes.records)} elementi modificati, {removed} rimossi)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "zoom": self.zoom,
+            "tiles_fetched": self.tiles_fetched,
+            "bypassed": self.bypassed,
+            "tiles_refreshed": self.tiles_refreshed,
+            "refresh_failures": self.refresh_failures,
+            "elements_changed": self.elements_changed,
+            "elements_removed": self.elements_removed,
+            **self._tiles.stats()
+        }
+
+_tile_cache: Optional[OverpassTileCache] = None
+
+def get_overpass_tile_cache() -> OverpassTileCache:
+    """Cache a tile Overpass condivisa dal processo (singleton)"""
+    global _tile_cache
+    if _tile_cache is None:
+        _tile_cache = OverpassTileCache()
+    return _tile_cache
@@ -0,0 +1,182 @@
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+from .sqlite_store import ThreadLocalSQLite
+from .utils import SemanticLogger, TTLCache
+
+logger = SemanticLogger()
+
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB", "../cache/semantic/results.sqlite3")
+# Soft TTL: oltre questa età il risultato è "stale" (servito subito ma da ricalcolare in background)
+RESULT_CACHE_SOFT_TTL_S = float(os.getenv("RESULT_CACHE_SOFT_TTL_S", "86400"))  # 24 ore
+# Hard TTL: oltre questa età il risultato non viene più servito
+RESULT_CACHE_HARD_TTL_S = float(os.getenv("RESULT_CACHE_HARD_TTL_S", str(7 * 86400)))  # 7 giorni
+RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "128"))
+RESULT_CACHE_MEMORY_TTL_S = float(os.getenv("RESULT_CACHE_MEMORY_TTL_S", "300"))
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    fresh_until REAL NOT NULL DEFAULT 0,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires_at);
+CREATE INDEX IF NOT EXISTS idx_results_access ON results (last_access);
+"""
+
+@dataclass
+class CachedResult:
+    """Risultato letto dalla cache con i metadati di freschezza"""
+    value: Dict[str, Any]
+    created_at: float
+    fresh_until: float
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.created_at)
+
+    @property
+    def stale(self) -> bool:
+        return time.time() >= self.fresh_until
+
+class ResultCache:
+    """Cache dei risultati di ricerca a due livelli
+
+    - memoria: LRU limitato per le zone più richieste (hit senza I/O né parsing)
+    - SQLite in WAL: payload JSON compressi (zlib) con scadenza, condiviso
+      tra più worker uvicorn; oltre max_bytes vengono rimossi i meno usati
+    - soft TTL / hard TTL: tra i due il risultato è restituito come stale
+      (stale-while-revalidate), oltre l'hard TTL viene eliminato
+    Le operazioni SQLite girano in un thread per non bloccare l'event loop.
+    """
+
+    def __init__(self, db_path: str = RESULT_CACHE_DB, soft_ttl_seconds: float = RESULT_CACHE_SOFT_TTL_S,
+                 hard_ttl_seconds: float = RESULT_CACHE_HARD_TTL_S,
+                 memory_entries: int = RESULT_CACHE_MEMORY_ENTRIES,
+                 memory_ttl_seconds: float = RESULT_CACHE_MEMORY_TTL_S,
+                 max_bytes: int = int(RESULT_CACHE_MAX_MB * 1024 * 1024)):
+        self.db_path = db_path
+        self.soft_ttl_seconds = soft_ttl_seconds
+        self.hard_ttl_seconds = max(hard_ttl_seconds, soft_ttl_seconds)
+        self.max_bytes = max_bytes
+        # TTL in memoria breve: un altro worker può aver invalidato/aggiornato la voce su disco
+        self._memory = TTLCache(max_entries=memory_entries, ttl_seconds=memory_ttl_seconds)
+        self._db = ThreadLocalSQLite(db_path)
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        connection = self._db.connection()
+        connection.executescript(_SCHEMA)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(results)")]
+        if "fresh_until" not in columns:
+            # Database creato senza soft TTL: le voci esistenti risultano stale
+            connection.execute("ALTER TABLE results ADD COLUMN fresh_until REAL NOT NULL DEFAULT 0")
+
+    async def get(self, key: str) -> Optional[CachedResult]:
+        """Risultato in cache (valore modificabile, anche stale) o None se assente/oltre l'hard TTL"""
+        entry = self._memory.get(key)
+        if entry is None or entry.created_at + self.hard_ttl_seconds <= time.time():
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory.set(key, entry)
+        if entry.stale:
+            self.stale_hits += 1
+        return CachedResult(copy.deepcopy(entry.value), entry.created_at, entry.fresh_until)
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        """Memorizza (o sostituisce atomicamente) un risultato in entrambi i livelli"""
+        now = time.time()
+        entry = CachedResult(copy.deepcopy(value), now, now + self.soft_ttl_seconds)
+        payload = zlib.compress(json.dumps(entry.value, ensure_ascii=False, default=str).encode("utf-8"))
+        await asyncio.to_thread(self._disk_set, key, payload, entry)
+        self._memory.set(key, entry)
+        self.writes += 1
+
+    async def delete(self, key: str):
+        self._memory.delete(key)
+        await asyncio.to_thread(self._disk_delete, key)
+
+    def _disk_get(self, key: str) -> Optional[CachedResult]:
+        now = time.time()
+        connection = self._db.connection()
+        row = connection.execute(
+            "SELECT payload, created_at, fresh_until FROM results WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        return CachedResult(json.loads(zlib.decompress(row[0]).decode("utf-8")), row[1], row[2])
+
+    def _disk_set(self, key: str, payload: bytes, entry: CachedResult):
+        connection = self._db.connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO results (key, payload, size, created_at, fresh_until, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, payload, len(payload), entry.created_at, entry.fresh_until,
+             entry.created_at + self.hard_ttl_seconds, entry.created_at)
+        )
+        self._evict(connection, entry.created_at)
+
+    def _disk_delete(self, key: str):
+        self._db.connection().execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def _evict(self, connection: sqlite3.Connection, now: float):
+        """Rimuove le voci scadute e, oltre max_bytes, le meno usate di recente"""
+        removed = connection.execute("DELETE FROM results WHERE expires_at <= ?", (now,)).rowcount
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total > self.max_bytes:
+            rows = connection.execute("SELECT key, size FROM results ORDER BY last_access ASC").fetchall()
+            evicted_keys = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                evicted_keys.append((key,))
+                total -= size
+            connection.executemany("DELETE FROM results WHERE key = ?", evicted_keys)
+            removed += len(evicted_keys)
+        self.evictions += max(removed, 0)
+
+    def _disk_totals(self) -> Tuple[int, int]:
+        return self._db.connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+
+    async def stats(self) -> Dict[str, Any]:
+        entries, size = await asyncio.to_thread(self._disk_totals)
+        memory = self._memory.stats()
+        return {
+            "memory_entries": memory["entries"],
+            "memory_hits": memory["hits"],
+            "disk_entries": entries,
+            "disk_bytes": size,
+            "max_bytes": self.max_bytes,
+            "disk_hits": self.disk_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions
+        }
+
+_result_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> ResultCache:
+    """Cache risultati di ricerca (singleton di processo)"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+from .utils import SemanticLogger, generate_cache_key
+from .semantic_search import perform_semantic_search
+
+logger = SemanticLogger()
+
+SEARCH_JOB_WORKERS = int(os.getenv("SEARCH_JOB_WORKERS", "2"))
+SEARCH_JOB_QUEUE_MAX = int(os.getenv("SEARCH_JOB_QUEUE_MAX", "100"))
+SEARCH_JOB_RESULT_TTL_S = float(os.getenv("SEARCH_JOB_RESULT_TTL_S", "3600"))
+
+class SearchJobQueueFull(Exception):
+    """Coda dei job piena: la richiesta va ritentata più tardi"""
+
+@dataclass
+class SearchJob:
+    """Ricerca semantica eseguita in background dal pool di worker"""
+    job_id: str
+    search_key: str
+    params: Dict[str, Any]
+    status: str = "queued"  # queued | running | completed | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    pois_found: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    async def on_event(self, event: Dict[str, Any]):
+        """Aggiorna l'avanzamento per fase dagli eventi della pipeline di ricerca"""
+        stage = event.get("stage", event["event"])
+        progress = self.stages.setdefault(stage, {"status": "running", "pois": 0})
+        if event["event"] == "pois":
+            progress["pois"] += len(event.get("pois", []))
+            progress["status"] = "done"
+            self.pois_found += len(event.get("pois", []))
+        elif event["event"] == "municipalities":
+            progress["municipalities"] = len(event.get("municipalities", []))
+            progress["status"] = "done"
+        elif event["event"] == "stage":
+            progress.update({key: value for key, value in event.items() if key not in ("event", "stage")})
+
+    def status_info(self) -> Dict[str, Any]:
+        """Stato del job senza il risultato (per il polling)"""
+        now = self.finished_at or time.time()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "zone_name": self.params.get("zone_name", ""),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_ms": round((now - (self.started_at or now)) * 1000, 2),
+            "stages": self.stages,
+            "pois_found": self.pois_found,
+            "error": self.error
+        }
+
+class SearchJobManager:
+    """Pool di worker in-process per le ricerche lunghe (submit / poll / fetch)
+
+    - numero di worker limitato (SEARCH_JOB_WORKERS), coda limitata (SEARCH_JOB_QUEUE_MAX)
+    - una richiesta identica a un job in corso o completato da poco riusa quel job
+    - i job conclusi restano consultabili per SEARCH_JOB_RESULT_TTL_S secondi
+    """
+
+    def __init__(self, workers: int = SEARCH_JOB_WORKERS, queue_max: int = SEARCH_JOB_QUEUE_MAX,
+                 result_ttl: float = SEARCH_JOB_RESULT_TTL_S):
+        self.workers = max(1, workers)
+        self.result_ttl = result_ttl
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_max)
+        self._jobs: Dict[str, SearchJob] = {}
+        self._jobs_by_key: Dict[str, str] = {}
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Avvia i worker (idempotente)"""
+        self._worker_tasks = [task for task in self._worker_tasks if not task.done()]
+        while len(self._worker_tasks) < self.workers:
+            self._worker_tasks.append(asyncio.ensure_future(self._worker(len(self._worker_tasks))))
+
+    async def shutdown(self):
+        """Ferma i worker (i job in corso vengono interrotti)"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def submit(self, zone_name: str, polygon: List[List[float]], extend_marine: bool = False,
+                     enable_ai: bool = True, marine_only: bool = False, mode: str = "standard",
+                     time_budget_ms: Optional[float] = None) -> SearchJob:
+        """Accoda una ricerca e restituisce subito il job (o quello identico già esistente)"""
+        self._purge_expired()
+        search_key = generate_cache_key(f"{zone_name}_{extend_marine}_{marine_only}_{mode}_{time_budget_ms}", polygon)
+
+        existing = self._jobs.get(self._jobs_by_key.get(search_key, ""))
+        if existing is not None and existing.status != "failed":
+            logger.logger.info(f"🔁 Job {existing.job_id} riusato per '{zone_name}' ({existing.status})")
+            return existing
+
+        job = SearchJob(
+            job_id=uuid.uuid4().hex,
+            search_key=search_key,
+            params={
+                "zone_name": zone_name,
+                "polygon": polygon,
+                "extend_marine": extend_marine,
+                "enable_ai": enable_ai,
+                "marine_only": marine_only,
+                "mode": mode,
+                "time_budget_ms": time_budget_ms
+            }
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise SearchJobQueueFull(f"Coda ricerche piena ({self._queue.maxsize} job in attesa)")
+
+        self._jobs[job.job_id] = job
+        self._jobs_by_key[search_key] = job.job_id
+        await self.start()
+        logger.logger.info(f"📥 Job {job.job_id} accodato per '{zone_name}' (in coda: {self._queue.qsize()})")
+        return job
+
+    def get(self, job_id: str) -> Optional[SearchJob]:
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        by_status: Dict[str, int] = {}
+        for job in self._jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "jobs": by_status
+        }
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job: SearchJob = await self._queue.get()
+            try:
+                await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: SearchJob):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = await perform_semantic_search(**job.params, on_event=job.on_event)
+            # Copia: il risultato può essere condiviso (SingleFlight) con una ricerca concorrente
+            job.result = {**result, "processing_time_ms": round((time.time() - job.started_at) * 1000, 2)}
+            for progress in job.stages.values():
+                progress["status"] = "done"
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "Job interrotto"
+            raise
+        except Exception as e:
+            logger.log_error("Search Job", str(e), job.params.get("zone_name", ""))
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            logger.logger.info(f"📤 Job {job.job_id} {job.status} in {job.status_info()['elapsed_ms']}ms")
+
+    def _purge_expired(self):
+        """Rimuove i job conclusi da più di result_ttl secondi"""
+        expiry = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < expiry]:
+            job = self._jobs.pop(job_id)
+            if self._jobs_by_key.get(job.search_key) == job_id:
+                del self._jobs_by_key[job.search_key]
+
+_job_manager: Optional[SearchJobManager] = None
+
+def get_search_job_manager() -> SearchJobManager:
+    """Gestore dei job di ricerca (singleton di processo)"""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = SearchJobManager()
+    return _job_manager
@@ -21,8 +21,10 @@ from typing import Dict, List, Optional, Tuple, Any
 from urllib.parse import quote, urljoin
 from dataclasses import dataclass
 from bs4 import BeautifulSoup
-import wikipedia
-from SPARQLWrapper import SPARQLWrapper, JSON
+from .mediawiki_client import MediaWikiClient, WikiPage
+from .sparql_client import SparqlClient, WIKIDATA_SPARQL_ENDPOINT
+from .http_pool import get_http_session
+from .utils import deadline_expired, mark_truncated
 import time
 import os
 
@@ -47,10 +49,14 @@ class SemanticEnricher:
     def __init__(self):
         self.session = None
         self.wiki_session = None
+        self.timeout = aiohttp.ClientTimeout(total=10)
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (compatible; SemanticEnricher/1.0)'
+        }
         self.placeholder_image = "/static/images/placeholder_poi.jpg"
         
-        # Configure Wikipedia
-        wikipedia.set_lang("it")  # Italian Wikipedia
+        # Configure Wikipedia (Italian, per-instance language - no global state)
+        self.wiki_client = MediaWikiClient("it")
         
         # Trusted Ligurian tourism websites
         self.tourism_sites = {
@@ -117,18 +123,16 @@ class SemanticEnricher:
     
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=10),
-            headers={
-                'User-Agent': 'Mozilla/5.0 (compatible; SemanticEnricher/1.0)'
-            }
-        )
+        # Shared sessions from the application HTTP pool (one per upstream)
+        self.session = get_http_session("web")
+        self.wiki_session = get_http_session("wikipedia")
+        self.wiki_client.session = self.wiki_session
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit"""
-        if self.session:
-            await self.session.close()
+        """Async context manager exit (pooled sessions are closed at app shutdown)"""
+        self.session = None
+        self.wiki_session = None
     
     async def enrich_poi(self, poi: Dict[str, Any]) -> EnrichmentResult:
         """
@@ -205,7 +209,11 @@ class SemanticEnricher:
         # Enrich POIs with rate limiting
         enriched_pois = []
         for i, poi in enumerate(pois):
-            if poi in pois_to_enrich:
+            if poi in pois_to_enrich and deadline_expired():
+                # Request time budget exhausted: keep the remaining POIs as they are
+                mark_truncated("enrichment")
+                enriched_pois.append(poi)
+            elif poi in pois_to_enrich:
                 try:
                     enrichment_result = await self.enrich_poi(poi)
                     
@@ -225,7 +233,7 @@ class SemanticEnricher:
                     enriched_pois.append(enriched_poi)
                     
                     # Rate limiting: small delay between requests
-                    if i < len(pois) - 1:
+                    if i < len(pois) - 1 and not deadline_expired():
                         await asyncio.sleep(0.5)
                         
                 except Exception as e:
@@ -240,40 +248,34 @@ class SemanticEnricher:
     async def _enrich_from_wikipedia(self, poi_name: str, poi_type: str) -> Optional[EnrichmentResult]:
         """Enrich POI using Wikipedia API"""
         try:
-            # Search for Wikipedia page
-            search_results = wikipedia.search(poi_name, results=3)
-            if not search_results:
+            # Search for Wikipedia pages (summary and lead image come with the search)
+            pages = await self.wiki_client.search_pages(poi_name, limit=3)
+            if not pages:
                 return None
             
             # Try to get the best match
-            for search_term in search_results:
-                try:
-                    page = wikipedia.page(search_term)
-                    
-                    # Extract description (first paragraph)
-                    description = self._extract_wikipedia_description(page.content)
-                    if not description or len(description) < 20:
-                        continue
-                    
-                    # Try to get image
-                    image_url = self._extract_wikipedia_image(page)
-                    
-                    return EnrichmentResult(
-                        description=description,
-                        image_url=image_url or self.placeholder_image,
-                        source="Wikipedia",
-                        confidence=0.9 if image_url else 0.7,
-                        metadata={
-                            "wikipedia_url": page.url,
-                            "wikipedia_title": page.title,
-                            "content_length": len(page.content)
-                        }
-                    )
-                    
-                except wikipedia.exceptions.DisambiguationError:
-                    continue
-                except wikipedia.exceptions.PageError:
+            for page in pages:
+                # Extract description (first paragraph) - intro first, full text only if needed
+                description = self._extract_wikipedia_description(page.summary)
+                if not description or len(description) < 20:
+                    description = self._extract_wikipedia_description(await self.wiki_client.get_content(page))
+                if not description or len(description) < 20:
                     continue
+                
+                # Try to get image
+                image_url = self._extract_wikipedia_image(page)
+                
+                return EnrichmentResult(
+                    description=description,
+                    image_url=image_url or self.placeholder_image,
+                    source="Wikipedia",
+                    confidence=0.9 if image_url else 0.7,
+                    metadata={
+                        "wikipedia_url": page.url,
+                        "wikipedia_title": page.title,
+                        "content_length": len(page.content or page.summary)
+                    }
+                )
             
             return None
             
@@ -284,7 +286,7 @@ class SemanticEnricher:
     async def _enrich_from_wikidata(self, poi_name: str, poi_type: str) -> Optional[EnrichmentResult]:
         """Enrich POI using Wikidata SPARQL queries"""
         try:
-            sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
+            sparql = SparqlClient(WIKIDATA_SPARQL_ENDPOINT, session=get_http_session("wikidata"))
             
             # Search for entity by name
             query = f"""
@@ -303,14 +305,12 @@ class SemanticEnricher:
             LIMIT 1
             """
             
-            sparql.setQuery(query)
-            sparql.setReturnFormat(JSON)
-            results = sparql.query().convert()
+            bindings = await sparql.select(query)
             
-            if not results['results']['bindings']:
+            if not bindings:
                 return None
             
-            result = results['results']['bindings'][0]
+            result = bindings[0]
             
             description = result.get('description', {}).get('value', '')
             image_url = result.get('image', {}).get('value', '')
@@ -363,7 +363,8 @@ class SemanticEnricher:
             search_url = urljoin(site_config['base_url'], site_config['search_path'])
             params = {'q': poi_name, 'type': 'poi'}
             
-            async with self.session.get(search_url, params=params) as response:
+            async with self.session.get(search_url, params=params,
+                                        headers=self.headers, timeout=self.timeout) as response:
                 if response.status != 200:
                     return None
                 
@@ -466,21 +467,9 @@ class SemanticEnricher:
         
         return ""
     
-    def _extract_wikipedia_image(self, page) -> Optional[str]:
-        """Extract image URL from Wikipedia page"""
-        try:
-            # Try to get images from the page
-            if hasattr(page, 'images') and page.images:
-                for img_url in page.images:
-                    # Prefer images that look like main photos
-                    if any(keyword in img_url.lower() for keyword in ['photo', 'image', 'picture']):
-                        return img_url
-                # If no good images found, return the first one
-                return page.images[0]
-        except Exception:
-            pass
-        
-        return None
+    def _extract_wikipedia_image(self, page: WikiPage) -> Optional[str]:
+        """Extract image URL from Wikipedia page (lead image chosen by the PageImages API)"""
+        return page.image_url or None
     
     def _is_good_match(self, poi_name: str, found_title: str) -> bool:
         """Check if a found title is a good match for the POI name"""
@@ -1,6 +1,9 @@
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple
-from .utils import SemanticLogger, POIDeduplicator, GeoBoundingBox, generate_cache_key, detect_country_from_polygon
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator
+from .utils import (SemanticLogger, POIDeduplicator, GeoBoundingBox, SingleFlight, generate_cache_key,
+                    detect_country_from_polygon, set_deadline, reset_deadline, current_deadline,
+                    set_zone_geometry, reset_zone_geometry, set_failure_tracker, reset_failure_tracker,
+                    deadline_expired, mark_truncated, mark_failed, failed_stages, run_within_deadline)
 from .osm_query import search_osm_pois
 from .wiki_extractor import search_wiki_pois
 from .geo_municipal import discover_zone_municipalities
@@ -8,30 +11,32 @@ from .marine_explorer import explore_marine_area, MarineAreaDetector
 from .enrich_ai import POIEnricher
 from .semantic_enricher import enrich_poi_list
 from .extended_enrichment import enrich_poi_batch_with_extended_search
-import json
+from .result_cache import get_result_cache
 import os
+import time
 
 logger = SemanticLogger()
 
+# Refresh in background dei risultati stale in corso, per chiave di cache
+_REFRESH_TASKS: Dict[str, asyncio.Task] = {}
+
 class SemanticPOISearchEngine:
     """Engine principale per la ricerca semantica avanzata di POI"""
     
     def __init__(self):
         self.deduplicator = POIDeduplicator(distance_threshold=50)
         self.enricher = POIEnricher()
-        self.cache_dir = "../cache/semantic/"
-        self._ensure_cache_dir()
-    
-    def _ensure_cache_dir(self):
-        """Crea directory cache se non esiste"""
-        os.makedirs(self.cache_dir, exist_ok=True)
+        self.result_cache = get_result_cache()
     
     async def semantic_search(self, zone_name: str, 
                             polygon: List[List[float]], 
                             extend_marine: bool = False,
                             enable_ai_enrichment: bool = True,
                             marine_only: bool = False,
-                            mode: str = "standard") -> Dict:
+                            mode: str = "standard",
+                            on_event: Optional[Callable[[Dict], Awaitable[Any]]] = None,
+                            time_budget_ms: Optional[float] = None,
+                            refresh: bool = False) -> Dict:
         """Ricerca semantica completa per una zona
         
         Args:
@@ -40,6 +45,11 @@ class SemanticPOISearchEngine:
             extend_marine: Estende ricerca al mare (aggiunge POI marini)
             enable_ai_enrichment: Abilita arricchimento AI
             marine_only: Se True, cerca SOLO POI marini (salta terrestri)
+            on_event: Callback async opzionale chiamata al termine di ogni fase
+                (batch di POI deduplicati, comuni, avanzamento) - usata per lo streaming
+            time_budget_ms: Budget di tempo opzionale: le fasi che non terminano in tempo
+                vengono saltate/cancellate e riportate in "truncated_stages" (risultato non salvato in cache)
+            refresh: Ignora la cache e ricalcola il risultato (refresh in background dei risultati stale)
         """
         
         logger.log_search_request(zone_name, polygon, extend_marine)
@@ -47,10 +57,16 @@ class SemanticPOISearchEngine:
         if search_mode == "enhanced":
             logger.logger.info("🌊 [POI-MARINE] Enhanced mode attivo — pipeline GPT avanzata")
         
+        deadline_token = set_deadline(time_budget_ms)
+        failures_token = set_failure_tracker()
+        # Poligono preparato una volta per tutti i filtri punto-in-poligono della richiesta
+        zone_token = set_zone_geometry(polygon)
         try:
             # 0. Rilevamento paese
             # ✅ FIX MarineUniversal: Country detection universale (senza fallback hardcoded)
-            country_code, country_name = await detect_country_from_polygon(polygon)
+            country_code, country_name = await run_within_deadline(
+                "country", detect_country_from_polygon(polygon), (None, None)
+            )
             if not country_code or country_code == "":
                 country_code, country_name = None, None  # ✅ FIX MarineUniversal: Fallback a None (non hardcoded IT)
             
@@ -67,14 +83,24 @@ class SemanticPOISearchEngine:
                 bbox = GeoBoundingBox.extend_marine(bbox, polygon, extension_km=5.0)
             
             # ✅ FIX MarineDeep: 3. Controllo cache (invalida sempre alla prima esecuzione dopo modifiche)
-            invalidate_cache = os.getenv("INVALIDATE_CACHE", "false").lower() == "true"
+            invalidate_cache = refresh or os.getenv("INVALIDATE_CACHE", "false").lower() == "true"
             cache_result = await self._check_cache(zone_name, polygon, extend_marine, marine_only, invalidate_cache, search_mode)
             
             if cache_result:
                 logger.log_search_results(zone_name, len(cache_result.get("pois", [])), 
                                         len(cache_result.get("municipalities", [])))
+                await self._emit(on_event, "municipalities", stage="cache",
+                                 municipalities=cache_result.get("municipalities", []))
+                await self._emit(on_event, "pois", stage="cache", pois=cache_result.get("pois", []))
+                if cache_result.get("stale"):
+                    # Stale-while-revalidate: risposta immediata, ricalcolo in background
+                    self._schedule_refresh(zone_name, polygon, extend_marine, enable_ai_enrichment,
+                                           marine_only, search_mode)
                 return cache_result
             
+            # POI già inviati in streaming (per non emettere due volte lo stesso POI)
+            emitted_pois: List[Dict] = []
+            
             # 4. Ricerca parallela da multiple fonti
             # Se marine_only=True, cerca SOLO POI marini (salta terrestri e municipi)
             if marine_only:
@@ -83,32 +109,72 @@ class SemanticPOISearchEngine:
                 osm_pois = []
                 wiki_pois = []
                 municipalities = []
-                marine_data = await explore_marine_area(zone_name, bbox, polygon, mode=search_mode)
+                marine_data = await run_within_deadline(
+                    "marine", explore_marine_area(zone_name, bbox, polygon, mode=search_mode), {}
+                )
                 unique_pois = marine_data.get("marine_pois", [])
+                await self._emit_poi_batch(on_event, "marine", unique_pois, emitted_pois)
             else:
                 # Ricerca normale (terrestri + opzionale marina)
-                search_tasks = [
-                    self._search_osm_pois(bbox, polygon, extend_marine),
-                    self._search_wiki_pois(zone_name, bbox, polygon, extend_marine, country_code),
-                    self._discover_municipalities(zone_name, polygon)
-                ]
+                # Ogni fonte notifica i propri risultati appena termina (streaming)
+                async def _stage_pois(stage: str, search) -> List[Dict]:
+                    pois = await run_within_deadline(stage, search, [])
+                    await self._emit_poi_batch(on_event, stage, pois, emitted_pois)
+                    return pois
+                
+                async def _stage_municipalities(search) -> List[Dict]:
+                    found = await run_within_deadline("municipalities", search, [])
+                    await self._emit(on_event, "municipalities", stage="municipalities", municipalities=found)
+                    return found
                 
-                osm_pois, wiki_pois, municipalities = await asyncio.gather(*search_tasks)
+                async def _stage_marine(search) -> Dict:
+                    data = await run_within_deadline("marine", search, {})
+                    await self._emit_poi_batch(on_event, "marine", data.get("marine_pois", []), emitted_pois)
+                    return data
                 
-                # 5. Combina e deduplica POI
-                all_pois = osm_pois + wiki_pois
-                unique_pois = self.deduplicator.deduplicate(all_pois)
+                municipalities_task = asyncio.ensure_future(
+                    _stage_municipalities(self._discover_municipalities(zone_name, polygon))
+                )
                 
-                # 6. Ricerca marina se richiesta (solo se extend_marine=True)
-                marine_data = {}
+                # 6. Ricerca marina (solo se extend_marine=True) avviata subito in parallelo alla terrestre:
+                # è la fase più lenta e usa i comuni appena _discover_municipalities termina
+                marine_task = None
                 if extend_marine:
-                    marine_data = await explore_marine_area(zone_name, bbox, polygon, mode=search_mode)
-                    if marine_data.get("marine_pois"):
-                        # Aggiungi POI marini ai risultati
-                        unique_pois.extend(marine_data["marine_pois"])
+                    marine_task = asyncio.ensure_future(_stage_marine(
+                        explore_marine_area(zone_name, bbox, polygon, mode=search_mode,
+                                            municipalities=municipalities_task)
+                    ))
+                
+                try:
+                    search_tasks = [
+                        _stage_pois("osm", self._search_osm_pois(bbox, polygon, extend_marine)),
+                        _stage_pois("wiki", self._search_wiki_pois(zone_name, bbox, polygon, extend_marine, country_code)),
+                        municipalities_task
+                    ]
+                    
+                    osm_pois, wiki_pois, municipalities = await asyncio.gather(*search_tasks)
+                    
+                    # 5. Combina e deduplica POI
+                    all_pois = osm_pois + wiki_pois
+                    unique_pois = self.deduplicator.deduplicate(all_pois)
+                    
+                    marine_data = {}
+                    if marine_task is not None:
+                        marine_data = await marine_task
+                finally:
+                    for task in (municipalities_task, marine_task):
+                        if task is not None and not task.done():
+                            task.cancel()
+                
+                if marine_data.get("marine_pois"):
+                    # Merge finale: aggiungi i POI marini che non duplicano quelli terrestri
+                    unique_pois.extend(self.deduplicator.filter_new(marine_data["marine_pois"], list(unique_pois)))
             
-            # 7. Arricchimento AI se abilitato
-            if enable_ai_enrichment:
+            # 7. Arricchimento AI se abilitato (saltato se il tempo della richiesta è già esaurito)
+            if enable_ai_enrichment and deadline_expired():
+                mark_truncated("enrichment")
+            elif enable_ai_enrichment:
+                await self._emit(on_event, "stage", stage="enrichment", total_pois=len(unique_pois))
                 # Use the new semantic enricher for better results
                 unique_pois = await enrich_poi_list(unique_pois, zone_name)
                 
@@ -121,10 +187,14 @@ class SemanticPOISearchEngine:
                         municipality_name = municipalities[0].get("name", "")
                     
                     # Arricchisci POI con descrizioni mancanti o brevi (non bloccante)
-                    unique_pois = await enrich_poi_batch_with_extended_search(
-                        unique_pois, 
-                        zone_name, 
-                        municipality_name
+                    unique_pois = await run_within_deadline(
+                        "extended_enrichment",
+                        enrich_poi_batch_with_extended_search(
+                            unique_pois, 
+                            zone_name, 
+                            municipality_name
+                        ),
+                        unique_pois
                     )
                 except Exception as e:
                     # In caso di errore, mantieni i POI come sono (non blocca la ricerca)
@@ -149,8 +219,20 @@ class SemanticPOISearchEngine:
             # ✅ FIX MarineDebug: Log di debug prima del return
             logger.logger.info(f"[DEBUG] Final result for zone {zone_name}: {len(result['pois'])} POIs (land: {len([p for p in result['pois'] if p.get('type') == 'land'])}, marine: {len([p for p in result['pois'] if p.get('type') == 'marine'])})")
             
-            # 9. Salva in cache
-            await self._save_to_cache(zone_name, polygon, extend_marine, result, marine_only, search_mode)
+            # 9. Salva in cache (solo risultati completi: quelli troncati dal deadline sono parziali)
+            deadline = current_deadline()
+            failed = failed_stages()
+            if failed:
+                result["failed_stages"] = failed
+            if deadline is not None and deadline.truncated_stages:
+                result["truncated_stages"] = list(deadline.truncated_stages)
+                logger.logger.info(f"⏱️ Risultato parziale per '{zone_name}' (fasi troncate: {', '.join(deadline.truncated_stages)}) - non salvato in cache")
+            elif failed:
+                # Fonti fallite (es. Overpass/WDQS non raggiungibili): il risultato è degradato e
+                # non va in cache, la prossima ricerca lo ricalcola (in un refresh resta quello stale)
+                logger.logger.warning(f"⚠️ Risultato di '{zone_name}' con fonti fallite ({', '.join(failed)}) - non salvato in cache")
+            else:
+                await self._save_to_cache(zone_name, polygon, extend_marine, result, marine_only, search_mode)
             
             logger.log_search_results(zone_name, len(result["pois"]), len(result["municipalities"]))
             
@@ -159,15 +241,63 @@ class SemanticPOISearchEngine:
         except Exception as e:
             logger.log_error("Semantic Search", str(e), zone_name)
             return self._empty_result()
+        finally:
+            reset_zone_geometry(zone_token)
+            reset_failure_tracker(failures_token)
+            reset_deadline(deadline_token)
+    
+    def _schedule_refresh(self, zone_name: str, polygon: List[List[float]], extend_marine: bool,
+                          enable_ai_enrichment: bool, marine_only: bool, mode: str):
+        """Avvia (una sola volta per chiave) il ricalcolo in background di un risultato stale
+        
+        Il nuovo risultato sostituisce la voce in cache al termine della ricerca, solo se
+        nessuna fonte è fallita (altrimenti resta in uso il risultato stale).
+        """
+        cache_key = generate_cache_key(f"{zone_name}_{extend_marine}_{marine_only}_{mode}", polygon)
+        if cache_key in _REFRESH_TASKS:
+            return
+        
+        async def _refresh():
+            logger.logger.info(f"🔄 Refresh in background del risultato stale per '{zone_name}'")
+            engine = SemanticPOISearchEngine()
+            await engine.semantic_search(zone_name, polygon, extend_marine, enable_ai_enrichment,
+                                         marine_only, mode, refresh=True)
+        
+        task = asyncio.ensure_future(_refresh())
+        _REFRESH_TASKS[cache_key] = task
+        task.add_done_callback(lambda _: _REFRESH_TASKS.pop(cache_key, None))
+    
+    async def _emit(self, on_event: Optional[Callable[[Dict], Awaitable[Any]]], event: str, **payload):
+        """Notifica un evento della pipeline (streaming/progress) senza mai interrompere la ricerca"""
+        if on_event is None:
+            return
+        try:
+            await on_event({"event": event, **payload})
+        except Exception as e:
+            logger.log_error("Search Event", str(e), "")
+    
+    async def _emit_poi_batch(self, on_event: Optional[Callable[[Dict], Awaitable[Any]]],
+                              stage: str, pois: List[Dict], emitted_pois: List[Dict]):
+        """Emette solo i POI nuovi rispetto a quelli già inviati (deduplicazione incrementale)
+        
+        La deduplica finale resta quella della pipeline: un POI già inviato non viene
+        sostituito da uno "migliore" arrivato dopo, lo farà il risultato completo finale.
+        """
+        if on_event is None or not pois:
+            return
+        fresh_pois = self.deduplicator.filter_new(pois, emitted_pois)
+        if fresh_pois:
+            await self._emit(on_event, "pois", stage=stage, pois=fresh_pois)
     
     async def _search_osm_pois(self, bbox: Tuple[float, float, float, float], 
                               polygon: List[List[float]], 
                               extend_marine: bool) -> List[Dict]:
         """Ricerca POI da OpenStreetMap"""
         try:
-            return await search_osm_pois(bbox, include_marine=extend_marine)
+            return await search_osm_pois(bbox, include_marine=extend_marine, polygon=polygon)
         except Exception as e:
             logger.log_error("OSM POI Search", str(e), "")
+            mark_failed("osm")
             return []
     
     async def _search_wiki_pois(self, zone_name: str,
@@ -191,6 +321,7 @@ class SemanticPOISearchEngine:
             return await search_wiki_pois(zone_name, bbox, polygon, include_marine=extend_marine, lang=lang)
         except Exception as e:
             logger.log_error("Wiki POI Search", str(e), zone_name)
+            mark_failed("wiki")
             return []
     
     async def _discover_municipalities(self, zone_name: str, 
@@ -200,6 +331,7 @@ class SemanticPOISearchEngine:
             return await discover_zone_municipalities(polygon, zone_name)
         except Exception as e:
             logger.log_error("Municipality Discovery", str(e), zone_name)
+            mark_failed("municipalities")
             return []
     
     def _organize_final_results(self, pois: List[Dict], 
@@ -299,82 +431,66 @@ class SemanticPOISearchEngine:
             
             # Include marine_only nella cache key per distinguere ricerche marine da terrestri
             cache_key = generate_cache_key(f"{zone_name}_{extend_marine}_{marine_only}_{mode}", polygon)
-            cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
-            
-            if os.path.exists(cache_file):
-                # Verifica età del cache (massimo 24 ore)
-                import time
-                file_age = time.time() - os.path.getmtime(cache_file)
-                if file_age < 86400:  # 24 ore
-                    with open(cache_file, 'r', encoding='utf-8') as f:
-                        cached_result = json.load(f)
-                        
-                        # ✅ FIX MarineWreckFinder: Se è una ricerca marina (marine_only=True), verifica qualità cache PRIMA di restituirla
-                        if marine_only:
-                            pois_count = len(cached_result.get("pois", []))
-                            logger.logger.info(f"[POI-MARINE] 🔍 Verifica qualità cache: {pois_count} POI trovati per '{zone_name}'")
-                            
-                            # ✅ FIX MarineWreckFinder: Invalida cache se contiene 0 POI o se contiene molti duplicati (probabilmente vecchia logica)
-                            if pois_count == 0:
-                                logger.logger.warning(f"[POI-MARINE] ⚠️ Cache marina con 0 POI trovata per '{zone_name}' - Invalidando cache per rigenerare con ricerca SOLO diving center")
-                                try:
-                                    os.remove(cache_file)
-                                except Exception as e:
-                                    logger.log_error("Cache Invalidation", str(e), zone_name)
-                                return None
-                            
-                            # ✅ FIX MarineWreckFinder: Controlla se ci sono POI da Wikipedia/Wikidata/DBpedia (NON devono essere presenti per ricerca marina!)
-                            sources = [poi.get("source", "").lower() for poi in cached_result.get("pois", [])]
-                            wikipedia_count = sum(1 for source in sources if "wikipedia" in source or "wikidata" in source or "dbpedia" in source or "fallback" in source)
-                            logger.logger.info(f"[POI-MARINE] 🔍 Verifica source: {wikipedia_count} POI da Wikipedia/Wikidata/DBpedia/Fallback trovati")
-                            if wikipedia_count >= 1:
-                                logger.logger.warning(f"[POI-MARINE] ⚠️ Cache marina con {wikipedia_count} POI da Wikipedia/Wikidata/DBpedia/Fallback trovata per '{zone_name}' - Invalidando cache per rigenerare con ricerca SOLO diving center")
-                                try:
-                                    os.remove(cache_file)
-                                    logger.logger.info(f"[POI-MARINE] ✅ Cache Python invalidata e rimossa: {cache_file}")
-                                except Exception as e:
-                                    logger.log_error("Cache Invalidation", str(e), zone_name)
-                                return None
-                            
-                            # ✅ FIX MarineWreckFinder: Controlla se ci sono duplicati Moskva - probabilmente vecchia cache
-                            names = [poi.get("name", "").lower() for poi in cached_result.get("pois", [])]
-                            moskva_count = sum(1 for name in names if "moskva" in name or "moscow" in name or "moscova" in name)
-                            logger.logger.info(f"[POI-MARINE] 🔍 Verifica Moskva: {moskva_count} trovati nei nomi POI")
-                            if moskva_count >= 1:  # ✅ FIX MarineWreckFinder: Se c'è almeno 1 Moskva, invalida cache (non dovrebbe esserci)
-                                logger.logger.warning(f"[POI-MARINE] ⚠️ Cache marina con {moskva_count} duplicati Moskva trovata per '{zone_name}' - Invalidando cache per rigenerare con nuova logica")
-                                try:
-                                    os.remove(cache_file)
-                                    logger.logger.info(f"[POI-MARINE] ✅ Cache invalidata e rimossa: {cache_file}")
-                                except Exception as e:
-                                    logger.log_error("Cache Invalidation", str(e), zone_name)
-                                return None
-                            
-                            # ✅ FIX MarineWreckFinder: Controlla se ci sono descrizioni irrilevanti (es. "Canada", "Ontario")
-                            descriptions = [poi.get("description", "").lower() for poi in cached_result.get("pois", [])]
-                            irrelevant_count = sum(1 for desc in descriptions if "canada" in desc or "ontario" in desc or "canadian" in desc)
-                            logger.logger.info(f"[POI-MARINE] 🔍 Verifica descrizioni irrilevanti: {irrelevant_count} trovati")
-                            if irrelevant_count >= 1:  # Se c'è almeno 1 descrizione irrilevante, invalida cache
-                                logger.logger.warning(f"[POI-MARINE] ⚠️ Cache marina con {irrelevant_count} descrizioni irrilevanti (Canada/Ontario) trovata per '{zone_name}' - Invalidando cache per rigenerare con nuova logica")
-                                try:
-                                    os.remove(cache_file)
-                                    logger.logger.info(f"[POI-MARINE] ✅ Cache invalidata e rimossa: {cache_file}")
-                                except Exception as e:
-                                    logger.log_error("Cache Invalidation", str(e), zone_name)
-                                return None
-                            
-                            logger.logger.info(f"[POI-MARINE] ✅ Cache marina valida per '{zone_name}' - {pois_count} POI, 0 Wikipedia, 0 Moskva, 0 descrizioni irrilevanti")
-                        
-                        logger.logger.info(f"Cache hit for zone: {zone_name}")
-                        
-                        # Normalizza accessibility per tutti i POI dalla cache (converti stringa -> dict)
-                        if "pois" in cached_result and isinstance(cached_result["pois"], list):
-                            cached_result["pois"] = [
-                                self._normalize_poi_accessibility(poi.copy())
-                                for poi in cached_result["pois"]
-                            ]
-                        
-                        return cached_result
             
+            cached_entry = await self.result_cache.get(cache_key)
+            if cached_entry is not None:
+                cached_result = cached_entry.value
+                
+                # ✅ FIX MarineWreckFinder: Se è una ricerca marina (marine_only=True), verifica qualità cache PRIMA di restituirla
+                if marine_only:
+                    pois_count = len(cached_result.get("pois", []))
+                    logger.logger.info(f"[POI-MARINE] 🔍 Verifica qualità cache: {pois_count} POI trovati per '{zone_name}'")
+                    
+                    # ✅ FIX MarineWreckFinder: Invalida cache se contiene 0 POI o se contiene molti duplicati (probabilmente vecchia logica)
+                    if pois_count == 0:
+                        logger.logger.warning(f"[POI-MARINE] ⚠️ Cache marina con 0 POI trovata per '{zone_name}' - Invalidando cache per rigenerare con ricerca SOLO diving center")
+                        await self.result_cache.delete(cache_key)
+                        return None
+                    
+                    # ✅ FIX MarineWreckFinder: Controlla se ci sono POI da Wikipedia/Wikidata/DBpedia (NON devono essere presenti per ricerca marina!)
+                    sources = [poi.get("source", "").lower() for poi in cached_result.get("pois", [])]
+                    wikipedia_count = sum(1 for source in sources if "wikipedia" in source or "wikidata" in source or "dbpedia" in source or "fallback" in source)
+                    logger.logger.info(f"[POI-MARINE] 🔍 Verifica source: {wikipedia_count} POI da Wikipedia/Wikidata/DBpedia/Fallback trovati")
+                    if wikipedia_count >= 1:
+                        logger.logger.warning(f"[POI-MARINE] ⚠️ Cache marina con {wikipedia_count} POI da Wikipedia/Wikidata/DBpedia/Fallback trovata per '{zone_name}' - Invalidando cache per rigenerare con ricerca SOLO diving center")
+                        await self.result_cache.delete(cache_key)
+                        return None
+                    
+                    # ✅ FIX MarineWreckFinder: Controlla se ci sono duplicati Moskva - probabilmente vecchia cache
+                    names = [poi.get("name", "").lower() for poi in cached_result.get("pois", [])]
+                    moskva_count = sum(1 for name in names if "moskva" in name or "moscow" in name or "moscova" in name)
+                    logger.logger.info(f"[POI-MARINE] 🔍 Verifica Moskva: {moskva_count} trovati nei nomi POI")
+                    if moskva_count >= 1:  # ✅ FIX MarineWreckFinder: Se c'è almeno 1 Moskva, invalida cache (non dovrebbe esserci)
+                        logger.logger.warning(f"[POI-MARINE] ⚠️ Cache marina con {moskva_count} duplicati Moskva trovata per '{zone_name}' - Invalidando cache per rigenerare con nuova logica")
+                        await self.result_cache.delete(cache_key)
+                        return None
+                    
+                    # ✅ FIX MarineWreckFinder: Controlla se ci sono descrizioni irrilevanti (es. "Canada", "Ontario")
+                    descriptions = [poi.get("description", "").lower() for poi in cached_result.get("pois", [])]
+                    irrelevant_count = sum(1 for desc in descriptions if "canada" in desc or "ontario" in desc or "canadian" in desc)
+                    logger.logger.info(f"[POI-MARINE] 🔍 Verifica descrizioni irrilevanti: {irrelevant_count} trovati")
+                    if irrelevant_count >= 1:  # Se c'è almeno 1 descrizione irrilevante, invalida cache
+                        logger.logger.warning(f"[POI-MARINE] ⚠️ Cache marina con {irrelevant_count} descrizioni irrilevanti (Canada/Ontario) trovata per '{zone_name}' - Invalidando cache per rigenerare con nuova logica")
+                        await self.result_cache.delete(cache_key)
+                        return None
+                    
+                    logger.logger.info(f"[POI-MARINE] ✅ Cache marina valida per '{zone_name}' - {pois_count} POI, 0 Wikipedia, 0 Moskva, 0 descrizioni irrilevanti")
+                
+                logger.logger.info(f"Cache hit for zone: {zone_name}")
+                
+                # Normalizza accessibility per tutti i POI dalla cache (converti stringa -> dict)
+                if "pois" in cached_result and isinstance(cached_result["pois"], list):
+                    cached_result["pois"] = [
+                        self._normalize_poi_accessibility(poi.copy())
+                        for poi in cached_result["pois"]
+                    ]
+                
+                # Freschezza: oltre il soft TTL il risultato è servito come stale e ricalcolato in background
+                cached_result["stale"] = cached_entry.stale
+                cached_result["cache_age_s"] = round(cached_entry.age_seconds, 1)
+                
+                return cached_result
+    
         except Exception as e:
             logger.log_error("Cache Check", str(e), zone_name)
         
@@ -387,20 +503,18 @@ class SemanticPOISearchEngine:
         try:
             # Include marine_only nella cache key per distinguere ricerche marine da terrestri
             cache_key = generate_cache_key(f"{zone_name}_{extend_marine}_{marine_only}_{mode}", polygon)
-            cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
             
             # Aggiungi metadata cache
             cached_result = result.copy()
             cached_result["cache_metadata"] = {
-                "cached_at": asyncio.get_event_loop().time(),
+                "cached_at": time.time(),
                 "zone_name": zone_name,
                 "extend_marine": extend_marine,
                 "mode": mode
             }
             
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cached_result, f, indent=2, ensure_ascii=False)
-                
+            await self.result_cache.set(cache_key, cached_result)
+            
             logger.logger.info(f"Saved cache for zone: {zone_name}")
             
         except Exception as e:
@@ -521,16 +635,79 @@ class SemanticFilterEngine:
         else:
             return pois
 
+# Ricerche in corso per chiave (zona, extend_marine, marine_only, mode, poligono)
+_SEARCH_FLIGHTS = SingleFlight()
+
 # Funzioni utility per uso esterno
 async def perform_semantic_search(zone_name: str, 
                                 polygon: List[List[float]], 
                                 extend_marine: bool = False,
                                 enable_ai: bool = True,
                                 marine_only: bool = False,
-                                mode: str = "standard") -> Dict:
-    """Esegue ricerca semantica completa"""
+                                mode: str = "standard",
+                                on_event: Optional[Callable[[Dict], Awaitable[Any]]] = None,
+                                time_budget_ms: Optional[float] = None) -> Dict:
+    """Esegue ricerca semantica completa
+    
+    Ricerche identiche già in corso (stessa chiave della cache) vengono unite:
+    le richieste concorrenti attendono il risultato della prima invece di ripetere
+    le interrogazioni a Overpass, Wikipedia e Nominatim.
+    on_event riceve gli eventi di avanzamento solo se questa chiamata esegue la ricerca.
+    Con time_budget_ms la ricerca viene unita solo a quelle con lo stesso budget.
+    """
+    search_key = generate_cache_key(f"{zone_name}_{extend_marine}_{marine_only}_{mode}", polygon)
+    if time_budget_ms:
+        search_key = f"{search_key}_{time_budget_ms}"
+    
+    async def _search() -> Dict:
+        engine = SemanticPOISearchEngine()
+        return await engine.semantic_search(zone_name, polygon, extend_marine, enable_ai, marine_only, mode,
+                                            on_event=on_event, time_budget_ms=time_budget_ms)
+    
+    return await _SEARCH_FLIGHTS.do(search_key, _search)
+
+def search_coalescing_stats() -> Dict:
+    """Statistiche della coalescenza delle ricerche in corso"""
+    return _SEARCH_FLIGHTS.stats()
+
+async def stream_semantic_search(zone_name: str, 
+                                 polygon: List[List[float]], 
+                                 extend_marine: bool = False,
+                                 enable_ai: bool = True,
+                                 marine_only: bool = False,
+                                 mode: str = "standard",
+                                 time_budget_ms: Optional[float] = None) -> AsyncIterator[Dict]:
+    """Esegue ricerca semantica emettendo gli eventi di ogni fase man mano che terminano
+    
+    Produce eventi "pois" / "municipalities" / "stage" e infine un evento "complete"
+    con il risultato completo (o "error"). Se il consumatore smette di leggere
+    (es. client disconnesso) la ricerca viene cancellata.
+    """
     engine = SemanticPOISearchEngine()
-    return await engine.semantic_search(zone_name, polygon, extend_marine, enable_ai, marine_only, mode)
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def _run():
+        try:
+            result = await engine.semantic_search(zone_name, polygon, extend_marine, enable_ai,
+                                                  marine_only, mode, on_event=events.put,
+                                                  time_budget_ms=time_budget_ms)
+            await events.put({"event": "complete", "result": result})
+        except Exception as e:
+            logger.log_error("Semantic Search Stream", str(e), zone_name)
+            await events.put({"event": "error", "detail": str(e)})
+        finally:
+            await events.put(None)
+    
+    search_task = asyncio.ensure_future(_run())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+    finally:
+        if not search_task.done():
+            search_task.cancel()
 
 def analyze_search_results(search_result: Dict) -> Dict:
     """Analizza i risultati di una ricerca semantica"""
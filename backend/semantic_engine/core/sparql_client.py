@@ -0,0 +1,119 @@
+import os
+import aiohttp
+from typing import List, Dict, Any, Optional, AsyncIterator
+from .utils import SemanticLogger, TTLCache
+from .json_stream import iter_json_array
+from .http_pool import get_http_session
+
+logger = SemanticLogger()
+
+WIKIDATA_SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+DBPEDIA_SPARQL_ENDPOINT = "https://dbpedia.org/sparql"
+
+SPARQL_USER_AGENT = "whatis_semantic_engine/1.0 (SPARQL client)"
+
+# Cache risultati per (endpoint, query normalizzata): condivisa da tutte le istanze del processo
+_RESULT_CACHE = TTLCache(
+    max_entries=int(os.getenv("SPARQL_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("SPARQL_CACHE_TTL_S", "3600"))
+)
+
+class SparqlError(Exception):
+    """Errore HTTP o di formato restituito da un endpoint SPARQL"""
+
+def normalize_query(query: str) -> str:
+    """Normalizza una query SPARQL per la chiave di cache (spazi/indentazione irrilevanti)"""
+    return " ".join(query.split())
+
+class SparqlClient:
+    """Client SPARQL async (Wikidata, DBpedia) al posto di SPARQLWrapper
+
+    - i risultati JSON vengono letti in streaming (binding per binding)
+    - LIMIT max_rows in una sola richiesta, oppure paginazione LIMIT/OFFSET (solo query con ORDER BY)
+    - usa la sessione aiohttp ricevuta o quella del pool HTTP condiviso (keep-alive)
+    - cache per (endpoint, query normalizzata, pagina)
+    """
+
+    def __init__(self, endpoint: str, session: Optional[aiohttp.ClientSession] = None,
+                 timeout: float = 30.0):
+        self.endpoint = endpoint
+        self.session = session
+        self.upstream = "dbpedia" if "dbpedia" in endpoint else "wikidata"
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def select(self, query: str, page_size: Optional[int] = None,
+                     max_rows: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Esegue una SELECT e restituisce tutti i binding"""
+        return [binding async for binding in self.iter_bindings(query, page_size, max_rows)]
+
+    async def iter_bindings(self, query: str, page_size: Optional[int] = None,
+                            max_rows: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Itera i binding di una SELECT
+
+        Con solo max_rows la query (senza LIMIT) è eseguita con LIMIT max_rows in una richiesta.
+        Con page_size è eseguita a pagine LIMIT page_size OFFSET n fino a max_rows o all'ultima
+        pagina incompleta: gli endpoint non garantiscono lo stesso ordine delle righe tra
+        richieste diverse, quindi la query deve avere un ORDER BY deterministico.
+        """
+        if not page_size:
+            async for binding in self._run_page(query if max_rows is None else f"{query}\nLIMIT {max_rows}"):
+                yield binding
+            return
+        if "ORDER BY" not in query.upper():
+            raise ValueError("query SPARQL paginata senza ORDER BY: pagine sovrapposte o mancanti")
+
+        produced = 0
+        offset = 0
+        while max_rows is None or produced < max_rows:
+            limit = page_size if max_rows is None else min(page_size, max_rows - produced)
+            page_rows = 0
+            async for binding in self._run_page(f"{query}\nLIMIT {limit} OFFSET {offset}"):
+                page_rows += 1
+                yield binding
+            produced += page_rows
+            offset += page_rows
+            if page_rows < limit:
+                break
+
+    async def _run_page(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Esegue una singola query, dalla cache se disponibile"""
+        cache_key = (self.endpoint, normalize_query(query))
+        cached = _RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            for binding in cached:
+                yield binding
+            return
+
+        bindings = []
+        async for binding in self._stream_query(query):
+            bindings.append(binding)
+            yield binding
+        # Solo risposte lette fino alla chiusura dell'array (le troncate sollevano SparqlError)
+        _RESULT_CACHE.set(cache_key, bindings)
+
+    async def _stream_query(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        headers = {
+            "Accept": "application/sparql-results+json",
+            "User-Agent": SPARQL_USER_AGENT
+        }
+        data = {"query": query}
+
+        session = self.session or get_http_session(self.upstream)
+        async with session.post(self.endpoint, data=data, headers=headers,
+                                timeout=self.timeout) as response:
+            async for binding in self._read_bindings(response):
+                yield binding
+
+    async def _read_bindings(self, response: aiohttp.ClientResponse) -> AsyncIterator[Dict[str, Any]]:
+        if response.status != 200:
+            detail = (await response.text())[:200]
+            raise SparqlError(f"HTTP {response.status} da {self.endpoint}: {detail}")
+        try:
+            async for binding in iter_json_array(response, "bindings"):
+                yield binding
+        except ValueError as e:
+            raise SparqlError(f"{e} da {self.endpoint}")
+
+def sparql_cache_stats() -> Dict[str, Any]:
+    """Statistiche della cache risultati SPARQL"""
+    return _RESULT_CACHE.stats()
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import threading
+
+class ThreadLocalSQLite:
+    """Database SQLite in WAL con una connessione per thread
+
+    sqlite3 non condivide connessioni tra thread: ogni thread (event loop o worker di
+    asyncio.to_thread) apre alla prima richiesta la propria connessione in autocommit.
+    WAL e synchronous=NORMAL permettono letture concorrenti a più worker uvicorn.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 5.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    def connection(self) -> sqlite3.Connection:
+        """Connessione SQLite del thread corrente"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
@@ -3,11 +3,16 @@ import json
 import hashlib
 import asyncio  # ✅ FIX: Import aggiunto per retry in detect_country_from_polygon
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
 from geopy.distance import geodesic
-from shapely.geometry import Point, Polygon
+import shapely
+from shapely.geometry import Polygon
+import copy
 import math
-import aiohttp
+import time
+from collections import OrderedDict
+import numpy as np
+from contextvars import ContextVar, Token
 
 # Setup logging
 logging.basicConfig(
@@ -21,12 +26,77 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Raggio medio terrestre (m) per l'haversine e lunghezze minime di un grado (m) per la griglia
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT_MIN = 110574.0
+METERS_PER_DEG_LNG_EQUATOR = 111320.0
+# Scarto massimo tra haversine (sfera) e geodetica (ellissoide WGS84): ~0.56%
+HAVERSINE_MARGIN = 0.01
+
+def haversine_m(lat1: np.ndarray, lng1: np.ndarray, lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    """Distanze haversine in metri tra coppie di punti (vettoriale)"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(value, dtype=float)) for value in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def neighbor_pairs(lats: np.ndarray, lngs: np.ndarray, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Coppie di indici (i, j), i < j, che possono distare meno di radius_m
+    
+    I punti sono raggruppati in celle di griglia di lato >= radius_m e confrontati
+    solo con quelli delle 8 celle vicine: nessuna coppia entro il raggio viene persa.
+    """
+    n = len(lats)
+    if n < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    cell_lat = radius_m / METERS_PER_DEG_LAT_MIN
+    max_abs_lat = min(float(np.abs(lats).max()) + cell_lat, 89.99)
+    cell_lng = radius_m / (METERS_PER_DEG_LNG_EQUATOR * math.cos(math.radians(max_abs_lat)))
+    
+    rows = np.floor(lats / cell_lat).astype(np.int64)
+    cols = np.floor(lngs / cell_lng).astype(np.int64)
+    rows -= rows.min() - 1
+    cols -= cols.min() - 1
+    width = int(cols.max()) + 2
+    keys = rows * width + cols
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    
+    firsts, seconds = [], []
+    for d_row in (-1, 0, 1):
+        for d_col in (-1, 0, 1):
+            # Ricerca sulle chiavi già ordinate (molto più veloce di searchsorted su input sparso)
+            target = sorted_keys + d_row * width + d_col
+            low = np.searchsorted(sorted_keys, target, side="left")
+            counts = np.searchsorted(sorted_keys, target, side="right") - low
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            first = np.repeat(order, counts)
+            second = order[np.repeat(low - offsets, counts) + np.arange(total)]
+            keep = first < second
+            firsts.append(first[keep])
+            seconds.append(second[keep])
+    if not firsts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
 class POIDeduplicator:
-    """Gestisce la deduplicazione dei POI basata su distanza geografica e similarità del nome"""
+    """Gestisce la deduplicazione dei POI basata su distanza geografica e similarità del nome
+    
+    I POI sono indicizzati su una griglia: le distanze (haversine in NumPy) sono calcolate
+    solo tra celle vicine e la geodetica solo per le coppie a ridosso delle soglie, così il
+    risultato coincide con il confronto geodetico di ogni POI con tutti i precedenti.
+    """
     
     def __init__(self, distance_threshold=50):  # metri
         self.distance_threshold = distance_threshold
     
+    @property
+    def distance_thresholds(self) -> Tuple[float, ...]:
+        """Soglie di distanza (m) usate da is_match: vicino a queste si usa la distanza geodetica"""
+        return (float(self.distance_threshold),)
+    
     def calculate_distance(self, poi1: Dict, poi2: Dict) -> float:
         """Calcola la distanza in metri tra due POI"""
         point1 = (poi1['lat'], poi1['lng'])
@@ -56,38 +126,98 @@ class POIDeduplicator:
         
         return len(intersection) / len(union)
     
+    def is_match(self, poi1: Dict, poi2: Dict, distance: float) -> bool:
+        """Se sono vicini (distanza in metri) e hanno nomi simili, è un duplicato"""
+        return (distance < self.distance_threshold and
+                self.name_similarity(poi1.get('name') or '', poi2.get('name') or '') > 0.6)
+    
+    def find_duplicate(self, poi: Dict, candidates: List[Dict]) -> Optional[int]:
+        """Restituisce l'indice del primo POI in candidates che duplica poi (None se nessuno)"""
+        for index, existing_poi in enumerate(candidates):
+            if self.is_match(poi, existing_poi, self.calculate_distance(poi, existing_poi)):
+                return index
+        
+        return None
+    
+    def _duplicate_links(self, pois: List[Dict]) -> Dict[int, List[int]]:
+        """Per ogni POI j, gli indici i < j dei POI che duplica (relazione simmetrica)"""
+        lats = np.array([float(poi['lat']) for poi in pois])
+        lngs = np.array([float(poi['lng']) for poi in pois])
+        thresholds = self.distance_thresholds
+        radius = max(thresholds) * (1 + HAVERSINE_MARGIN)
+        
+        firsts, seconds = neighbor_pairs(lats, lngs, radius)
+        distances = haversine_m(lats[firsts], lngs[firsts], lats[seconds], lngs[seconds])
+        near = distances < radius
+        firsts, seconds, distances = firsts[near], seconds[near], distances[near]
+        
+        # Vicino a una soglia l'haversine non basta: distanza geodetica esatta
+        borderline = np.zeros(len(distances), dtype=bool)
+        for threshold in thresholds:
+            borderline |= np.abs(distances - threshold) <= threshold * HAVERSINE_MARGIN
+        
+        links: Dict[int, List[int]] = {}
+        for first, second, distance, exact in zip(firsts.tolist(), seconds.tolist(),
+                                                   distances.tolist(), borderline.tolist()):
+            if exact:
+                distance = self.calculate_distance(pois[first], pois[second])
+            if self.is_match(pois[second], pois[first], distance):
+                links.setdefault(second, []).append(first)
+        return links
+    
     def deduplicate(self, pois: List[Dict]) -> List[Dict]:
         """Deduplica lista di POI"""
         if not pois:
             return []
         
+        links = self._duplicate_links(pois)
         unique_pois = []
+        slot_of: Dict[int, int] = {}  # indice POI in input -> posizione in unique_pois
+        holders: List[int] = []       # posizione in unique_pois -> indice POI in input
         
-        for poi in pois:
-            is_duplicate = False
-            
-            for existing_poi in unique_pois:
-                distance = self.calculate_distance(poi, existing_poi)
-                similarity = self.name_similarity(poi['name'], existing_poi['name'])
-                
-                # Se sono vicini e hanno nomi simili, è un duplicato
-                if distance < self.distance_threshold and similarity > 0.6:
-                    is_duplicate = True
-                    
-                    # Mantieni quello con più informazioni o dalla fonte migliore
-                    if self._is_better_poi(poi, existing_poi):
-                        # Sostituisci il POI esistente
-                        index = unique_pois.index(existing_poi)
-                        unique_pois[index] = poi
-                    
-                    break
+        for index, poi in enumerate(pois):
+            # Primo POI unico (in ordine di posizione) che questo POI duplica
+            slots = [slot_of[other] for other in links.get(index, ()) if other in slot_of]
             
-            if not is_duplicate:
+            if not slots:
+                slot_of[index] = len(unique_pois)
+                holders.append(index)
                 unique_pois.append(poi)
+                continue
+            
+            slot = min(slots)
+            if self._is_better_poi(poi, unique_pois[slot]):
+                # Mantieni quello con più informazioni o dalla fonte migliore
+                del slot_of[holders[slot]]
+                slot_of[index] = slot
+                holders[slot] = index
+                unique_pois[slot] = poi
         
         logger.info(f"Deduplicated {len(pois)} POIs to {len(unique_pois)}")
         return unique_pois
     
+    def filter_new(self, pois: List[Dict], seen: List[Dict]) -> List[Dict]:
+        """Restituisce i POI che non duplicano nessuno di quelli già visti (né tra loro)
+        
+        I POI restituiti vengono aggiunti a seen: usato per emettere batch incrementali
+        in streaming senza inviare due volte lo stesso POI.
+        """
+        if not pois:
+            return []
+        
+        offset = len(seen)
+        links = self._duplicate_links(list(seen) + list(pois))
+        accepted = set(range(offset))
+        fresh = []
+        
+        for index, poi in enumerate(pois, start=offset):
+            if not any(other in accepted for other in links.get(index, ())):
+                accepted.add(index)
+                seen.append(poi)
+                fresh.append(poi)
+        
+        return fresh
+    
     def _is_better_poi(self, poi1: Dict, poi2: Dict) -> bool:
         """Determina quale POI è migliore"""
         # Priorità delle fonti
@@ -125,33 +255,51 @@ class GeoBoundingBox:
     def extend_marine(bbox: Tuple[float, float, float, float], 
                      polygon: List[List[float]], 
                      extension_km: float = 5.0) -> Tuple[float, float, float, float]:
-        """Estende il bounding box verso il mare se la zona tocca la costa"""
+        """Estende il bounding box verso il mare se la zona tocca la costa
+        
+        Solo i lati del bbox rivolti verso il mare vengono estesi (indice della costa);
+        senza indice per la zona si usa il rilevamento semplificato del Mar Ligure (sud/ovest).
+        """
         south, west, north, east = bbox
         
-        # Controlla se la zona tocca potenzialmente il mare
-        # (per il Mar Ligure, se tocca sud/ovest)
-        if GeoBoundingBox._touches_sea(polygon):
-            # Estendi verso il mare (circa 5km)
+        sea_sides = GeoBoundingBox._sea_sides(polygon)
+        if sea_sides:
+            # Estendi verso il mare (circa extension_km)
             km_to_deg_lat = 1 / 111.0  # 1 grado lat ≈ 111 km
             km_to_deg_lng = 1 / (111.0 * math.cos(math.radians((north + south) / 2)))
             
             extension_lat = extension_km * km_to_deg_lat
             extension_lng = extension_km * km_to_deg_lng
             
-            # Estendi il bounding box
+            # Estendi il bounding box solo dai lati del mare
             return (
-                south - extension_lat,  # più a sud
-                west - extension_lng,   # più a ovest  
-                north,
-                east
+                south - extension_lat if "south" in sea_sides else south,
+                west - extension_lng if "west" in sea_sides else west,
+                north + extension_lat if "north" in sea_sides else north,
+                east + extension_lng if "east" in sea_sides else east
             )
         
         return bbox
     
+    @staticmethod
+    def _sea_sides(polygon: List[List[float]]) -> set:
+        """Lati del bbox ("north", "south", "east", "west") verso cui si trova il mare"""
+        from .coastline import get_coastline_index  # import locale: coastline dipende da utils
+        index = get_coastline_index()
+        if index.covers(polygon):
+            return index.sea_sides(polygon)
+        # Fallback senza indice della costa: Mar Ligure a sud/ovest
+        return {"south", "west"} if GeoBoundingBox._touches_sea(polygon) else set()
+    
     @staticmethod
     def _touches_sea(polygon: List[List[float]]) -> bool:
-        """Determina se il poligono tocca il mare (semplificato per Mar Ligure)"""
-        # Per ora, controllo semplice: se qualche punto è vicino alla costa ligure
+        """Determina se il poligono tocca il mare (indice della costa, o semplificato per Mar Ligure)"""
+        from .coastline import get_coastline_index  # import locale: coastline dipende da utils
+        index = get_coastline_index()
+        if index.covers(polygon):
+            return index.is_near_coast(polygon)
+        
+        # Senza indice della costa: controllo semplice, se qualche punto è vicino alla costa ligure
         for point in polygon:
             lat, lng = point[0], point[1]
             # Zona approssimativa Mar Ligure
@@ -258,12 +406,90 @@ class SemanticLogger:
         if self._should_log(f"municipality_discovery_{zone_name}"):
             self.logger.info(f"MUNICIPALITY DISCOVERY - Zone: {zone_name}, Found: {municipalities}")
 
+class ZoneGeometry:
+    """Poligono di una zona preparato per i test punto-in-poligono ripetuti
+    
+    Costruito una volta per richiesta (vedi set_zone_geometry / zone_geometry):
+    bbox per lo scarto rapido, poligono shapely preparato e test vettoriale
+    su array di coordinate con shapely.contains_xy.
+    """
+    
+    def __init__(self, polygon: List[List[float]]):
+        self.polygon = polygon
+        self.shape = Polygon([(p[1], p[0]) for p in polygon])  # lng, lat
+        shapely.prepare(self.shape)
+        self.bbox = GeoBoundingBox.from_polygon(polygon)
+    
+    @classmethod
+    def empty(cls, polygon: List[List[float]]) -> "ZoneGeometry":
+        """Geometria di un poligono non valido: nessun punto è dentro la zona"""
+        geometry = cls.__new__(cls)
+        geometry.polygon = polygon
+        geometry.shape = Polygon()
+        geometry.bbox = (math.inf, math.inf, -math.inf, -math.inf)  # scarta ogni punto
+        return geometry
+    
+    def matches(self, polygon: List[List[float]]) -> bool:
+        """True se la geometria è stata costruita da questo poligono"""
+        return polygon is self.polygon or polygon == self.polygon
+    
+    def contains(self, lat: float, lng: float) -> bool:
+        south, west, north, east = self.bbox
+        if not (south <= lat <= north and west <= lng <= east):
+            return False
+        return bool(shapely.contains_xy(self.shape, lng, lat))
+    
+    def contains_many(self, lats, lngs) -> np.ndarray:
+        """Maschera booleana dei punti dentro la zona (coordinate mancanti -> False)"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        south, west, north, east = self.bbox
+        inside = (lats >= south) & (lats <= north) & (lngs >= west) & (lngs <= east)
+        if inside.any():
+            inside[inside] = shapely.contains_xy(self.shape, lngs[inside], lats[inside])
+        return inside
+    
+    def filter_pois(self, pois: List[Dict], lat_key: str = "lat", lng_key: str = "lng") -> List[Dict]:
+        """POI dentro la zona, nell'ordine originale (un solo test vettoriale)"""
+        if not pois:
+            return []
+        inside = self.contains_many([poi.get(lat_key) for poi in pois], [poi.get(lng_key) for poi in pois])
+        return [poi for poi, keep in zip(pois, inside) if keep]
+
+# Geometria della zona della richiesta in corso: ereditata dai task figli (come il deadline)
+_current_zone: ContextVar[Optional[ZoneGeometry]] = ContextVar("zone_geometry", default=None)
+
+def set_zone_geometry(polygon: List[List[float]]) -> Token:
+    """Prepara la geometria della zona per il contesto corrente; restituisce il token per il reset"""
+    try:
+        geometry = ZoneGeometry(polygon)
+    except Exception as e:
+        # Poligono non valido: geometria vuota, i test punto-in-poligono restituiscono False
+        logger.warning(f"Zone geometry not prepared: {e}")
+        geometry = ZoneGeometry.empty(polygon)
+    return _current_zone.set(geometry)
+
+def reset_zone_geometry(token: Token):
+    _current_zone.reset(token)
+
+def zone_geometry(polygon: List[List[float]]) -> ZoneGeometry:
+    """Geometria preparata del poligono: quella della richiesta in corso se coincide, altrimenti nuova
+    
+    Un poligono non valido (es. degenere) dà una geometria vuota, come in set_zone_geometry.
+    """
+    current = _current_zone.get()
+    if current is not None and current.matches(polygon):
+        return current
+    try:
+        return ZoneGeometry(polygon)
+    except Exception as e:
+        logger.warning(f"Zone geometry not prepared: {e}")
+        return ZoneGeometry.empty(polygon)
+
 def point_in_polygon(point: Tuple[float, float], polygon: List[List[float]]) -> bool:
     """Controlla se un punto è dentro un poligono"""
     try:
-        shapely_point = Point(point[1], point[0])  # lng, lat for Shapely
-        shapely_polygon = Polygon([(p[1], p[0]) for p in polygon])  # lng, lat
-        return shapely_polygon.contains(shapely_point)
+        return zone_geometry(polygon).contains(point[0], point[1])
     except Exception as e:
         logger.error(f"Error in point_in_polygon: {e}")
         return False
@@ -278,40 +504,42 @@ def is_in_zone(lat: float, lng: float, polygon: List[List[float]]) -> bool:
 async def is_in_water(lat: float, lng: float) -> bool:
     """✅ FIX MarineDeep: Verifica se un punto è effettivamente nel mare usando reverse geocoding
     Restituisce True se il punto è nel mare, False se è su terraferma
+    Per più punti usare land_water.classify_water (classificazione in blocco)
     """
     try:
+        # Maschera terra/mare offline (poligoni di terraferma), se disponibile per il punto
+        from .land_water import get_land_water_mask  # import locale: dipende da utils
+        mask = get_land_water_mask()
+        if mask.covers_batch([lat], [lng])[0]:
+            return bool(mask.is_in_water_batch([lat], [lng])[0])
+        
         # Usa Nominatim reverse geocoding per verificare se è nel mare
-        url = f"https://nominatim.openstreetmap.org/reverse?format=jsonv2&lat={lat}&lon={lng}&zoom=10&addressdetails=1"
-        headers = {
-            "User-Agent": "whatis-backend-semantic/1.0 (marine-validation)"
-        }
+        # (client condiviso: rate limit di processo e cache su griglia)
+        from .nominatim_client import get_nominatim_client, NominatimError  # import locale: dipende da utils
+        try:
+            data = await get_nominatim_client().reverse(lat, lng, zoom=10)
+        except NominatimError:
+            # Se fallisce, assume che sia nel mare (non blocca)
+            return True
+        
+        addr = (data or {}).get("address", {})
+        
+        # ✅ FIX MarineDeep: Verifica se è su terraferma
+        place_type = addr.get("place_type", "").lower()
+        place_class = addr.get("class", "").lower()
+        
+        # Escludi se è chiaramente su terraferma
+        land_indicators = [
+            "city", "town", "village", "hamlet", "suburb", "neighbourhood",
+            "road", "building", "house", "farm", "residential"
+        ]
+        
+        if place_type in land_indicators or place_class in land_indicators:
+            return False
+        
+        # Se non ha indicatori di terraferma, assume che sia nel mare
+        return True
         
-        timeout = aiohttp.ClientTimeout(total=3)
-        async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    # Se fallisce, assume che sia nel mare (non blocca)
-                    return True
-                
-                data = await resp.json()
-                addr = (data or {}).get("address", {})
-                
-                # ✅ FIX MarineDeep: Verifica se è su terraferma
-                place_type = addr.get("place_type", "").lower()
-                place_class = addr.get("class", "").lower()
-                
-                # Escludi se è chiaramente su terraferma
-                land_indicators = [
-                    "city", "town", "village", "hamlet", "suburb", "neighbourhood",
-                    "road", "building", "house", "farm", "residential"
-                ]
-                
-                if place_type in land_indicators or place_class in land_indicators:
-                    return False
-                
-                # Se non ha indicatori di terraferma, assume che sia nel mare
-                return True
-                
     except Exception as e:
         # Se fallisce, assume che sia nel mare (non blocca la ricerca)
         logger.warning(f"[POI-MARINE] ⚠️ Water validation failed for ({lat}, {lng}): {e} - assuming water")
@@ -323,6 +551,183 @@ def generate_cache_key(zone_name: str, polygon: List) -> str:
     content = f"{zone_name}_{polygon_str}"
     return hashlib.md5(content.encode()).hexdigest()
 
+class TTLCache:
+    """Cache in memoria LRU con scadenza (TTL) e contatori hit/miss"""
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Any) -> Optional[Any]:
+        """Restituisce il valore se presente e non scaduto (None altrimenti)"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, key: Any, value: Any, ttl_seconds: Optional[float] = None):
+        """Memorizza un valore (evince i meno usati oltre max_entries)"""
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def delete(self, key: Any):
+        self._entries.pop(key, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+class SingleFlight:
+    """Coalescenza delle chiamate identiche in corso (request coalescing)
+    
+    La prima chiamata per una chiave (leader) esegue il lavoro; le chiamate con la
+    stessa chiave che arrivano mentre è in corso (follower) attendono lo stesso
+    risultato invece di ripetere le richieste agli upstream.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[Any, "asyncio.Future"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+    
+    async def do(self, key: Any, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Esegue factory() una sola volta per le chiamate concorrenti con la stessa chiave
+        
+        I follower ricevono una copia profonda del risultato (o la stessa eccezione).
+        La cancellazione di un chiamante non interrompe il lavoro condiviso.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            result = await asyncio.shield(task)
+            return copy.deepcopy(result)
+        
+        self.leaders += 1
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
+
+# ================================
+# ⏱️ DEADLINE (budget di tempo della richiesta)
+# ================================
+
+class SearchDeadline:
+    """Budget di tempo di una richiesta, condiviso da tutte le fasi della pipeline"""
+    
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000.0
+        self.truncated_stages: List[str] = []
+    
+    def remaining(self) -> float:
+        """Secondi rimasti (0 se scaduto)"""
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def mark_truncated(self, stage: str):
+        """Registra una fase saltata o interrotta per mancanza di tempo"""
+        if stage not in self.truncated_stages:
+            self.truncated_stages.append(stage)
+            logger.warning(f"⏱️ Deadline: fase '{stage}' troncata ({self.budget_ms:.0f}ms di budget)")
+
+# Deadline della richiesta in corso: ereditato dai task figli (asyncio copia il contesto)
+_current_deadline: ContextVar[Optional[SearchDeadline]] = ContextVar("search_deadline", default=None)
+
+def set_deadline(budget_ms: Optional[float]) -> Token:
+    """Attiva un deadline per il contesto corrente (None = nessun limite); restituisce il token per il reset"""
+    return _current_deadline.set(SearchDeadline(budget_ms) if budget_ms else None)
+
+def reset_deadline(token: Token):
+    _current_deadline.reset(token)
+
+def current_deadline() -> Optional[SearchDeadline]:
+    return _current_deadline.get()
+
+def deadline_timeout(default: float) -> float:
+    """Timeout per un'operazione: il minore tra default e il tempo rimasto della richiesta"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    return min(default, deadline.remaining())
+
+def deadline_expired() -> bool:
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired
+
+def mark_truncated(stage: str):
+    """Segna una fase come troncata (no-op senza deadline)"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.mark_truncated(stage)
+
+# Fasi con una fonte fallita (errore HTTP, timeout della fonte) della ricerca in corso:
+# le fonti restituiscono una lista vuota e registrano qui l'errore (lista condivisa dai task figli)
+_current_failures: ContextVar[Optional[List[str]]] = ContextVar("search_failures", default=None)
+
+def set_failure_tracker() -> Token:
+    """Attiva la raccolta delle fasi fallite per il contesto corrente; restituisce il token per il reset"""
+    return _current_failures.set([])
+
+def reset_failure_tracker(token: Token):
+    _current_failures.reset(token)
+
+def mark_failed(stage: str):
+    """Segna una fase come fallita (no-op fuori da una ricerca)"""
+    failures = _current_failures.get()
+    if failures is not None and stage not in failures:
+        failures.append(stage)
+
+def failed_stages() -> List[str]:
+    return list(_current_failures.get() or [])
+
+async def run_within_deadline(stage: str, awaitable: Awaitable[Any], default: Any) -> Any:
+    """Esegue una fase entro il tempo rimasto della richiesta
+    
+    Se il tempo è già scaduto la fase non parte, se scade durante l'esecuzione
+    viene cancellata: in entrambi i casi è segnata come troncata e si restituisce default.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return await awaitable
+    if deadline.expired:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        elif asyncio.isfuture(awaitable):
+            awaitable.cancel()
+        deadline.mark_truncated(stage)
+        return default
+    try:
+        return await asyncio.wait_for(awaitable, timeout=deadline.remaining())
+    except asyncio.TimeoutError:
+        deadline.mark_truncated(stage)
+        return default
+
 # ================================
 # 🌍 GEO HELPERS (Country detection)
 # ================================
@@ -339,36 +744,25 @@ async def detect_country_from_polygon(polygon: List[List[float]]) -> Tuple[str,
         # Compute centroid (simple average; sufficient for small zones)
         lat = sum(p[0] for p in polygon) / len(polygon)
         lng = sum(p[1] for p in polygon) / len(polygon)
-        url = f"https://nominatim.openstreetmap.org/reverse?format=jsonv2&lat={lat}&lon={lng}&zoom=3&addressdetails=1"
-        headers = {
-            "User-Agent": "whatis-backend-semantic/1.0 (country-detect)"
-        }
+        from .nominatim_client import get_nominatim_client, NominatimError  # import locale: dipende da utils
         
-        # ✅ FIX MarineUniversal: Timeout aumentato a 3s con retry robusto
+        # ✅ FIX MarineUniversal: Retry robusto (client condiviso: rate limit e cache su griglia)
         max_retries = 2
         retry_delay = 1.0
         
         for attempt in range(max_retries):
             try:
-                timeout = aiohttp.ClientTimeout(total=3)  # ✅ FIX MarineUniversal: 3s timeout
-                async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                    async with session.get(url) as resp:
-                        if resp.status != 200:
-                            if attempt < max_retries - 1:
-                                await asyncio.sleep(retry_delay)
-                                continue
-                            return None, None  # ✅ FIX MarineUniversal: Fallback a None (non hardcoded IT)
-                        data = await resp.json()
-                        addr = (data or {}).get("address", {})
-                        code = (addr.get("country_code") or "").upper()
-                        name = addr.get("country") or ""
-                        
-                        # ✅ FIX MarineUniversal: Se codice vuoto, fallback a None (non hardcoded IT)
-                        if not code:
-                            return None, None
-                        
-                        return code, name
-            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                data = await get_nominatim_client().reverse(lat, lng, zoom=3)
+                addr = (data or {}).get("address", {})
+                code = (addr.get("country_code") or "").upper()
+                name = addr.get("country") or ""
+                
+                # ✅ FIX MarineUniversal: Se codice vuoto, fallback a None (non hardcoded IT)
+                if not code:
+                    return None, None
+                
+                return code, name
+            except NominatimError as e:
                 if attempt < max_retries - 1:
                     await asyncio.sleep(retry_delay)
                     continue
@@ -13,8 +13,9 @@ import json
 
 from bs4 import BeautifulSoup
 
-from .utils import SemanticLogger, point_in_polygon
+from .utils import SemanticLogger, zone_geometry
 from .semantic_gpt_filter import get_gpt_filter
+from .http_pool import get_http_session
 
 logger = SemanticLogger()
 
@@ -91,13 +92,13 @@ async def fetch_and_parse_url(url: str) -> str:
         timeout = ClientTimeout(total=FETCH_TIMEOUT_SECONDS)
         headers = {"User-Agent": USER_AGENT}
 
-        async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-            async with session.get(url, allow_redirects=True) as response:
-                if response.status != 200:
-                    logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Errore fetch URL {url} - status {response.status}")
-                    return ""
+        session = get_http_session("web")
+        async with session.get(url, allow_redirects=True, timeout=timeout, headers=headers) as response:
+            if response.status != 200:
+                logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Errore fetch URL {url} - status {response.status}")
+                return ""
 
-                html = await response.text(errors="ignore")
+            html = await response.text(errors="ignore")
 
         soup = BeautifulSoup(html, "html.parser")
         for tag in soup(["script", "style", "nav", "footer", "header", "aside", "form", "noscript"]):
@@ -216,6 +217,7 @@ async def enhanced_web_search(diving_urls: List[str],
         return []
 
     aggregated_pois: List[Dict] = []
+    candidate_pois: List[Dict] = []
     seen_names = set()
 
     logger.logger.info("🌊 [POI-MARINE] Enhanced mode attivo — analisi completa contenuti diving center")
@@ -235,10 +237,6 @@ async def enhanced_web_search(diving_urls: List[str],
                 if not name:
                     continue
 
-                name_key = name.lower()
-                if name_key in seen_names:
-                    continue
-
                 # Conversione sicura confidence
                 try:
                     confidence_raw = candidate.get("confidence", 0)
@@ -264,10 +262,6 @@ async def enhanced_web_search(diving_urls: List[str],
                     logger.logger.warning(f"[MARINE-GPT] ⚠️ Coordinate mancanti per POI '{name}' - scarto")
                     continue
 
-                if not point_in_polygon((lat, lng), polygon):
-                    logger.logger.warning(f"[MARINE-GPT] ⚠️ POI fuori poligono '{name}' - scarto")
-                    continue
-
                 description = candidate.get("description") or ""
                 description = description.strip()[:600]
 
@@ -293,14 +287,25 @@ async def enhanced_web_search(diving_urls: List[str],
                 if depth:
                     poi["depth"] = depth
 
-                aggregated_pois.append(poi)
-                seen_names.add(name_key)
-                logger.logger.info(f"[MARINE-GPT] ✅ POI enhanced aggiunto: {name} (confidence: {confidence})")
+                candidate_pois.append(poi)
 
         except Exception as e:
             logger.logger.error(f"[POI-MARINE-WEB] ❌ Errore enhanced web search per {url}: {str(e)}")
             continue
 
+    # Verifica zona: un solo test vettoriale per tutti i POI trovati, poi deduplica per nome
+    in_zone_pois = zone_geometry(polygon).filter_pois(candidate_pois)
+    if len(in_zone_pois) < len(candidate_pois):
+        logger.logger.warning(f"[MARINE-GPT] ⚠️ {len(candidate_pois) - len(in_zone_pois)} POI fuori poligono - scartati")
+
+    for poi in in_zone_pois:
+        name_key = poi["name"].lower()
+        if name_key in seen_names:
+            continue
+        aggregated_pois.append(poi)
+        seen_names.add(name_key)
+        logger.logger.info(f"[MARINE-GPT] ✅ POI enhanced aggiunto: {poi['name']} (confidence: {poi['confidence']})")
+
     if aggregated_pois:
         summary = ", ".join(
             [
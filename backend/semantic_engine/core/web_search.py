@@ -10,7 +10,8 @@ from typing import List, Dict, Optional, Tuple
 from urllib.parse import quote, urlparse
 from collections import defaultdict
 from bs4 import BeautifulSoup
-from .utils import SemanticLogger, point_in_polygon
+from .utils import SemanticLogger, zone_geometry, deadline_expired, mark_truncated
+from .http_pool import get_http_session
 
 logger = SemanticLogger()
 
@@ -845,6 +846,10 @@ class MarineWebSearcher:
             
             # ✅ FIX MarineWeb: Cerca su DuckDuckGo (o altri motori di ricerca)
             for i, term in enumerate(search_terms, 1):
+                if deadline_expired():
+                    # Tempo della richiesta esaurito: restituisci i POI trovati finora
+                    mark_truncated("marine")
+                    break
                 try:
                     logger.logger.info(f"[POI-MARINE-WEB] 🔍 Ricerca web {i}/{len(search_terms)}: '{term}'")
                     
@@ -897,7 +902,11 @@ class MarineWebSearcher:
                     continue
         
         logger.logger.info(f"[POI-MARINE-WEB] ✅ Ricerca web completata: {len(marine_pois)} POI trovati (prima del filtro)")
-        filtered_pois = self._evaluate_marine_pois(marine_pois)
+        # ✅ Verifica zona: un solo test vettoriale per tutti i POI web della zona
+        in_zone_pois = zone_geometry(polygon).filter_pois(marine_pois)
+        if len(in_zone_pois) < len(marine_pois):
+            logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ {len(marine_pois) - len(in_zone_pois)} POI fuori zona - ESCLUSI")
+        filtered_pois = self._evaluate_marine_pois(in_zone_pois)
         logger.logger.info(f"[POI-MARINE-WEB] ✅ POI validi dopo verifica congruità: {len(filtered_pois)}")
         self._finalize_source_logging()
         
@@ -930,66 +939,66 @@ class MarineWebSearcher:
             # Fallback: DuckDuckGo HTML scraping (migliorato)
             url = f"https://html.duckduckgo.com/html/?q={quote(query)}"
             
-            async with aiohttp.ClientSession(timeout=self.timeout, headers=self.headers) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        html = await response.text()
-                        soup = BeautifulSoup(html, 'html.parser')
+            session = get_http_session("web")
+            async with session.get(url, headers=self.headers, timeout=self.timeout) as response:
+                if response.status == 200:
+                    html = await response.text()
+                    soup = BeautifulSoup(html, 'html.parser')
+                    
+                    # ✅ FIX MarineWeb: Estrai risultati dalla pagina HTML (metodi multipli)
+                    # Metodo 1: Cerca classi standard
+                    result_links = soup.find_all('a', class_='result__a', limit=max_results)
+                    if not result_links:
+                        # Metodo 2: Cerca per href pattern
+                        result_links = soup.find_all('a', href=lambda x: x and ('uddg=' in x or '/l/?kh=' in x), limit=max_results)
+                    if not result_links:
+                        # Metodo 3: Cerca tutti i link con risultati
+                        result_links = soup.find_all('a', limit=max_results * 2)
+                    
+                    for link in result_links[:max_results]:
+                        href = link.get('href', '')
+                        title = link.get_text(strip=True)
                         
-                        # ✅ FIX MarineWeb: Estrai risultati dalla pagina HTML (metodi multipli)
-                        # Metodo 1: Cerca classi standard
-                        result_links = soup.find_all('a', class_='result__a', limit=max_results)
-                        if not result_links:
-                            # Metodo 2: Cerca per href pattern
-                            result_links = soup.find_all('a', href=lambda x: x and ('uddg=' in x or '/l/?kh=' in x), limit=max_results)
-                        if not result_links:
-                            # Metodo 3: Cerca tutti i link con risultati
-                            result_links = soup.find_all('a', limit=max_results * 2)
+                        # Skip se non è un risultato valido
+                        if not title or len(title) < 5:
+                            continue
                         
-                        for link in result_links[:max_results]:
-                            href = link.get('href', '')
-                            title = link.get_text(strip=True)
-                            
-                            # Skip se non è un risultato valido
-                            if not title or len(title) < 5:
-                                continue
-                            
-                            # Estrai snippet (descrizione) - cerca in vari modi
-                            snippet = ""
-                            snippet_elem = link.find_next('a', class_='result__snippet')
-                            if not snippet_elem:
-                                snippet_elem = link.find_next('div', class_='result__snippet')
-                            if not snippet_elem:
-                                snippet_elem = link.find_next('span', class_='result__snippet')
-                            if snippet_elem:
-                                snippet = snippet_elem.get_text(strip=True)
-                            
-                            if href and title:
-                                # Decodifica URL DuckDuckGo
-                                if href.startswith('/l/?kh=') or 'uddg=' in href:
-                                    # Estrai URL reale
-                                    import urllib.parse
-                                    if 'uddg=' in href:
-                                        parts = href.split('uddg=')
-                                        if len(parts) > 1:
-                                            real_url = urllib.parse.unquote(parts[1].split('&')[0])
-                                            if real_url.startswith('http'):
-                                                results.append((real_url, title, snippet))
-                                    else:
-                                        # Prova a decodificare direttamente
-                                        try:
-                                            decoded = urllib.parse.unquote(href)
-                                            if decoded.startswith('http'):
-                                                results.append((decoded, title, snippet))
-                                        except:
-                                            pass
-                                elif href.startswith('http'):
-                                    results.append((href, title, snippet))
+                        # Estrai snippet (descrizione) - cerca in vari modi
+                        snippet = ""
+                        snippet_elem = link.find_next('a', class_='result__snippet')
+                        if not snippet_elem:
+                            snippet_elem = link.find_next('div', class_='result__snippet')
+                        if not snippet_elem:
+                            snippet_elem = link.find_next('span', class_='result__snippet')
+                        if snippet_elem:
+                            snippet = snippet_elem.get_text(strip=True)
                         
-                        if results:
-                            logger.logger.info(f"[POI-MARINE-WEB] ✅ Fallback HTML: trovati {len(results)} risultati")
-                        else:
-                            logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Fallback HTML: nessun risultato trovato per '{query}'")
+                        if href and title:
+                            # Decodifica URL DuckDuckGo
+                            if href.startswith('/l/?kh=') or 'uddg=' in href:
+                                # Estrai URL reale
+                                import urllib.parse
+                                if 'uddg=' in href:
+                                    parts = href.split('uddg=')
+                                    if len(parts) > 1:
+                                        real_url = urllib.parse.unquote(parts[1].split('&')[0])
+                                        if real_url.startswith('http'):
+                                            results.append((real_url, title, snippet))
+                                else:
+                                    # Prova a decodificare direttamente
+                                    try:
+                                        decoded = urllib.parse.unquote(href)
+                                        if decoded.startswith('http'):
+                                            results.append((decoded, title, snippet))
+                                    except:
+                                        pass
+                            elif href.startswith('http'):
+                                results.append((href, title, snippet))
+                    
+                    if results:
+                        logger.logger.info(f"[POI-MARINE-WEB] ✅ Fallback HTML: trovati {len(results)} risultati")
+                    else:
+                        logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Fallback HTML: nessun risultato trovato per '{query}'")
         
         except Exception as e:
             logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Errore ricerca DuckDuckGo: {str(e)}")
@@ -1104,6 +1113,7 @@ class MarineWebSearcher:
                 
                 # ✅ FIX MarineDivingCenter: Per ogni relitto trovato, estrai informazioni dal contenuto e rielabora con AI
                 pois_list = []
+                wreck_candidates = []
                 for wreck_name in wreck_names:
                     # ✅ FIX MarineGPTFilter: Filtro GPT opzionale per nome relitto (se abilitato)
                     try:
@@ -1116,14 +1126,14 @@ class MarineWebSearcher:
                                 # ✅ FIX MarineGPTFilter: Analizza contesto con GPT (livello 2 - estrazione dettagliata)
                                 gpt_result = await gpt_filter.gpt_extractor_level2(wreck_context)
                                 if gpt_result:
-                                    pois_list = gpt_result.get("pois", [])
+                                    gpt_pois = gpt_result.get("pois", [])
                                     
-                                    if not pois_list or len(pois_list) == 0:
+                                    if not gpt_pois or len(gpt_pois) == 0:
                                         logger.logger.info(f"[MARINE-GPT] ❌ Relitto '{wreck_name}' scartato da GPT: nessun POI marino trovato")
                                         continue
                                     
                                     # ✅ FIX MarineGPTFilter: Usa il primo POI valido estratto da GPT
-                                    first_poi = pois_list[0]
+                                    first_poi = gpt_pois[0]
                                     extracted_name = first_poi.get("name", "").strip()
                                     poi_type = first_poi.get("type", "wreck")
                                     # ✅ FIX ConfidenceConversion: Conversione sicura a float per evitare errori di tipo
@@ -1156,11 +1166,14 @@ class MarineWebSearcher:
                         logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Coordinate mancanti per '{wreck_name}' - POI incompleto, scarto")
                         continue
                     
-                    lat, lng = coordinates
-                    
-                    # ✅ FIX MarineWreckFinder: Verifica che sia dentro la zona
-                    from .utils import point_in_polygon
-                    if not point_in_polygon((lat, lng), polygon):
+                    wreck_candidates.append((wreck_name, coordinates, description))
+                
+                # ✅ FIX MarineWreckFinder: Verifica che siano dentro la zona (un solo test vettoriale per pagina,
+                # prima della rielaborazione AI)
+                in_zone_flags = zone_geometry(polygon).contains_many([lat for _, (lat, _), _ in wreck_candidates],
+                                                                     [lng for _, (_, lng), _ in wreck_candidates])
+                for (wreck_name, (lat, lng), description), in_zone in zip(wreck_candidates, in_zone_flags):
+                    if not in_zone:
                         logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ POI fuori zona: '{wreck_name}' ({lat}, {lng}) - ESCLUSO")
                         continue
                     
@@ -1249,13 +1262,9 @@ class MarineWebSearcher:
                         logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Coordinate mancanti per '{name}' - POI incompleto, scarto")
                         return None
                     
+                    # Verifica zona: fatta su tutti i POI della fonte in search_marine_wrecks
                     lat, lng = coordinates
                     
-                    # ✅ FIX MarineWeb: Verifica che sia dentro la zona
-                    if not point_in_polygon((lat, lng), polygon):
-                        logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ POI fuori zona: '{name}' ({lat}, {lng}) - ESCLUSO (coordinate devono essere dentro il poligono)")
-                        return None
-                    
                     # Costruisci POI
                     poi = {
                         "name": name,
@@ -1287,14 +1296,14 @@ class MarineWebSearcher:
         """✅ FIX MarineWeb: Scarica contenuto pagina web"""
         try:
             logger.logger.debug(f"[POI-MARINE-WEB] 🔍 Scaricamento pagina: {url}")
-            async with aiohttp.ClientSession(timeout=self.timeout, headers=self.headers) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        logger.logger.debug(f"[POI-MARINE-WEB] ✅ Pagina scaricata: {len(content)} caratteri")
-                        return content
-                    else:
-                        logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Errore HTTP {response.status} per {url}")
+            session = get_http_session("web")
+            async with session.get(url, headers=self.headers, timeout=self.timeout) as response:
+                if response.status == 200:
+                    content = await response.text()
+                    logger.logger.debug(f"[POI-MARINE-WEB] ✅ Pagina scaricata: {len(content)} caratteri")
+                    return content
+                else:
+                    logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Errore HTTP {response.status} per {url}")
         except Exception as e:
             logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Errore fetch pagina {url}: {str(e)}")
         return None
@@ -1814,22 +1823,23 @@ class MarineWebSearcher:
             # Chiama endpoint Node.js interno
             node_api_url = f"http://127.0.0.1:3000/admin/google-cse/search"
             
-            async with aiohttp.ClientSession(timeout=self.timeout, headers=self.headers) as session:
-                async with session.post(
-                    node_api_url,
-                    json={"query": query},  # ✅ FIX MarineWeb: Passa query con chiave 'query' per usare useCustomQuery=true
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get("success") and data.get("enabled"):
-                            return data.get("results", [])
-                        else:
-                            logger.logger.debug(f"[POI-MARINE-WEB] Google CSE non abilitato o disabilitato")
-                            return []
+            session = get_http_session("internal")
+            async with session.post(
+                node_api_url,
+                json={"query": query},  # ✅ FIX MarineWeb: Passa query con chiave 'query' per usare useCustomQuery=true
+                headers={**self.headers, "Content-Type": "application/json"},
+                timeout=self.timeout
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if data.get("success") and data.get("enabled"):
+                        return data.get("results", [])
                     else:
-                        logger.logger.warning(f"[POI-MARINE-WEB] Google CSE API error: {response.status}")
+                        logger.logger.debug(f"[POI-MARINE-WEB] Google CSE non abilitato o disabilitato")
                         return []
+                else:
+                    logger.logger.warning(f"[POI-MARINE-WEB] Google CSE API error: {response.status}")
+                    return []
         except Exception as e:
             logger.logger.warning(f"[POI-MARINE-WEB] Errore chiamata Google CSE: {str(e)}")
             return []
@@ -1874,14 +1884,9 @@ class MarineWebSearcher:
                 logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ Coordinate non trovate per '{title}' - POI incompleto, scarto")
                 return None
             
+            # Verifica zona: fatta su tutti i POI della fonte in search_marine_wrecks
             lat, lng = coordinates
             
-            # ✅ Verifica che sia dentro la zona
-            from .utils import point_in_polygon
-            if not point_in_polygon((lat, lng), polygon):
-                logger.logger.warning(f"[POI-MARINE-WEB] ⚠️ POI fuori zona: '{title}' ({lat}, {lng}) - ESCLUSO")
-                return None
-            
             # ✅ Estrai nome relitto o centro diving
             name = self._extract_wreck_name(title, page_content or "", zone_name)
             if self._is_suspicious_name(name):
@@ -1,33 +1,58 @@
 import asyncio
-import aiohttp
-import wikipedia
 import requests
 import json
-from typing import List, Dict, Any, Optional, Tuple
-from SPARQLWrapper import SPARQLWrapper, JSON
-from .utils import SemanticLogger, POIValidator, point_in_polygon
+import os
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
+from .utils import SemanticLogger, POIValidator, point_in_polygon, zone_geometry, deadline_timeout, deadline_expired, mark_truncated, mark_failed
+from .mediawiki_client import MediaWikiClient, WikiPage
+from .sparql_client import SparqlClient, WIKIDATA_SPARQL_ENDPOINT, DBPEDIA_SPARQL_ENDPOINT
+from .http_pool import get_http_session
 import time
 
 logger = SemanticLogger()
 
+# Timeout (secondi) per singola fonte wiki: una fonte lenta non blocca le altre
+WIKI_SOURCE_TIMEOUTS = {
+    "wikipedia": float(os.getenv("WIKIPEDIA_TIMEOUT_S", "45")),
+    "wikidata": float(os.getenv("WIKIDATA_TIMEOUT_S", "30")),
+    "dbpedia": float(os.getenv("DBPEDIA_TIMEOUT_S", "30")),
+    "marine_wiki": float(os.getenv("MARINE_WIKI_TIMEOUT_S", "45")),
+}
+
+# Righe massime delle query SPARQL per bbox (una sola richiesta LIMIT)
+SPARQL_MAX_ROWS = 100
+
+def _binding_float(binding: Dict, key: str) -> float:
+    """Valore numerico di una variabile SPARQL (NaN se mancante o non valido)"""
+    try:
+        return float(binding[key]["value"])
+    except (KeyError, TypeError, ValueError):
+        return float("nan")
+
+def bindings_in_zone(bindings: List[Dict], polygon: List[List[float]]) -> List[Dict]:
+    """Righe SPARQL con ?lat/?lon dentro la zona (un solo test vettoriale per fonte)"""
+    if not bindings:
+        return []
+    inside = zone_geometry(polygon).contains_many([_binding_float(b, "lat") for b in bindings],
+                                                  [_binding_float(b, "lon") for b in bindings])
+    return [binding for binding, keep in zip(bindings, inside) if keep]
+
 class WikipediaExtractor:
     """Estrae POI turistici da Wikipedia"""
     
     def __init__(self, lang: str = "it"):
-        try:
-            wikipedia.set_lang(lang or "it")  # Default italiano
-        except Exception:
-            wikipedia.set_lang("en")
         self.session = None
-        self.lang = (lang or "it").lower()
+        self.lang = (lang or "it").lower()  # Default italiano
+        self.client = MediaWikiClient(self.lang)
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session("wikipedia")
+        self.client.session = self.session
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     async def search_wikipedia_pois(self, zone_name: str, 
                                    bbox: Tuple[float, float, float, float],
@@ -44,21 +69,26 @@ class WikipediaExtractor:
                 search_terms = self._build_search_terms(zone_name)
                 
                 for term in search_terms:
+                    if deadline_expired():
+                        # Tempo della richiesta esaurito: restituisci i POI trovati finora
+                        mark_truncated("wikipedia")
+                        break
                     try:
-                        # Cerca pagine Wikipedia
-                        search_results = wikipedia.search(term, results=10)
+                        # Cerca pagine Wikipedia (titolo, intro, coordinate, immagine in una chiamata)
+                        pages = await self.client.search_pages(term, limit=5)  # Limita per performance
                         
-                        for page_title in search_results[:5]:  # Limita per performance
-                            poi = await self._extract_poi_from_page(page_title, bbox, polygon)
+                        for page in pages:
+                            poi = await self._extract_poi_from_page(page, bbox, polygon)
                             if poi:
                                 pois.append(poi)
                                 
                     except Exception as e:
-                        if attempt < max_retries - 1:
+                        if attempt < max_retries - 1 and not deadline_expired():
                             logger.logger.warning(f"Wikipedia search term '{term}' failed (attempt {attempt + 1}/{max_retries}), retrying...")
                             await asyncio.sleep(retry_delay)
                             continue
                         logger.log_error("Wikipedia Search", str(e), zone_name)
+                        mark_failed("wikipedia")
                         continue
                         
                     # Pausa per non sovraccaricare Wikipedia API
@@ -73,6 +103,7 @@ class WikipediaExtractor:
                     await asyncio.sleep(retry_delay)
                 else:
                     logger.log_error("Wikipedia POI Search", str(e), zone_name)
+                    mark_failed("wikipedia")
         
         return self._filter_and_deduplicate(pois)
     
@@ -129,13 +160,11 @@ class WikipediaExtractor:
         
         return False
     
-    async def _extract_poi_from_page(self, page_title: str, 
+    async def _extract_poi_from_page(self, page: WikiPage, 
                                     bbox: Tuple[float, float, float, float],
                                     polygon: List[List[float]]) -> Optional[Dict]:
         """Estrae POI da una pagina Wikipedia"""
         try:
-            page = wikipedia.page(page_title, auto_suggest=False)
-            
             # Prova a ottenere coordinate
             coordinates = self._extract_coordinates(page)
             if not coordinates:
@@ -161,8 +190,9 @@ class WikipediaExtractor:
             }
             
             # CONTROLLO RELITTI IRRILEVANTI: Escludi solo relitti con nomi noti di altre località
-            # Verifica se è un relitto marino
-            if any(word in page.content.lower() for word in ['relitto', 'wreck', 'naufragio', 'affondato', 'shipwreck']):
+            # Verifica se è un relitto marino (testo completo caricato solo per pagine nell'area)
+            content = await self.client.get_content(page)
+            if any(word in content.lower() for word in ['relitto', 'wreck', 'naufragio', 'affondato', 'shipwreck']):
                 poi["marine_type"] = "wreck"
                 # ✅ FIX MarinePOI: Escludi solo relitti con nomi noti fuori zona (es. Moskva nel Mar Nero)
                 if self._is_irrelevant_wreck(page.title, page.summary, poi.get("lat"), poi.get("lng")):
@@ -175,33 +205,20 @@ class WikipediaExtractor:
                 return poi
                 
         except Exception as e:
-            logger.log_error("Wikipedia Page Extraction", str(e), page_title)
+            logger.log_error("Wikipedia Page Extraction", str(e), page.title)
         
         return None
     
-    def _extract_coordinates(self, page) -> Optional[Tuple[float, float]]:
+    def _extract_coordinates(self, page: WikiPage) -> Optional[Tuple[float, float]]:
         """Estrae coordinate da pagina Wikipedia"""
         try:
-            # Prova coordinate dirette - gestisci diversi formati possibili
-            try:
-                if hasattr(page, 'coordinates'):
-                    coords = page.coordinates
-                    if coords:
-                        # Se è una lista/tupla di coordinate
-                        if isinstance(coords, (list, tuple)) and len(coords) >= 2:
-                            return (float(coords[0]), float(coords[1]))
-                        # Se è un dizionario con lat/lng
-                        elif isinstance(coords, dict):
-                            if 'lat' in coords and 'lng' in coords:
-                                return (float(coords['lat']), float(coords['lng']))
-                            elif 'latitude' in coords and 'longitude' in coords:
-                                return (float(coords['latitude']), float(coords['longitude']))
-                        # Se è direttamente una tupla (lat, lng)
-                        elif isinstance(coords, tuple) and len(coords) == 2:
-                            return coords
-            except (AttributeError, KeyError, TypeError, ValueError) as e:
-                # Se l'accesso a coordinates fallisce, continua con altri metodi
-                pass
+            # Coordinate dirette (prop=coordinates dell'API)
+            if page.coordinates:
+                return page.coordinates
+            
+            # Il testo completo viene analizzato solo se già caricato (nessuna richiesta extra)
+            if not page.content:
+                return None
             
             # Cerca nel contenuto coordinate nel formato {{coord|...}}
             content = page.content
@@ -284,17 +301,17 @@ class WikidataExtractor:
     """Estrae POI turistici da Wikidata tramite SPARQL"""
     
     def __init__(self):
-        self.sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        self.sparql.setReturnFormat(JSON)
+        self.sparql = SparqlClient(WIKIDATA_SPARQL_ENDPOINT)
         self.session = None
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session("wikidata")
+        self.sparql.session = self.session
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     async def search_wikidata_pois(self, bbox: Tuple[float, float, float, float],
                                   polygon: List[List[float]], lang: str = "it") -> List[Dict]:
@@ -346,7 +363,6 @@ class WikidataExtractor:
           
           SERVICE wikibase:label {{ bd:serviceParam wikibase:language "{lang},en" . }}
         }}
-        LIMIT 100
         """
         
         max_retries = 3
@@ -354,12 +370,10 @@ class WikidataExtractor:
         
         for attempt in range(max_retries):
             try:
-                self.sparql.setQuery(query)
-                results = self.sparql.query().convert()
-                
                 pois = []
-                for result in results["results"]["bindings"]:
-                    poi = await self._process_wikidata_result(result, polygon, lang)
+                bindings = [result async for result in self.sparql.iter_bindings(query, max_rows=SPARQL_MAX_ROWS)]
+                for result in bindings_in_zone(bindings, polygon):
+                    poi = await self._process_wikidata_result(result, lang)
                     if poi:
                         pois.append(poi)
                 
@@ -371,11 +385,12 @@ class WikidataExtractor:
                     await asyncio.sleep(retry_delay)
                 else:
                     logger.log_error("Wikidata Query", str(e), "")
+                    mark_failed("wikidata")
                     return []
         
         return []
     
-    async def _process_wikidata_result(self, result: Dict, polygon: List[List[float]], lang: str = "it") -> Optional[Dict]:
+    async def _process_wikidata_result(self, result: Dict, lang: str = "it") -> Optional[Dict]:
         """Processa un risultato Wikidata"""
         try:
             # Estrai coordinate direttamente da ?lat e ?lon
@@ -385,10 +400,6 @@ class WikidataExtractor:
             lat = float(result["lat"]["value"])
             lng = float(result["lon"]["value"])
             
-            # Verifica se è nel poligono (universale - qualsiasi zona nel mondo)
-            if not point_in_polygon((lat, lng), polygon):
-                return None
-            
             # Costruisci POI
             name = result["itemLabel"]["value"]
             description = result.get("description", {}).get("value", f"Luogo di interesse turistico")
@@ -428,18 +439,18 @@ class DBpediaExtractor:
     """Estrae POI turistici da DBpedia tramite SPARQL"""
     
     def __init__(self, lang: str = "it"):
-        self.sparql = SPARQLWrapper("https://dbpedia.org/sparql")
-        self.sparql.setReturnFormat(JSON)
+        self.sparql = SparqlClient(DBPEDIA_SPARQL_ENDPOINT)
         self.lang = (lang or "it").lower()
         self.session = None
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session("dbpedia")
+        self.sparql.session = self.session
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     async def search_dbpedia_pois(self, bbox: Tuple[float, float, float, float],
                                  polygon: List[List[float]], lang: str = "it") -> List[Dict]:
@@ -497,7 +508,6 @@ class DBpediaExtractor:
             FILTER(LANG(?abstract) = "{lang}" || LANG(?abstract) = "en") .
           }}
         }}
-        LIMIT 100
         """
         
         max_retries = 3
@@ -505,12 +515,10 @@ class DBpediaExtractor:
         
         for attempt in range(max_retries):
             try:
-                self.sparql.setQuery(query)
-                results = self.sparql.query().convert()
-                
                 pois = []
-                for result in results["results"]["bindings"]:
-                    poi = await self._process_dbpedia_result(result, polygon, lang)
+                bindings = [result async for result in self.sparql.iter_bindings(query, max_rows=SPARQL_MAX_ROWS)]
+                for result in bindings_in_zone(bindings, polygon):
+                    poi = await self._process_dbpedia_result(result, lang)
                     if poi:
                         pois.append(poi)
                 
@@ -522,21 +530,18 @@ class DBpediaExtractor:
                     await asyncio.sleep(retry_delay)
                 else:
                     logger.log_error("DBpedia Query", str(e), "")
+                    mark_failed("dbpedia")
                     return []
         
         return []
     
-    async def _process_dbpedia_result(self, result: Dict, polygon: List[List[float]], lang: str = "it") -> Optional[Dict]:
+    async def _process_dbpedia_result(self, result: Dict, lang: str = "it") -> Optional[Dict]:
         """Processa un risultato DBpedia"""
         try:
             # Estrai coordinate
             lat = float(result["lat"]["value"])
             lng = float(result["lon"]["value"])
             
-            # Verifica se è nel poligono (universale - qualsiasi zona nel mondo)
-            if not point_in_polygon((lat, lng), polygon):
-                return None
-            
             # Estrai nome
             name = result["name"]["value"]
             
@@ -585,17 +590,19 @@ class DBpediaExtractor:
 class WikiMarineExtractor:
     """Estrazione specifica per POI marittimi da fonti Wiki"""
     
-    def __init__(self):
-        self.wikipedia_extractor = WikipediaExtractor()
+    def __init__(self, lang: str = "it"):
+        self.wikipedia_extractor = WikipediaExtractor(lang=lang)
+        self.client = self.wikipedia_extractor.client
         self.session = None
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = get_http_session("wikipedia")
+        self.client.session = self.session
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Sessione condivisa dal pool HTTP dell'applicazione: non va chiusa qui
+        self.session = None
     
     async def search_marine_pois(self, zone_name: str,
                                bbox: Tuple[float, float, float, float],
@@ -628,22 +635,23 @@ class WikiMarineExtractor:
         for i, term in enumerate(marine_search_terms, 1):
             try:
                 logger.logger.info(f"[POI-MARINE] 🔍 Termine {i}/{len(marine_search_terms)}: '{term}'")
-                search_results = wikipedia.search(term, results=3)  # ✅ FIX MarinePOI: Ridotto da 5 a 3 per velocità
-                logger.logger.info(f"[POI-MARINE] ✅ Termine '{term}': trovati {len(search_results)} risultati Wikipedia")
+                pages = await self.client.search_pages(term, limit=3)  # ✅ FIX MarinePOI: Ridotto da 5 a 3 per velocità
+                logger.logger.info(f"[POI-MARINE] ✅ Termine '{term}': trovati {len(pages)} risultati Wikipedia")
                 
-                for page_title in search_results:
-                    logger.logger.debug(f"[POI-MARINE] 🔍 Estrazione POI da pagina: '{page_title}'")
-                    poi = await self._extract_marine_poi(page_title, bbox, polygon)
+                for page in pages:
+                    logger.logger.debug(f"[POI-MARINE] 🔍 Estrazione POI da pagina: '{page.title}'")
+                    poi = await self._extract_marine_poi(page, bbox, polygon)
                     if poi:
                         marine_pois.append(poi)
                         logger.logger.info(f"[POI-MARINE] ✅ POI aggiunto: '{poi.get('name', '')}' (lat: {poi.get('lat')}, lng: {poi.get('lng')})")
                     else:
-                        logger.logger.debug(f"[POI-MARINE] ⚠️ POI escluso da pagina: '{page_title}'")
+                        logger.logger.debug(f"[POI-MARINE] ⚠️ POI escluso da pagina: '{page.title}'")
                         
                 await asyncio.sleep(0.3)  # ✅ FIX MarinePOI: Ridotto da 0.5 a 0.3 per velocità
                 
             except Exception as e:
                 logger.log_error("Marine Wikipedia Search", str(e), term)
+                mark_failed("marine")
                 logger.logger.warning(f"[POI-MARINE] ⚠️ Errore ricerca termine '{term}': {str(e)}")
                 continue
         
@@ -651,17 +659,30 @@ class WikiMarineExtractor:
         
         return self._filter_marine_pois(marine_pois)
     
-    async def _extract_marine_poi(self, page_title: str,
+    async def _extract_marine_poi(self, page: WikiPage,
                                  bbox: Tuple[float, float, float, float],
                                  polygon: List[List[float]]) -> Optional[Dict]:
         """Estrae POI marittimo da pagina Wikipedia"""
         try:
-            logger.logger.debug(f"[POI-MARINE] 📄 Caricamento pagina Wikipedia: '{page_title}'")
-            page = wikipedia.page(page_title, auto_suggest=False)
-            logger.logger.debug(f"[POI-MARINE] ✅ Pagina caricata: '{page.title}' (content length: {len(page.content)})")
+            # Estrai coordinate (prima del testo completo: le pagine fuori area non vengono scaricate)
+            coordinates = self.wikipedia_extractor._extract_coordinates(page)
+            if not coordinates:
+                logger.logger.debug(f"[POI-MARINE] ⚠️ Esclusa pagina Wikipedia '{page.title}' (coordinate non trovate)")
+                return None
+            
+            lat, lng = coordinates
+            
+            # Verifica area (rilassato: permette POI leggermente fuori zona per poi filtrarli in deep_marine_search)
+            if not self.wikipedia_extractor._is_in_area(lat, lng, bbox, polygon):
+                logger.logger.debug(f"[POI-MARINE] ⚠️ Esclusa pagina Wikipedia '{page.title}' (coordinate {lat}, {lng} fuori area)")
+                return None
+            
+            logger.logger.debug(f"[POI-MARINE] 📄 Caricamento pagina Wikipedia: '{page.title}'")
+            content = await self.client.get_content(page)
+            logger.logger.debug(f"[POI-MARINE] ✅ Pagina caricata: '{page.title}' (content length: {len(content)})")
             
             # ✅ FIX MarineDeep: Verifica se è realmente un POI subacqueo (escludi fari, porti, ecc.)
-            content = page.content.lower()
+            content = content.lower()
             title = page.title.lower()
             
             # ✅ FIX MarineDeep: Indicatori SOLO per POI subacquei
@@ -704,19 +725,6 @@ class WikiMarineExtractor:
                 logger.logger.debug(f"[POI-MARINE] ⚠️ Esclusa pagina Wikipedia '{page.title}' (troppi riferimenti geografici irrilevanti: {irrelevant_count})")
                 return None
             
-            # Estrai coordinate
-            coordinates = self.wikipedia_extractor._extract_coordinates(page)
-            if not coordinates:
-                logger.logger.debug(f"[POI-MARINE] ⚠️ Esclusa pagina Wikipedia '{page.title}' (coordinate non trovate)")
-                return None
-            
-            lat, lng = coordinates
-            
-            # Verifica area (rilassato: permette POI leggermente fuori zona per poi filtrarli in deep_marine_search)
-            if not self.wikipedia_extractor._is_in_area(lat, lng, bbox, polygon):
-                logger.logger.debug(f"[POI-MARINE] ⚠️ Esclusa pagina Wikipedia '{page.title}' (coordinate {lat}, {lng} fuori area)")
-                return None
-            
             # ✅ FIX MarinePOI: Valida descrizione prima di estrarre (evita contenuti irrilevanti)
             summary = self.wikipedia_extractor._clean_summary(page.summary)
             
@@ -762,7 +770,7 @@ class WikiMarineExtractor:
                 return poi
                 
         except Exception as e:
-            logger.log_error("Marine POI Extraction", str(e), page_title)
+            logger.log_error("Marine POI Extraction", str(e), page.title)
         
         return None
     
@@ -814,49 +822,64 @@ class WikiMarineExtractor:
         return unique_pois
 
 # Funzioni di utility per uso esterno
+async def _run_wiki_source(source: str, search: Callable[[], Awaitable[List[Dict]]],
+                           zone_name: str) -> List[Dict]:
+    """Esegue una fonte wiki con il proprio timeout: in caso di errore/timeout restituisce []"""
+    timeout = deadline_timeout(WIKI_SOURCE_TIMEOUTS.get(source, 30.0))
+    started = time.monotonic()
+    try:
+        pois = await asyncio.wait_for(search(), timeout=timeout)
+        logger.logger.info(f"✅ {source}: trovati {len(pois)} POI in {time.monotonic() - started:.1f}s")
+        return pois
+    except asyncio.TimeoutError:
+        if deadline_expired():
+            mark_truncated(source.lower())
+        else:
+            mark_failed(source.lower())
+        logger.logger.warning(f"⚠️ {source}: timeout dopo {timeout:.0f}s - continuo con le altre fonti")
+    except Exception as e:
+        logger.log_error(f"{source} Search", str(e), zone_name)
+        mark_failed(source.lower())
+    return []
+
 async def search_wiki_pois(zone_name: str, 
                           bbox: Tuple[float, float, float, float],
                           polygon: List[List[float]], 
                           include_marine: bool = False,
                           lang: str = "it") -> List[Dict]:
-    """Cerca POI su Wikipedia, Wikidata e DBpedia"""
-    all_pois = []
+    """Cerca POI su Wikipedia, Wikidata e DBpedia
     
-    # Wikipedia search
-    try:
+    Le fonti sono interrogate in parallelo, ognuna con il proprio timeout
+    (WIKI_SOURCE_TIMEOUTS): una fonte lenta o in errore non blocca le altre e
+    vengono restituiti i risultati parziali. L'ordine dei POI resta
+    Wikipedia, Wikidata, DBpedia, Marine Wiki (la deduplica a valle dipende dall'ordine).
+    La ricerca marina usa sempre Wikipedia in italiano (termini di ricerca italiani).
+    """
+    
+    async def _wikipedia() -> List[Dict]:
         async with WikipediaExtractor(lang=lang) as wiki_extractor:
-            wikipedia_pois = await wiki_extractor.search_wikipedia_pois(zone_name, bbox, polygon)
-            all_pois.extend(wikipedia_pois)
-            logger.logger.info(f"✅ Wikipedia: trovati {len(wikipedia_pois)} POI")
-    except Exception as e:
-        logger.log_error("Wikipedia Search", str(e), zone_name)
+            return await wiki_extractor.search_wikipedia_pois(zone_name, bbox, polygon)
     
-    # Wikidata search  
-    try:
+    async def _wikidata() -> List[Dict]:
         async with WikidataExtractor() as wikidata_extractor:
-            wikidata_pois = await wikidata_extractor.search_wikidata_pois(bbox, polygon, lang)
-            all_pois.extend(wikidata_pois)
-            logger.logger.info(f"✅ Wikidata: trovati {len(wikidata_pois)} POI")
-    except Exception as e:
-        logger.log_error("Wikidata Search", str(e), zone_name)
+            return await wikidata_extractor.search_wikidata_pois(bbox, polygon, lang)
     
-    # DBpedia search
-    try:
+    async def _dbpedia() -> List[Dict]:
         async with DBpediaExtractor(lang=lang) as dbpedia_extractor:
-            dbpedia_pois = await dbpedia_extractor.search_dbpedia_pois(bbox, polygon, lang)
-            all_pois.extend(dbpedia_pois)
-            logger.logger.info(f"✅ DBpedia: trovati {len(dbpedia_pois)} POI")
-    except Exception as e:
-        logger.log_error("DBpedia Search", str(e), zone_name)
+            return await dbpedia_extractor.search_dbpedia_pois(bbox, polygon, lang)
     
-    # Marine search se richiesto
-    if include_marine:
-        try:
-            async with WikiMarineExtractor() as marine_extractor:
-                marine_pois = await marine_extractor.search_marine_pois(zone_name, bbox, polygon)
-                all_pois.extend(marine_pois)
-                logger.logger.info(f"✅ Marine Wiki: trovati {len(marine_pois)} POI")
-        except Exception as e:
-            logger.log_error("Marine Wiki Search", str(e), zone_name)
+    async def _marine_wiki() -> List[Dict]:
+        async with WikiMarineExtractor() as marine_extractor:
+            return await marine_extractor.search_marine_pois(zone_name, bbox, polygon)
+    
+    async def _no_marine() -> List[Dict]:
+        return []
+    
+    wikipedia_pois, wikidata_pois, dbpedia_pois, marine_pois = await asyncio.gather(
+        _run_wiki_source("wikipedia", _wikipedia, zone_name),
+        _run_wiki_source("wikidata", _wikidata, zone_name),
+        _run_wiki_source("dbpedia", _dbpedia, zone_name),
+        _run_wiki_source("marine_wiki", _marine_wiki, zone_name) if include_marine else _no_marine(),
+    )
     
-    return all_pois
+    return wikipedia_pois + wikidata_pois + dbpedia_pois + marine_pois
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+from .sqlite_store import ThreadLocalSQLite
+from .utils import SemanticLogger
+
+logger = SemanticLogger()
+
+WIKI_PAGE_CACHE_DB = os.getenv("WIKI_PAGE_CACHE_DB", "../cache/semantic/wiki_pages.sqlite3")
+# Entro questo intervallo dall'ultima verifica la pagina è usata senza interpellare Wikipedia
+WIKI_PAGE_REVALIDATE_S = float(os.getenv("WIKI_PAGE_REVALIDATE_S", "86400"))  # 24 ore
+# Risultati di ricerca (termine -> titoli): oltre questa età la ricerca viene rieseguita
+WIKI_SEARCH_CACHE_TTL_S = float(os.getenv("WIKI_SEARCH_CACHE_TTL_S", str(7 * 86400)))  # 7 giorni
+# Pagine non lette da più di questo tempo vengono rimosse
+WIKI_PAGE_MAX_IDLE_S = float(os.getenv("WIKI_PAGE_MAX_IDLE_S", str(30 * 86400)))  # 30 giorni
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    lang TEXT NOT NULL,
+    title TEXT NOT NULL,
+    revid INTEGER,
+    payload BLOB NOT NULL,
+    content BLOB,
+    validated_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (lang, title)
+);
+CREATE INDEX IF NOT EXISTS idx_pages_access ON pages (last_access);
+CREATE TABLE IF NOT EXISTS aliases (
+    lang TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    title TEXT NOT NULL,
+    PRIMARY KEY (lang, alias)
+);
+CREATE TABLE IF NOT EXISTS searches (
+    lang TEXT NOT NULL,
+    term TEXT NOT NULL,
+    max_results INTEGER NOT NULL,
+    titles TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (lang, term, max_results)
+);
+"""
+
+@dataclass
+class CachedPage:
+    """Pagina letta dalla cache: campi di WikiPage (senza testo completo) e ultima verifica"""
+    fields: Dict[str, Any]
+    validated_at: float
+
+    @property
+    def revid(self) -> Optional[int]:
+        return self.fields.get("revid")
+
+class WikiPageCache:
+    """Cache persistente delle pagine Wikipedia per (lingua, titolo)
+
+    - metadati della pagina (sommario, coordinate, immagine, url, revid) e, se
+      caricato, il testo completo compresso
+    - le pagine verificate da meno di revalidate_seconds si usano direttamente;
+      le altre vanno riconvalidate confrontando il revid corrente (prop=info)
+    - un nuovo revid invalida il testo completo, che viene riscaricato su richiesta
+    - ricerche per termine -> titoli, così una zona già cercata non ripete la ricerca
+    - titoli richiesti -> titolo canonico (normalizzazione e redirect di MediaWiki), così
+      una pagina richiesta con un titolo alternativo si trova in cache
+    Le operazioni SQLite girano in un thread per non bloccare l'event loop.
+    """
+
+    def __init__(self, db_path: str = WIKI_PAGE_CACHE_DB, revalidate_seconds: float = WIKI_PAGE_REVALIDATE_S,
+                 search_ttl_seconds: float = WIKI_SEARCH_CACHE_TTL_S, max_idle_seconds: float = WIKI_PAGE_MAX_IDLE_S):
+        self.db_path = db_path
+        self.revalidate_seconds = revalidate_seconds
+        self.search_ttl_seconds = search_ttl_seconds
+        self.max_idle_seconds = max_idle_seconds
+        self._db = ThreadLocalSQLite(db_path)
+        self.search_hits = 0
+        self.search_misses = 0
+        self.page_hits = 0
+        self.page_misses = 0
+        self.content_hits = 0
+        self.content_misses = 0
+        self.revalidation_requests = 0
+        self.revalidated = 0
+        self.refreshed = 0
+
+        self._db.connection().executescript(_SCHEMA)
+
+    def needs_revalidation(self, page: CachedPage) -> bool:
+        return page.validated_at + self.revalidate_seconds <= time.time()
+
+    async def get_search(self, lang: str, term: str, max_results: int) -> Optional[List[str]]:
+        """Titoli restituiti da una ricerca precedente (None se assente o scaduta)"""
+        titles = await asyncio.to_thread(self._disk_get_search, lang, term, max_results)
+        if titles is None:
+            self.search_misses += 1
+        else:
+            self.search_hits += 1
+        return titles
+
+    async def set_search(self, lang: str, term: str, max_results: int, titles: List[str]):
+        await asyncio.to_thread(self._disk_set_search, lang, term, max_results, titles)
+
+    async def get_pages(self, lang: str, titles: List[str]) -> Dict[str, CachedPage]:
+        """Pagine in cache per titolo (i titoli assenti non compaiono nel risultato)"""
+        pages = await asyncio.to_thread(self._disk_get_pages, lang, titles)
+        self.page_hits += len(pages)
+        self.page_misses += len(set(titles)) - len(pages)
+        return pages
+
+    async def set_pages(self, lang: str, pages: List[Dict[str, Any]]):
+        """Memorizza i metadati delle pagine (il testo completo resta valido solo a parità di revid)"""
+        if pages:
+            await asyncio.to_thread(self._disk_set_pages, lang, pages)
+
+    async def resolve_titles(self, lang: str, titles: List[str]) -> Dict[str, str]:
+        """Titolo canonico dei titoli richiesti già visti come alias (gli altri non compaiono)"""
+        if not titles:
+            return {}
+        return await asyncio.to_thread(self._disk_resolve_titles, lang, titles)
+
+    async def set_aliases(self, lang: str, aliases: Dict[str, str]):
+        """Memorizza titolo richiesto -> titolo canonico restituito da MediaWiki"""
+        if aliases:
+            await asyncio.to_thread(self._disk_set_aliases, lang, aliases)
+
+    async def mark_validated(self, lang: str, titles: List[str]):
+        """Registra che le pagine sono ancora alla revisione in cache"""
+        if titles:
+            self.revalidated += len(titles)
+            await asyncio.to_thread(self._disk_mark_validated, lang, titles)
+
+    async def get_content(self, lang: str, title: str, revid: Optional[int]) -> Optional[str]:
+        """Testo completo della pagina alla revisione indicata (None se non in cache)"""
+        content = await asyncio.to_thread(self._disk_get_content, lang, title, revid)
+        if content is None:
+            self.content_misses += 1
+        else:
+            self.content_hits += 1
+        return content
+
+    async def set_content(self, lang: str, title: str, revid: Optional[int], content: str):
+        await asyncio.to_thread(self._disk_set_content, lang, title, revid, content)
+
+    def _disk_get_search(self, lang: str, term: str, max_results: int) -> Optional[List[str]]:
+        row = self._db.connection().execute(
+            "SELECT titles FROM searches WHERE lang = ? AND term = ? AND max_results = ? AND created_at > ?",
+            (lang, term, max_results, time.time() - self.search_ttl_seconds)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _disk_set_search(self, lang: str, term: str, max_results: int, titles: List[str]):
+        connection = self._db.connection()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO searches (lang, term, max_results, titles, created_at) VALUES (?, ?, ?, ?, ?)",
+            (lang, term, max_results, json.dumps(titles, ensure_ascii=False), now)
+        )
+        connection.execute("DELETE FROM searches WHERE created_at <= ?", (now - self.search_ttl_seconds,))
+
+    def _disk_get_pages(self, lang: str, titles: List[str]) -> Dict[str, CachedPage]:
+        if not titles:
+            return {}
+        connection = self._db.connection()
+        placeholders = ",".join("?" for _ in titles)
+        rows = connection.execute(
+            f"SELECT title, payload, validated_at FROM pages WHERE lang = ? AND title IN ({placeholders})",
+            (lang, *titles)
+        ).fetchall()
+        if rows:
+            connection.executemany("UPDATE pages SET last_access = ? WHERE lang = ? AND title = ?",
+                                   [(time.time(), lang, row[0]) for row in rows])
+        return {row[0]: CachedPage(json.loads(zlib.decompress(row[1]).decode("utf-8")), row[2]) for row in rows}
+
+    def _disk_set_pages(self, lang: str, pages: List[Dict[str, Any]]):
+        connection = self._db.connection()
+        now = time.time()
+        rows = []
+        for fields in pages:
+            fields = {key: value for key, value in fields.items() if key != "content"}
+            payload = zlib.compress(json.dumps(fields, ensure_ascii=False).encode("utf-8"))
+            rows.append((lang, fields["title"], fields.get("revid"), payload, now, now))
+        # Il testo completo resta valido solo se la revisione non è cambiata
+        connection.executemany(
+            "INSERT INTO pages (lang, title, revid, payload, validated_at, last_access) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (lang, title) DO UPDATE SET "
+            "content = CASE WHEN pages.revid IS excluded.revid THEN pages.content ELSE NULL END, "
+            "revid = excluded.revid, payload = excluded.payload, "
+            "validated_at = excluded.validated_at, last_access = excluded.last_access",
+            rows
+        )
+        connection.execute("DELETE FROM pages WHERE last_access <= ?", (now - self.max_idle_seconds,))
+        connection.execute("DELETE FROM aliases WHERE NOT EXISTS "
+                           "(SELECT 1 FROM pages WHERE pages.lang = aliases.lang AND pages.title = aliases.title)")
+
+    def _disk_resolve_titles(self, lang: str, titles: List[str]) -> Dict[str, str]:
+        placeholders = ",".join("?" for _ in titles)
+        rows = self._db.connection().execute(
+            f"SELECT alias, title FROM aliases WHERE lang = ? AND alias IN ({placeholders})",
+            (lang, *titles)
+        ).fetchall()
+        return dict(rows)
+
+    def _disk_set_aliases(self, lang: str, aliases: Dict[str, str]):
+        self._db.connection().executemany(
+            "INSERT OR REPLACE INTO aliases (lang, alias, title) VALUES (?, ?, ?)",
+            [(lang, alias, title) for alias, title in aliases.items()]
+        )
+
+    def _disk_mark_validated(self, lang: str, titles: List[str]):
+        now = time.time()
+        self._db.connection().executemany("UPDATE pages SET validated_at = ? WHERE lang = ? AND title = ?",
+                                          [(now, lang, title) for title in titles])
+
+    def _disk_get_content(self, lang: str, title: str, revid: Optional[int]) -> Optional[str]:
+        row = self._db.connection().execute(
+            "SELECT content FROM pages WHERE lang = ? AND title = ? AND revid IS ? AND content IS NOT NULL",
+            (lang, title, revid)
+        ).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def _disk_set_content(self, lang: str, title: str, revid: Optional[int], content: str):
+        self._db.connection().execute(
+            "UPDATE pages SET content = ? WHERE lang = ? AND title = ? AND revid IS ?",
+            (zlib.compress(content.encode("utf-8")), lang, title, revid)
+        )
+
+    def _disk_totals(self) -> Tuple[int, int, int]:
+        connection = self._db.connection()
+        pages, with_content = connection.execute(
+            "SELECT COUNT(*), COUNT(content) FROM pages"
+        ).fetchone()
+        searches = connection.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        return pages, with_content, searches
+
+    async def stats(self) -> Dict[str, Any]:
+        pages, with_content, searches = await asyncio.to_thread(self._disk_totals)
+        return {
+            "pages": pages,
+            "pages_with_content": with_content,
+            "searches": searches,
+            "search_hits": self.search_hits,
+            "search_misses": self.search_misses,
+            "page_hits": self.page_hits,
+            "page_misses": self.page_misses,
+            "content_hits": self.content_hits,
+            "content_misses": self.content_misses,
+            "revalidation_requests": self.revalidation_requests,
+            "revalidated": self.revalidated,
+            "refreshed": self.refreshed
+        }
+
+_page_cache: Optional[WikiPageCache] = None
+
+def get_wiki_page_cache() -> WikiPageCache:
+    """Cache pagine Wikipedia (singleton di processo)"""
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = WikiPageCache()
+    return _page_cache
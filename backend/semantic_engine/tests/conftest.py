@@ -0,0 +1,8 @@
+import os
+import sys
+
+# I moduli core si importano come nel server: dalla cartella del motore semantico
+# (il logger scrive in ../logs rispetto alla directory corrente)
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+os.chdir(ENGINE_DIR)
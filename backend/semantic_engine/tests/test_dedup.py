@@ -0,0 +1,127 @@
+"""Deduplicazione su griglia confrontata con il confronto geodetico O(n²) originale"""
+import random
+
+import pytest
+from geopy.distance import geodesic
+
+from core.utils import POIDeduplicator
+from core.marine_explorer import MarineNameDeduplicator
+
+NAMES = ["Chiesa di San Pietro", "San Pietro", "chiesa di san pietro ", "Torre", "Torre Nord",
+         "Torre nord", "Faro", "Faro di Punta", "Relitto Haven", "HAVEN", "Castello", "Villa"]
+SOURCES = ["Wikipedia", "Wikidata", "OSM", "Web Search", ""]
+
+def _random_pois(rng: random.Random, count: int, thresholds) -> list:
+    """POI a grappoli, con molte coppie a ridosso delle soglie di distanza"""
+    pois = []
+    for index in range(count):
+        if pois and rng.random() < 0.7:
+            anchor = rng.choice(pois)
+            if rng.random() < 0.5:
+                threshold = rng.choice(thresholds)
+                distance = threshold * (1 + rng.choice([-1, 1]) * rng.choice([1e-6, 1e-4, 1e-3, 0.02]))
+            else:
+                distance = rng.uniform(0, 2.5 * max(thresholds))
+            point = geodesic(meters=distance).destination((anchor["lat"], anchor["lng"]), rng.uniform(0, 360))
+            lat, lng = point.latitude, point.longitude
+        else:
+            lat, lng = rng.uniform(44.0, 44.02), rng.uniform(9.0, 9.03)
+        pois.append({
+            "id": index,
+            "name": rng.choice(NAMES),
+            "lat": lat,
+            "lng": lng,
+            "source": rng.choice(SOURCES),
+            "description": "x" * rng.randint(0, 5),
+        })
+    return pois
+
+def _baseline_deduplicate(deduplicator: POIDeduplicator, pois: list) -> list:
+    """Versione originale: ogni POI confrontato con tutti quelli tenuti (distanza geodetica)"""
+    unique_pois = []
+    for poi in pois:
+        for index, existing_poi in enumerate(unique_pois):
+            distance = geodesic((poi["lat"], poi["lng"]), (existing_poi["lat"], existing_poi["lng"])).meters
+            similarity = deduplicator.name_similarity(poi["name"], existing_poi["name"])
+            if distance < deduplicator.distance_threshold and similarity > 0.6:
+                if deduplicator._is_better_poi(poi, existing_poi):
+                    unique_pois[index] = poi
+                break
+        else:
+            unique_pois.append(poi)
+    return unique_pois
+
+def _baseline_filter_new(deduplicator: POIDeduplicator, pois: list, seen: list) -> list:
+    fresh = []
+    for poi in pois:
+        if not any(geodesic((poi["lat"], poi["lng"]), (other["lat"], other["lng"])).meters < deduplicator.distance_threshold
+                   and deduplicator.name_similarity(poi["name"], other["name"]) > 0.6 for other in seen):
+            seen.append(poi)
+            fresh.append(poi)
+    return fresh
+
+def _baseline_marine_filter(pois: list, seen: list) -> list:
+    """Ciclo originale di deep_marine_search: nome identico entro 50m, contenuto entro 100m"""
+    filtered = []
+    for poi in pois:
+        poi_name = (poi.get("name", "") or "").lower().strip()
+        is_duplicate = False
+        for seen_poi in seen:
+            seen_name = (seen_poi.get("name", "") or "").lower().strip()
+            distance_km = geodesic((poi["lat"], poi["lng"]), (seen_poi["lat"], seen_poi["lng"])).kilometers
+            if poi_name == seen_name:
+                if distance_km < 0.05:
+                    is_duplicate = True
+                    break
+            elif (len(poi_name) > 3 and len(seen_name) > 3 and
+                  (poi_name in seen_name or seen_name in poi_name)):
+                if distance_km < 0.1:
+                    is_duplicate = True
+                    break
+        if not is_duplicate:
+            seen.append(poi)
+            filtered.append(poi)
+    return filtered
+
+def _ids(pois: list) -> list:
+    return [poi["id"] for poi in pois]
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("threshold", [50, 100])
+def test_deduplicate_matches_baseline(seed, threshold):
+    rng = random.Random(seed)
+    pois = _random_pois(rng, rng.randint(1, 100), [threshold])
+    deduplicator = POIDeduplicator(distance_threshold=threshold)
+    assert _ids(deduplicator.deduplicate(pois)) == _ids(_baseline_deduplicate(deduplicator, pois))
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("threshold", [50, 100])
+def test_filter_new_matches_baseline(seed, threshold):
+    rng = random.Random(1000 + seed)
+    pois = _random_pois(rng, rng.randint(2, 100), [threshold])
+    split = rng.randint(0, len(pois))
+    deduplicator = POIDeduplicator(distance_threshold=threshold)
+    seen, baseline_seen = list(pois[:split]), list(pois[:split])
+    fresh = deduplicator.filter_new(pois[split:], seen)
+    expected = _baseline_filter_new(deduplicator, pois[split:], baseline_seen)
+    assert _ids(fresh) == _ids(expected)
+    assert _ids(seen) == _ids(baseline_seen)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_marine_name_deduplicator_matches_baseline(seed):
+    rng = random.Random(2000 + seed)
+    pois = _random_pois(rng, rng.randint(2, 100), [50, 100])
+    split = rng.randint(0, len(pois) // 2)
+    seen, baseline_seen = list(pois[:split]), list(pois[:split])
+    fresh = MarineNameDeduplicator().filter_new(pois[split:], seen)
+    assert _ids(fresh) == _ids(_baseline_marine_filter(pois[split:], baseline_seen))
+    assert _ids(seen) == _ids(baseline_seen)
+
+def test_threshold_is_exclusive():
+    """Coppie alla soglia: duplicato appena sotto, distinto appena sopra (distanza geodetica)"""
+    deduplicator = POIDeduplicator(distance_threshold=50)
+    origin = {"id": 0, "name": "Torre", "lat": 44.0, "lng": 9.0, "source": "OSM"}
+    for meters, expected in ((49.999, 1), (50.001, 2)):
+        point = geodesic(meters=meters).destination((44.0, 9.0), 37)
+        other = {"id": 1, "name": "Torre", "lat": point.latitude, "lng": point.longitude, "source": "OSM"}
+        assert len(deduplicator.deduplicate([origin, other])) == expected
@@ -0,0 +1,240 @@
+"""OSMClassifier confrontato con i controlli per tag e parole chiave che ha sostituito"""
+import random
+import re
+
+import pytest
+
+from core.osm_classifier import get_osm_classifier
+from core.overpass_stream import OSMRecord
+from core.utils import POIValidator
+
+# --- Oracolo: implementazione precedente (selettori e controlli originali di osm_query) ---
+
+OLD_TOURIST_SELECTORS = (
+    (("node", "way"), "tourism", "~", "^(attraction|museum|castle|monument|viewpoint|archaeological_site)$"),
+    (("node", "way"), "amenity", "=", "place_of_worship"),
+    (("node", "way"), "building", "=", "church"),
+    (("node", "way"), "historic", "~", "^(castle|fortress|monument|archaeological_site|ruins|palace|manor)$"),
+    (("node", "way"), "leisure", "~", "^(park|garden|nature_reserve)$"),
+    (("node", "way"), "amenity", "~", "^(library|theatre|cinema|arts_centre)$"),
+    (("node", "way"), "natural", "~", "^(peak|cliff|beach|cape)$"),
+)
+
+OLD_MARINE_SELECTORS = (
+    (("node", "way"), "historic", "=", "wreck"),
+    (("node",), "seamark:type", "=", "wreck"),
+    (("node",), "seamark:wreck:category", "", ""),
+    (("node",), "wreck", "", ""),
+    (("node",), "site_type", "=", "wreck"),
+    (("node", "way"), "name", "~", "^(relitto|wreck|shipwreck|naufragio)"),
+    (("node", "way"), "natural", "=", "reef"),
+    (("node", "way"), "natural", "=", "shoal"),
+    (("node", "way"), "natural", "=", "bank"),
+    (("node", "way"), "seamark:type", "=", "obstruction"),
+    (("node",), "seamark:obstruction:category", "", ""),
+    (("node", "way"), "underwater", "=", "yes"),
+    (("node", "way"), "sport", "=", "diving"),
+    (("node",), "leisure", "=", "diving"),
+    (("node",), "scuba_diving", "=", "yes"),
+    (("node",), "diving_site", "=", "yes"),
+    (("node",), "seamark:type", "=", "diving"),
+    (("node", "way"), "natural", "=", "cave"),
+    (("node",), "submarine_cave", "=", "yes"),
+    (("node", "way"), "name", "~", "^(relitto|wreck|shipwreck|naufragio|secca|reef|shoal|scoglio.*sommerso)"),
+)
+
+def old_categories(element: OSMRecord) -> list:
+    categories = []
+    for category, selectors in (("land", OLD_TOURIST_SELECTORS), ("marine", OLD_MARINE_SELECTORS)):
+        for element_types, key, operator, value in selectors:
+            if element.type not in element_types or key not in element.tags:
+                continue
+            tag = element.tags[key]
+            if not operator or (operator == "=" and tag == value) or \
+                    (operator == "~" and re.search(value, tag)):
+                categories.append(category)
+                break
+    return categories
+
+def old_name(tags: dict):
+    for tag in ["name", "name:it", "name:en", "official_name", "short_name"]:
+        if tag in tags and tags[tag].strip():
+            return tags[tag].strip()
+    if "tourism" in tags:
+        return f"{tags['tourism'].title()} POI"
+    elif "historic" in tags:
+        return f"{tags['historic'].title()} Site"
+    return None
+
+def old_description(tags: dict) -> str:
+    type_mappings = {
+        "tourism": {"attraction": "Tourist attraction", "museum": "Museum", "castle": "Castle",
+                    "monument": "Monument", "viewpoint": "Viewpoint",
+                    "archaeological_site": "Archaeological site"},
+        "historic": {"castle": "Historic castle", "fortress": "Fortress", "monument": "Historic monument",
+                     "ruins": "Historic ruins", "palace": "Historic palace"},
+        "amenity": {"place_of_worship": "Place of worship", "library": "Library", "theatre": "Theatre"},
+        "natural": {"peak": "Mountain peak", "cliff": "Cliff", "beach": "Beach", "reef": "Reef"},
+    }
+    parts = []
+    for category, values in type_mappings.items():
+        if category in tags and tags[category] in values:
+            parts.append(values[tags[category]])
+            break
+    if "description" in tags:
+        parts.append(tags["description"])
+    elif "note" in tags:
+        parts.append(tags["note"])
+    if "start_date" in tags:
+        parts.append(f"Built in {tags['start_date']}")
+    if "ele" in tags:
+        try:
+            parts.append(f"Elevation: {float(tags['ele'])}m")
+        except ValueError:
+            pass
+    return ". ".join(parts)
+
+def old_is_surface(tags: dict, name: str, description: str) -> bool:
+    text = (name + " " + description).lower()
+    surface_tags = ["port", "harbour", "harbor", "marina", "lighthouse", "beacon",
+                    "beach", "bay", "coastline", "coast", "city", "town", "village",
+                    "island", "islet", "place", "promontory", "peninsula"]
+    for tag_key in tags:
+        tag_value = str(tags[tag_key]).lower()
+        if any(surface in tag_value for surface in surface_tags):
+            return True
+    surface_keywords = ["porto", "port", "harbour", "harbor", "marina",
+                        "faro", "lighthouse", "phare", "far",
+                        "spiaggia", "beach", "plage",
+                        "baia", "bay", "baie",
+                        "isola", "island", "île",
+                        "città", "city", "ville", "town",
+                        "costa", "coast", "coastline", "côte",
+                        "capo", "cape", "cap",
+                        "promontory", "promontorio", "promontòire",
+                        "peninsula", "penisola", "péninsule"]
+    return any(keyword in text for keyword in surface_keywords)
+
+def old_process(element: OSMRecord, poi_type: str):
+    """_process_osm_element originale seguito da POIValidator.is_tourist_relevant"""
+    lat, lng = element.lat, element.lon
+    if not lat or not lng:
+        return None
+    tags = element.tags
+    name = old_name(tags)
+    if not name:
+        return None
+    poi = {"name": name, "lat": lat, "lng": lng, "source": "OSM", "type": poi_type,
+           "osm_id": element.id, "osm_type": element.type}
+    description = old_description(tags)
+    if description:
+        poi["description"] = description
+    
+    if poi_type == "marine":
+        if old_is_surface(tags, name, description):
+            return None
+        if "depth" in tags:
+            try:
+                poi["depth"] = float(tags["depth"])
+            except ValueError:
+                pass
+        if "seamark:type" in tags:
+            poi["seamark_type"] = tags["seamark:type"]
+        if tags.get("sport") == "diving" or tags.get("leisure") == "diving":
+            poi["diving_site"] = True
+            if "diving:visibility" in tags:
+                poi["visibility"] = tags["diving:visibility"]
+        
+        name_lower = name.lower()
+        is_wreck = (tags.get("historic") == "wreck" or tags.get("seamark:type") == "wreck" or
+                    tags.get("seamark:wreck:category") or tags.get("wreck") or
+                    tags.get("site_type") == "wreck")
+        is_reef_shoal = (tags.get("natural") in ["reef", "shoal", "bank"] or "reef" in name_lower or
+                         "shoal" in name_lower or "secca" in name_lower or "scoglio sommerso" in name_lower)
+        is_underwater_obstruction = tags.get("seamark:type") == "obstruction" or tags.get("underwater") == "yes"
+        is_diving_site = (tags.get("sport") == "diving" or tags.get("leisure") == "diving" or
+                          tags.get("scuba_diving") == "yes" or tags.get("diving_site") == "yes" or
+                          tags.get("seamark:type") == "diving")
+        is_submarine_cave = tags.get("natural") == "cave" or tags.get("submarine_cave") == "yes"
+        if is_wreck:
+            poi["marine_type"] = "wreck"
+            text = (name + " " + description).lower()
+            if any(keyword in text for keyword in ["moskva", "moscova", "moscow", "москва"]):
+                return None
+        elif is_reef_shoal:
+            poi["marine_type"] = "reef"
+        elif is_underwater_obstruction:
+            poi["marine_type"] = "obstruction"
+        elif is_diving_site:
+            poi["marine_type"] = "diving_site"
+        elif is_submarine_cave:
+            poi["marine_type"] = "cave"
+        else:
+            return None
+    
+    poi["relevance_score"] = POIValidator.calculate_relevance_score(poi)
+    return poi if POIValidator.is_tourist_relevant(poi) else None
+
+# --- Elementi casuali con i tag e le parole chiave che contano per i controlli ---
+
+TAG_VALUES = {
+    "tourism": ["attraction", "museum", "castle", "monument", "viewpoint", "archaeological_site", "hotel", "attractions"],
+    "amenity": ["place_of_worship", "library", "theatre", "cinema", "arts_centre", "restaurant", "diving"],
+    "building": ["church", "yes", "house"],
+    "historic": ["castle", "fortress", "monument", "ruins", "palace", "manor", "wreck", "archaeological_site", "tower"],
+    "leisure": ["park", "garden", "nature_reserve", "diving", "marina", "parking"],
+    "natural": ["peak", "cliff", "beach", "cape", "reef", "shoal", "bank", "cave", "bay", "water"],
+    "seamark:type": ["wreck", "obstruction", "diving", "harbour", "light_minor"],
+    "seamark:wreck:category": ["dangerous", "non-dangerous", ""],
+    "seamark:obstruction:category": ["rock", ""],
+    "wreck": ["yes", ""],
+    "site_type": ["wreck", "dive"],
+    "underwater": ["yes", "no"],
+    "sport": ["diving", "swimming"],
+    "scuba_diving": ["yes", "no"],
+    "diving_site": ["yes", "no"],
+    "submarine_cave": ["yes", "no"],
+    "description": ["Famous historic site", "UNESCO world heritage, national monument " * 3,
+                    "Antico porto", "Relitto affondato nel 1943 a 40 metri di profondità, visitabile con guida", ""],
+    "note": ["nota", "Moskva"],
+    "start_date": ["1500", "C17"],
+    "ele": ["12", "12.5 m", "abc"],
+    "depth": ["35", "35m", "-12.5"],
+    "diving:visibility": ["10m", "buona"],
+    "place": ["town", "village", "islet"],
+}
+NAME_PARTS = ["Relitto", "Wreck of", "Shipwreck", "Naufragio", "Secca", "Scoglio sommerso", "scoglio del sommerso",
+              "Reef", "Shoal", "Chiesa", "Castello", "Torre", "Faro", "Porto", "Capo", "Isola", "Museo",
+              "Villa", "Moskva", "diving", "famous", "Farfalla", "del Nord", "San Giorgio", "Haven", "  "]
+NAME_KEYS = ["name", "name:it", "name:en", "official_name", "short_name"]
+
+def _random_element(rng: random.Random, osm_id: int) -> OSMRecord:
+    tags = {}
+    for key in rng.sample(sorted(TAG_VALUES), rng.randint(0, 4)):
+        tags[key] = rng.choice(TAG_VALUES[key])
+    for key in rng.sample(NAME_KEYS, rng.choice([0, 1, 1, 1, 2])):
+        tags[key] = " ".join(rng.sample(NAME_PARTS, rng.randint(1, 3))) if rng.random() < 0.9 else "  "
+    lat = rng.choice([44.1, 44.2, 0.0])
+    lon = rng.choice([9.1, 9.2, 0.0]) if rng.random() < 0.1 else 9.3
+    return OSMRecord(rng.choice(["node", "node", "way", "relation"]), osm_id, lat, lon, tags)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_categories_match_old_selectors(seed):
+    rng = random.Random(seed)
+    classifier = get_osm_classifier()
+    for osm_id in range(1000):
+        element = _random_element(rng, osm_id)
+        assert classifier.categories(element) == old_categories(element), element.tags
+
+@pytest.mark.parametrize("seed", range(20))
+def test_classify_matches_old_processing(seed):
+    rng = random.Random(100 + seed)
+    classifier = get_osm_classifier()
+    for osm_id in range(1000):
+        element = _random_element(rng, osm_id)
+        for poi_type in ("land", "marine"):
+            poi = classifier.classify(element, poi_type)
+            expected = old_process(element, poi_type)
+            # Stessi campi nello stesso ordine
+            assert (list(poi.items()) if poi else None) == (list(expected.items()) if expected else None), \
+                (poi_type, element.tags)